@@ -0,0 +1,456 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Benchmark suite of the client side of the SDK hot paths (C{enhance}, C{import_dataset},
+C{export_dataset}, C{sparql_tuple_query}...) across payload sizes, against a local stub endpoint.
+
+The stub runs in its own process and answers with synthetic payloads of the requested size, so
+what is measured is the cost of the SDK: each benchmark and size runs in a fresh worker process,
+reporting requests/s, p50/p95/p99 latency, CPU time per call, peak RSS and the memory allocated
+by a call (traced with C{tracemalloc}). Results are written as JSON, and compared against the ones
+of another version with C{--compare}, failing when any latency or CPU time regressed.
+
+Usage: python benchmarks/hotpaths.py [--max-bytes 16MB] [--max-rows 100000] [--output results.json]
+                                     [--compare baseline.json] [--threshold 0.1] [--only enhance,...]
+
+The full ladder (up to 1 GB of RDF and 1M rows) needs C{--max-bytes 1GB --max-rows 1000000}.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir)))
+
+KB = 1024
+MB = 1024 * KB
+GB = 1024 * MB
+
+BYTES = [KB, 64 * KB, MB, 16 * MB, 256 * MB, GB]
+ROWS = [100, 1000, 10000, 100000, 1000000]
+
+TRIPLE = "<http://example.org/resource/%d> <http://example.org/label> \"label %d\"@en .\n"
+WORDS = "Salzburg is a city in Austria on the banks of the Salzach river . "
+
+
+def _triples(size):
+    # N-Triples (so valid Turtle too) of about the size (at least a line), in chunks of whole lines
+    lines = []
+    n = written = 0
+    while True:
+        line = (TRIPLE % (n, n)).encode("UTF-8")
+        if n and written + len(line) > size:
+            break
+        lines.append(line)
+        written += len(line)
+        n += 1
+        if len(lines) == 1000:
+            yield b"".join(lines)
+            lines = []
+    if lines:
+        yield b"".join(lines)
+
+
+def _tsv(rows):
+    yield "?s\t?label\t?count\n".encode("UTF-8")
+    for i in range(0, rows, 1000):
+        yield "".join("<http://example.org/resource/%d>\t\"label %d\"@en\t%d\n" % (n, n, n)
+                      for n in range(i, min(i + 1000, rows))).encode("UTF-8")
+
+
+def _json(rows):
+    yield '{"head": {"vars": ["s", "label", "count"]}, "results": {"bindings": ['.encode("UTF-8")
+    for i in range(0, rows, 1000):
+        yield "".join('%s{"s": {"type": "uri", "value": "http://example.org/resource/%d"}, '
+                      '"label": {"type": "literal", "xml:lang": "en", "value": "label %d"}, '
+                      '"count": {"type": "literal", "datatype": "http://www.w3.org/2001/XMLSchema#integer", '
+                      '"value": "%d"}}' % ("," if n else "", n, n, n)
+                      for n in range(i, min(i + 1000, rows))).encode("UTF-8")
+    yield "]}}".encode("UTF-8")
+
+
+def _enhancements(size):
+    # one entity annotation per 200 bytes of content
+    annotations = [{"@id": "urn:enhancement-%d" % i,
+                    "@type": ["http://fise.iks-project.eu/ontology/EntityAnnotation"],
+                    "http://fise.iks-project.eu/ontology/entity-reference": [{"@id": "http://example.org/%d" % i}],
+                    "http://fise.iks-project.eu/ontology/confidence": [{"@value": 0.9}]}
+                   for i in range(max(size // 200, 1))]
+    yield json.dumps(annotations).encode("UTF-8")
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """
+    Stub of the api, sizing its responses after the dataset names: C{bytes-<n>} or C{rows-<n>}
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    cache = {}
+    cache_limit = 16 * MB
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?")[0].strip("/").split("/")
+        if len(path) == 1:
+            self._send("application/json", [json.dumps({"accessible": True, "owner": "bench", "datasets": [],
+                                                        "analyses": ["bench"]}).encode("UTF-8")])
+        else:
+            accept = self.headers.get("Accept", "text/turtle").split(",")[0]
+            self._send(accept, self._generate(_triples, _size(path[2])))
+
+    def do_POST(self):
+        path = self.path.split("?")[0].strip("/").split("/")
+        size = self._drain()
+        if path[1] == "analysis":
+            self._send("application/json", self._generate(_enhancements, size))
+        elif path[-1] == "select":
+            if "tab-separated-values" in self.headers.get("Accept", ""):
+                self._send("text/tab-separated-values", self._generate(_tsv, _size(path[2])))
+            else:
+                self._send("application/sparql-results+json", self._generate(_json, _size(path[2])))
+        else:
+            self._send("text/plain", [])
+
+    do_PUT = do_POST
+
+    def _generate(self, generator, size):
+        # small payloads are generated once, so the stub keeps up with the client
+        if size > self.cache_limit:
+            return generator(size)
+        key = (generator.__name__, size)
+        if key not in self.cache:
+            self.cache[key] = [b"".join(generator(size))]
+        return self.cache[key]
+
+    def _drain(self):
+        size = 0
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            while True:
+                length = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if length == 0:
+                    while self.rfile.readline().strip():
+                        pass
+                    return size
+                size += self._skip(length)
+                self.rfile.readline()
+        return self._skip(int(self.headers.get("Content-Length") or 0))
+
+    def _skip(self, length):
+        remaining = length
+        while remaining > 0:
+            remaining -= len(self.rfile.read(min(remaining, MB)))
+        return length
+
+    def _send(self, mimetype, chunks):
+        self.send_response(200)
+        self.send_header("Content-Type", mimetype)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            if chunk:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def _size(dataset):
+    return int(dataset.split("-")[1])
+
+
+def _enhance(endpoint, size, tmp):
+    import redlink
+    analysis = redlink.create_analysis_client("benchmark", endpoint=endpoint)
+    content = (WORDS * (size // len(WORDS) + 1))[:size]
+    return lambda: analysis.enhance(content)
+
+
+def _import_dataset(endpoint, size, tmp):
+    import redlink
+    from redlink.format import Format
+    data = redlink.create_data_client("benchmark", endpoint=endpoint)
+    path = os.path.join(tmp, "import.nt")
+    with open(path, "wb") as f:
+        for chunk in _triples(size):
+            f.write(chunk)
+
+    def call():
+        with open(path, "rb") as f:
+            return data.import_dataset(f, Format.NTRIPLES.mimetype, "bytes-%d" % size)
+    return call
+
+
+def _export_dataset(endpoint, size, tmp):
+    import redlink
+    data = redlink.create_data_client("benchmark", endpoint=endpoint)
+    return lambda: data.export_dataset("bytes-%d" % size)
+
+
+def _export_dataset_to(endpoint, size, tmp):
+    import redlink
+    data = redlink.create_data_client("benchmark", endpoint=endpoint)
+    return lambda: data.export_dataset_to("bytes-%d" % size, os.devnull)
+
+
+def _iter_dataset_triples(endpoint, size, tmp):
+    import redlink
+    data = redlink.create_data_client("benchmark", endpoint=endpoint)
+    return lambda: sum(1 for _ in data.iter_dataset_triples("bytes-%d" % size))
+
+
+QUERY = "SELECT ?s ?label ?count WHERE { ?s ?p ?label ; ?q ?count }"
+
+
+def _sparql_tuple_query(endpoint, rows, tmp):
+    import redlink
+    data = redlink.create_data_client("benchmark", endpoint=endpoint)
+    return lambda: data.sparql_tuple_query(QUERY, "rows-%d" % rows)
+
+
+def _sparql_tuple_query_columnar(endpoint, rows, tmp):
+    import redlink
+    data = redlink.create_data_client("benchmark", endpoint=endpoint)
+    return lambda: data.sparql_tuple_query(QUERY, "rows-%d" % rows, columnar=True)
+
+
+def _iter_sparql_rows(endpoint, rows, tmp):
+    import redlink
+    data = redlink.create_data_client("benchmark", endpoint=endpoint)
+
+    def call():
+        with data.iter_sparql_rows(QUERY, "rows-%d" % rows) as results:
+            return sum(1 for _ in results)
+    return call
+
+
+# name: (setup, unit, sizes); parsing into in-memory structures is only measured up to sensible sizes
+BENCHMARKS = [
+    ("enhance", _enhance, "bytes", [s for s in BYTES if s <= MB]),
+    ("import_dataset", _import_dataset, "bytes", BYTES),
+    ("export_dataset", _export_dataset, "bytes", [s for s in BYTES if s <= 16 * MB]),
+    ("export_dataset_to", _export_dataset_to, "bytes", BYTES),
+    ("iter_dataset_triples", _iter_dataset_triples, "bytes", [s for s in BYTES if s <= 256 * MB]),
+    ("sparql_tuple_query", _sparql_tuple_query, "rows", ROWS),
+    ("sparql_tuple_query_columnar", _sparql_tuple_query_columnar, "rows", ROWS),
+    ("iter_sparql_rows", _iter_sparql_rows, "rows", ROWS),
+]
+
+
+def _peak_rss():
+    # kilobytes on Linux, bytes on Mac OS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentile(values, percentile):
+    values = sorted(values)
+    return values[min(int(round(percentile / 100.0 * (len(values) - 1))), len(values) - 1)]
+
+
+def run_worker(name, size, endpoint, min_time, max_calls, allocations):
+    setup = dict((b[0], b[1]) for b in BENCHMARKS)[name]
+    tmp = tempfile.mkdtemp(prefix="redlink-bench-")
+    try:
+        call = setup(endpoint, size, tmp)
+        if size <= 16 * MB:
+            call()  # warm up (connections, lazy imports, parser plugins)
+
+        baseline = _peak_rss()
+        latencies = []
+        cpu = time.process_time()
+        start = time.time()
+        while not latencies or (time.time() - start < min_time and len(latencies) < max_calls):
+            before = time.time()
+            call()
+            latencies.append(time.time() - before)
+        elapsed = time.time() - start
+        cpu = time.process_time() - cpu
+        peak_rss = _peak_rss()
+
+        result = {
+            "benchmark": name,
+            "size": size,
+            "calls": len(latencies),
+            "requests_per_second": len(latencies) / elapsed,
+            "latency": {
+                "mean": elapsed / len(latencies),
+                "p50": _percentile(latencies, 50),
+                "p95": _percentile(latencies, 95),
+                "p99": _percentile(latencies, 99),
+            },
+            "cpu_per_call": cpu / len(latencies),
+            "peak_rss": peak_rss,
+            "peak_rss_increase": peak_rss - baseline,
+        }
+        if allocations:
+            # traced on its own call, as tracing slows everything else down
+            tracemalloc.start()
+            call()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result["allocated_peak"] = peak
+            result["allocated_retained"] = current
+        return result
+    finally:
+        for f in os.listdir(tmp):
+            os.remove(os.path.join(tmp, f))
+        os.rmdir(tmp)
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results against a baseline
+
+    @return: (benchmark, size, metric, baseline, current) of the regressions beyond the threshold
+    """
+    previous = dict(((r["benchmark"], r["size"]), r) for r in baseline["results"])
+    regressions = []
+    for r in results:
+        before = previous.get((r["benchmark"], r["size"]))
+        if not before:
+            continue
+        for metric, current, old in (("p50", r["latency"]["p50"], before["latency"]["p50"]),
+                                     ("cpu_per_call", r["cpu_per_call"], before["cpu_per_call"])):
+            change = (current - old) / old if old else 0.0
+            print("%-28s %12s %-13s %10.4fs -> %10.4fs  %+6.1f%%" %
+                  (r["benchmark"], _format_size(r), metric, old, current, change * 100))
+            if change > threshold:
+                regressions.append((r["benchmark"], r["size"], metric, old, current))
+    return regressions
+
+
+def _parse_size(value):
+    match = re.match(r"^(\d+)\s*([KMG]?)B?$", value.strip().upper())
+    if not match:
+        raise argparse.ArgumentTypeError("invalid size %s" % value)
+    return int(match.group(1)) * {"": 1, "K": KB, "M": MB, "G": GB}[match.group(2)]
+
+
+def _format_size(result):
+    unit = dict((b[0], b[2]) for b in BENCHMARKS)[result["benchmark"]]
+    size = result["size"]
+    if unit == "rows":
+        return "%d rows" % size
+    for suffix, factor in (("GB", GB), ("MB", MB), ("KB", KB)):
+        if size >= factor:
+            return "%d %s" % (size // factor, suffix)
+    return "%d B" % size
+
+
+def _start_stub():
+    process = subprocess.Popen([sys.executable, os.path.realpath(__file__), "--stub"], stdout=subprocess.PIPE)
+    port = int(process.stdout.readline().decode("UTF-8").strip())
+    return process, "http://127.0.0.1:%d" % port
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--max-bytes", type=_parse_size, default=16 * MB, help="largest RDF payload (default=16MB)")
+    parser.add_argument("--max-rows", type=int, default=100000, help="largest SPARQL results (default=100000)")
+    parser.add_argument("--min-time", type=float, default=2.0, help="seconds each benchmark runs at least")
+    parser.add_argument("--max-calls", type=int, default=1000, help="calls of each benchmark at most")
+    parser.add_argument("--only", help="comma separated names of the benchmarks to run")
+    parser.add_argument("--no-allocations", action="store_true", help="do not trace allocations")
+    parser.add_argument("--output", help="file to write the results to, as JSON")
+    parser.add_argument("--compare", help="results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown failing the comparison")
+    parser.add_argument("--stub", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--endpoint", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stub:
+        server = _Server(("127.0.0.1", 0), _StubHandler)
+        print(server.server_address[1])
+        sys.stdout.flush()
+        server.serve_forever()
+        return
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.size, args.endpoint, args.min_time, args.max_calls,
+                                    not args.no_allocations)))
+        return
+
+    import redlink
+    only = set(args.only.split(",")) if args.only else None
+    try:
+        import numpy
+    except ImportError:
+        only = (only or set(b[0] for b in BENCHMARKS)) - set(["sparql_tuple_query_columnar"])
+
+    stub, endpoint = _start_stub()
+    results = []
+    try:
+        for name, _, unit, sizes in BENCHMARKS:
+            if only is not None and name not in only:
+                continue
+            for size in sizes:
+                if size > (args.max_rows if unit == "rows" else args.max_bytes):
+                    continue
+                command = [sys.executable, os.path.realpath(__file__), "--worker", name, "--size", str(size),
+                           "--endpoint", endpoint, "--min-time", str(args.min_time),
+                           "--max-calls", str(args.max_calls)]
+                if args.no_allocations:
+                    command.append("--no-allocations")
+                r = json.loads(subprocess.check_output(command).decode("UTF-8"))
+                results.append(r)
+                print("%-28s %12s %6d calls %9.1f req/s  p50 %8.4fs  p95 %8.4fs  p99 %8.4fs  "
+                      "cpu %8.4fs  peak RSS %7.1f MB (+%.1f MB)" %
+                      (name, _format_size(r), r["calls"], r["requests_per_second"], r["latency"]["p50"],
+                       r["latency"]["p95"], r["latency"]["p99"], r["cpu_per_call"], r["peak_rss"] / float(MB),
+                       r["peak_rss_increase"] / float(MB)))
+                sys.stdout.flush()
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    report = {
+        "version": redlink.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("%d regressions beyond %d%%" % (len(regressions), args.threshold * 100))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
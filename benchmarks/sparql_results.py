@@ -0,0 +1,159 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of the parsing of SPARQL SELECT results: the whole JSON document (C{sparql_tuple_query})
+against the rows streamed as TSV (C{iter_sparql_rows}), reporting time to first row, total time and
+peak RSS. Each mode runs in its own process against a local stub endpoint, so its peak RSS is its own.
+
+Usage: python benchmarks/sparql_results.py [--rows 200000] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir)))
+
+MODES = ["json", "tsv"]
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    rows = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._send("application/json", [json.dumps({"accessible": True, "analyses": [], "owner": 0,
+                                                     "datasets": ["bench"]})])
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if "tab-separated-values" in self.headers.get("Accept", ""):
+            self._send("text/tab-separated-values", self._tsv())
+        else:
+            self._send("application/sparql-results+json", self._json())
+
+    def _tsv(self):
+        yield "?s\t?label\t?count\n"
+        for i in range(self.rows):
+            yield "<http://example.org/resource/%d>\t\"label %d\"@en\t%d\n" % (i, i, i)
+
+    def _json(self):
+        yield '{"head": {"vars": ["s", "label", "count"]}, "results": {"bindings": ['
+        for i in range(self.rows):
+            yield '%s{"s": {"type": "uri", "value": "http://example.org/resource/%d"}, ' \
+                  '"label": {"type": "literal", "xml:lang": "en", "value": "label %d"}, ' \
+                  '"count": {"type": "literal", "datatype": "http://www.w3.org/2001/XMLSchema#integer", ' \
+                  '"value": "%d"}}' % ("," if i else "", i, i, i)
+        yield ']}}'
+
+    def _send(self, mimetype, chunks):
+        self.send_response(200)
+        self.send_header("Content-Type", mimetype)
+        self.end_headers()
+        buffer = []
+        for chunk in chunks:
+            buffer.append(chunk)
+            if len(buffer) >= 1000:
+                self.wfile.write("".join(buffer).encode("UTF-8"))
+                buffer = []
+        self.wfile.write("".join(buffer).encode("UTF-8"))
+
+
+def _peak_rss():
+    # kilobytes on Linux, bytes on Mac OS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_worker(mode, endpoint):
+    import redlink
+    data = redlink.create_data_client("benchmark", endpoint=endpoint)
+    query = "SELECT ?s ?label ?count WHERE { ?s ?p ?label ; ?q ?count }"
+
+    baseline = _peak_rss()
+    start = time.time()
+    first = None
+    rows = 0
+    if mode == "json":
+        for _ in data.sparql_tuple_query(query, "bench")["results"]["bindings"]:
+            first = first or time.time()
+            rows += 1
+    else:
+        with data.iter_sparql_rows(query, "bench") as results:
+            for _ in results:
+                first = first or time.time()
+                rows += 1
+    end = time.time()
+    return {
+        "mode": mode,
+        "rows": rows,
+        "time_to_first_row": (first or end) - start,
+        "total_time": end - start,
+        "peak_rss": _peak_rss(),
+        "peak_rss_increase": _peak_rss() - baseline,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=200000, help="rows in the results")
+    parser.add_argument("--output", help="file to write the results to, as JSON")
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--endpoint", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.endpoint)))
+        return
+
+    _StubHandler.rows = args.rows
+    server = _Server(("127.0.0.1", 0), _StubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    endpoint = "http://127.0.0.1:%d" % server.server_address[1]
+
+    results = []
+    for mode in MODES:
+        output = subprocess.check_output([sys.executable, os.path.realpath(__file__), "--worker", mode,
+                                          "--endpoint", endpoint])
+        results.append(json.loads(output.decode("UTF-8")))
+    server.shutdown()
+
+    for r in results:
+        print("%-5s %8d rows  first row %8.3fs  total %8.3fs  peak RSS %7.1f MB (+%.1f MB)" %
+              (r["mode"], r["rows"], r["time_to_first_row"], r["total_time"], r["peak_rss"] / 1048576.0,
+               r["peak_rss_increase"] / 1048576.0))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of the startup time: C{python -c "import redlink"} is run repeatedly in fresh processes,
+and the time of a bare interpreter is subtracted. It fails when the median import time is over
+the budget, or when importing the package already loads any of the heavy dependencies, which
+should only be loaded by the methods needing them.
+
+Usage: python benchmarks/startup.py [--budget 0.1] [--runs 20] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+
+HEAVY_MODULES = ["rdflib", "requests", "urllib3", "xml.dom.minidom", "SPARQLWrapper"]
+
+IMPORT = "import redlink"
+
+LOADED = "import sys; import redlink; print(' '.join(m for m in %r if m in sys.modules))" % HEAVY_MODULES
+
+
+def _run(code):
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE="1")
+    started = time.perf_counter()
+    output = subprocess.check_output([sys.executable, "-c", code], env=env)
+    return time.perf_counter() - started, output.decode("UTF-8").strip()
+
+
+def _percentile(values, percentile):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percentile / 100.0 * (len(values) - 1))))]
+
+
+def measure(runs):
+    """
+    Measure the time of importing the package
+
+    @param runs: number of processes of each kind
+    @rtype: dict
+    @return: interpreter and import times (median and p95), and heavy modules loaded by the import
+    """
+    _run(IMPORT)  # warm up the file system cache (and the bytecode already written)
+    bare = []
+    imports = []
+    for _ in range(runs):
+        bare.append(_run("pass")[0])
+        imports.append(_run(IMPORT)[0])
+    interpreter = _percentile(bare, 50)
+    return {
+        "runs": runs,
+        "interpreter": interpreter,
+        "import": {
+            "p50": max(0.0, _percentile(imports, 50) - interpreter),
+            "p95": max(0.0, _percentile(imports, 95) - interpreter),
+        },
+        "loaded": _run(LOADED)[1].split(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--budget", type=float, default=0.1, help="seconds the median import can take (default=0.1)")
+    parser.add_argument("--runs", type=int, default=20, help="processes of each kind (default=20)")
+    parser.add_argument("--output", help="file to write the results to, as JSON")
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    print("interpreter %8.4fs  import redlink p50 %8.4fs  p95 %8.4fs  (budget %.4fs)" %
+          (result["interpreter"], result["import"]["p50"], result["import"]["p95"], args.budget))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(dict(result, budget=args.budget, python=platform.python_version(),
+                           platform=platform.platform(),
+                           timestamp=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())), f, indent=2)
+
+    failures = []
+    if result["loaded"]:
+        failures.append("import redlink loads %s" % ", ".join(result["loaded"]))
+    if result["import"]["p50"] > args.budget:
+        failures.append("import redlink takes %.4fs, over the budget of %.4fs" % (result["import"]["p50"], args.budget))
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,31 +24,172 @@ __contact__ = "support@redlink.io"
 __date__ = "2015-10-28"
 __agent__ = "RedlinkPythonSDK/%s" % __version__
 
-from .analysis import RedlinkAnalysis
-from .data import RedlinkData
+import importlib
 
+from .cache import LRUCache, SqliteCache
+from .deadline import deadline, DeadlineExceeded
+from .hooks import Hook
+from .limiter import AdaptiveLimiter, CircuitBreaker, CircuitOpenError, RetryPolicy
+from .metrics import MetricsCollector
 
-def create_analysis_client(key):
+# the clients and transport are only imported when first used, as they pull in requests and rdflib
+_LAZY = {
+    "RedlinkAnalysis": "analysis",
+    "RedlinkData": "data",
+    "SessionTransport": "transport",
+    "Hedging": "hedging",
+}
+
+__all__ = sorted(_LAZY) + [
+    "LRUCache", "SqliteCache", "deadline", "DeadlineExceeded", "Hook", "AdaptiveLimiter", "CircuitBreaker",
+    "CircuitOpenError", "RetryPolicy", "MetricsCollector", "create_analysis_client", "create_data_client",
+    "create_transport", "create_async_analysis_client", "create_async_data_client",
+]
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+
+def create_analysis_client(key, transport=None, lazy=False, cache=None, timeout=None, hedging=None,
+                           limiter=None, endpoint=None):
     """
     Create an instance of a Redlink Analysis Client
 
     @type  key: str
     @param key: api key
 
+    @type  transport: C{Transport}
+    @param transport: transport to use, to share a connection pool among clients (optional)
+
+    @type  lazy: bool
+    @param lazy: do not validate the key until the status is first needed (default=False)
+
+    @type  cache: C{Cache}
+    @param cache: cache for the enhancements of already seen contents, such as C{LRUCache} or C{SqliteCache}
+
+    @type  timeout: float
+    @param timeout: default timeout of the requests, in seconds, capped by any C{deadline} (optional)
+
+    @type  hedging: C{Hedging}
+    @param hedging: policy for hedging slow requests without side effects, such as C{Hedging(percentile=95)}
+
+    @type  limiter: C{AdaptiveLimiter}
+    @param limiter: limiter of the requests in flight, retrying and circuit breaking, which can be shared (optional)
+
+    @type  endpoint: str
+    @param endpoint: base url of the api, such as the one of a local C{redlink.testing.RedlinkEmulator} (optional)
+
     @rtype: C{RedlinkAnalysis}
     @return: analysis client
     """
-    return RedlinkAnalysis(key)
+    from .analysis import RedlinkAnalysis
+    return RedlinkAnalysis(key, transport, lazy, cache, timeout, hedging, limiter, endpoint)
 
 
-def create_data_client(key):
+def create_data_client(key, transport=None, lazy=False, cache=None, timeout=None, hedging=None,
+                       limiter=None, endpoint=None):
     """
     Create an instance of a Redlink Dara Client
 
     @type  key: str
     @param key: api key
 
+    @type  transport: C{Transport}
+    @param transport: transport to use, to share a connection pool among clients (optional)
+
+    @type  lazy: bool
+    @param lazy: do not validate the key until the status is first needed (default=False)
+
+    @type  cache: C{Cache}
+    @param cache: cache for the results of SPARQL queries and LDPath programs, such as C{LRUCache(ttl=3600)}
+
+    @type  timeout: float
+    @param timeout: default timeout of the requests, in seconds, capped by any C{deadline} (optional)
+
+    @type  hedging: C{Hedging}
+    @param hedging: policy for hedging slow requests without side effects, such as C{Hedging(percentile=95)}
+
+    @type  limiter: C{AdaptiveLimiter}
+    @param limiter: limiter of the requests in flight, retrying and circuit breaking, which can be shared (optional)
+
+    @type  endpoint: str
+    @param endpoint: base url of the api, such as the one of a local C{redlink.testing.RedlinkEmulator} (optional)
+
     @rtype: C{RedlinkData}
     @return: data client
     """
-    return RedlinkData(key)
+    from .data import RedlinkData
+    return RedlinkData(key, transport, lazy, cache, timeout, hedging, limiter, endpoint)
+
+
+def create_transport(pool_connections=10, pool_maxsize=10):
+    """
+    Create a pooled keep-alive transport, which can be shared by several clients
+
+    @type  pool_connections: int
+    @param pool_connections: number of hosts to keep connection pools for
+
+    @type  pool_maxsize: int
+    @param pool_maxsize: maximum number of connections kept alive per host
+
+    @rtype: C{SessionTransport}
+    @return: transport
+    """
+    from .transport import SessionTransport
+    return SessionTransport(pool_connections, pool_maxsize)
+
+
+def create_async_analysis_client(key, transport=None, timeout=None, endpoint=None):
+    """
+    Create an instance of an asyncio Redlink Analysis Client (requires aiohttp),
+    to be awaited: C{client = await create_async_analysis_client(key)}
+
+    @type  key: str
+    @param key: api key
+
+    @type  transport: C{AsyncTransport}
+    @param transport: transport to use, to share a connection pool among clients (optional)
+
+    @type  timeout: float
+    @param timeout: default timeout of the requests, in seconds, capped by any C{deadline} (optional)
+
+    @type  endpoint: str
+    @param endpoint: base url of the api, such as the one of a local C{redlink.testing.RedlinkEmulator} (optional)
+
+    @return: awaitable returning a C{AsyncRedlinkAnalysis}
+    """
+    from .aio import AsyncRedlinkAnalysis
+    return AsyncRedlinkAnalysis(key, transport, timeout, endpoint).open()
+
+
+def create_async_data_client(key, transport=None, timeout=None, endpoint=None):
+    """
+    Create an instance of an asyncio Redlink Data Client (requires aiohttp),
+    to be awaited: C{client = await create_async_data_client(key)}
+
+    @type  key: str
+    @param key: api key
+
+    @type  transport: C{AsyncTransport}
+    @param transport: transport to use, to share a connection pool among clients (optional)
+
+    @type  timeout: float
+    @param timeout: default timeout of the requests, in seconds, capped by any C{deadline} (optional)
+
+    @type  endpoint: str
+    @param endpoint: base url of the api, such as the one of a local C{redlink.testing.RedlinkEmulator} (optional)
+
+    @return: awaitable returning a C{AsyncRedlinkData}
+    """
+    from .aio import AsyncRedlinkData
+    return AsyncRedlinkData(key, transport, timeout, endpoint).open()
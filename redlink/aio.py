@@ -0,0 +1,790 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Asyncio clients, built on top of aiohttp (optional dependency). The asyncio transport reads
+whole responses, so the streaming methods of the blocking clients hold them in memory here.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import ssl
+
+try:
+    import aiohttp
+except ImportError:
+    raise ImportError("the asyncio clients require aiohttp, please install it (pip install aiohttp)")
+
+from . import __agent__
+from .analysis import RedlinkAnalysisBase
+from .batch import async_bounded_map, BulkImportReport, chunked
+from .client import RedlinkClientBase
+from .deadline import remaining
+from .data import RedlinkDataBase, _retry_delay
+from .format import Format
+from .hooks import call_hooks, RequestInfo
+from .sparql import PreparedQuery
+from .status import status_cache
+
+
+class Response(object):
+    """
+    Fully read response, exposing the same attributes the clients use from C{requests.Response}
+    """
+
+    def __init__(self, status_code, reason, headers, content, encoding=None):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "UTF-8", "replace")
+
+
+class AsyncTransport(object):
+    """
+    Asyncio transport, keeping a pool of keep-alive connections. Instances can be shared by
+    several clients, as long as they all run in the same event loop.
+    """
+
+    def __init__(self, limit=100, limit_per_host=0):
+        """
+        @type limit: int
+        @param limit: maximum number of simultaneous connections (0 for unlimited)
+
+        @type limit_per_host: int
+        @param limit_per_host: maximum number of simultaneous connections per host (0 for unlimited)
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.session = None
+        self._ssl_contexts = {}
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    def _get_ssl(self, verify):
+        if verify is True:
+            return None
+        elif not verify:
+            return False
+        elif verify not in self._ssl_contexts:
+            self._ssl_contexts[verify] = ssl.create_default_context(cafile=verify)
+        return self._ssl_contexts[verify]
+
+    async def request(self, method, url, data=None, headers=None, verify=True, timeout=None):
+        """
+        Send a request
+
+        @type method: str
+        @param method: HTTP method
+
+        @type url: str
+        @param url: target url
+
+        @param data: request payload
+        @param headers: request headers
+        @param verify: certificate (bundle) used to verify the server
+        @param timeout: request timeout (in seconds)
+
+        @rtype: C{Response}
+        @return: response
+        """
+        session = self._get_session()
+        kwargs = {}
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        async with session.request(method, url, data=data, headers=headers, ssl=self._get_ssl(verify),
+                                   **kwargs) as response:
+            content = await response.read()
+            return Response(response.status, response.reason, response.headers, content, response.charset)
+
+    async def close(self):
+        """
+        Release the connections held by the transport
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+class AsyncRedlinkClient(RedlinkClientBase):
+    """
+    Asyncio version of the Redlink generic client. The status of the key is retrieved
+    by C{open()}, which the factory functions already call.
+    """
+
+    status = None
+
+    def __init__(self, key, transport=None, timeout=None, endpoint=None):
+        """
+        @param key: api key
+        @param transport: C{AsyncTransport} used to send the requests (default: a new transport owned by the client)
+        @param timeout: default timeout of the requests, in seconds, capped by any C{deadline} (default: none)
+        @param endpoint: base url of the api, such as the one of a local emulator (default: C{endpoint})
+        """
+        if not key:
+            raise ValueError("invalid key")
+        self.key = key
+        self._owns_transport = transport is None
+        self.transport = transport if transport else AsyncTransport()
+        self.timeout = timeout
+        if endpoint:
+            self.endpoint = endpoint.rstrip("/")
+        self.version = self._get_api_version()
+        self.user_agent = __agent__
+        self.cert = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), self.path_crt))
+        self.status = None
+
+    async def open(self):
+        """
+        Retrieve the status of the key (from the status cache shared with the blocking
+        clients when available), validating it
+
+        @return: the client itself
+        """
+        status = status_cache.peek((self.endpoint, self.key))
+        if status is None:
+            status = await self.get_status()
+            if status:
+                status_cache.put((self.endpoint, self.key), status)
+        self.status = self._check_status(status)
+        return self
+
+    async def close(self):
+        """
+        Close the client, and its transport if it is owned by it
+        """
+        if self._owns_transport:
+            await self.transport.close()
+
+    async def __aenter__(self):
+        if self.status is None:
+            await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def get_status(self):
+        """
+        Get api status of the current key
+
+        @rtype: dict
+        @return: status
+        """
+        response = await self._get(self._build_url(), accept="application/json")
+        return self._parse_status(response)
+
+    async def _request(self, method, resource, payload=None, headers=None):
+        # requests are not hedged: slow ones can be cancelled with deadlines instead
+        if not self.hooks:
+            return await self.transport.request(method, resource, data=payload, headers=headers, verify=self.cert,
+                                                timeout=remaining(self.timeout))
+        request = RequestInfo(method, resource, self._endpoint_name(resource), payload)
+        request.attempts = 1
+        call_hooks(self.hooks, "before_request", request)
+        try:
+            response = await self.transport.request(method, resource, data=payload, headers=headers,
+                                                    verify=self.cert, timeout=remaining(self.timeout))
+        except Exception as e:
+            request.done(error=e)
+            call_hooks(self.hooks, "after_response", request, None)
+            raise
+        request.done(response)
+        call_hooks(self.hooks, "after_response", request, response)
+        return response
+
+    async def _get(self, resource, accept=None):
+        headers = {"User-Agent": self.user_agent}
+        if accept:
+            headers["Accept"] = accept
+        return await self._request("GET", resource, headers=headers)
+
+    async def _post(self, resource, payload=None, mimetype=None, accept=None):
+        headers = {"User-Agent": self.user_agent}
+        if mimetype:
+            headers["Content-Type"] = mimetype
+        if accept:
+            headers["Accept"] = accept
+        return await self._request("POST", resource, payload, headers)
+
+    async def _put(self, resource, payload=None, mimetype=None, accept=None):
+        headers = {"User-Agent": self.user_agent}
+        if mimetype:
+            headers["Content-Type"] = mimetype
+        if accept:
+            headers["Accept"] = accept
+        return await self._request("PUT", resource, payload, headers)
+
+    async def _delete(self, resource):
+        headers = {"User-Agent": self.user_agent}
+        return await self._request("DELETE", resource, headers=headers)
+
+
+class AsyncRedlinkAnalysis(AsyncRedlinkClient, RedlinkAnalysisBase):
+    """
+    Asyncio Redlink Analysis Client
+    """
+
+    async def enhance(self, content, input=Format.TEXT, output=Format.JSON, chunk_size=None, overlap=200,
+                      max_in_flight=4):
+        """
+        Enhance the content, optionally in chunks enhanced concurrently (see C{RedlinkAnalysis.enhance})
+
+        @type content: str
+        @param content: target content
+
+        @type input: C{FormatDef}
+        @param input: input type
+
+        @type output: C{FormatDef}
+        @param output: output type
+
+        @type chunk_size: int
+        @param chunk_size: enhance texts longer than this number of characters in chunks (default: never)
+
+        @type overlap: int
+        @param overlap: characters shared by consecutive chunks (default=200)
+
+        @type max_in_flight: int
+        @param max_in_flight: maximum number of chunks enhanced concurrently (default=4)
+
+        @return: enhancements
+        @raise ValueError: if the text is split in chunks and the input is not plain text or the output not RDF
+        """
+        if chunk_size and isinstance(content, str) and len(content) > chunk_size:
+            chunks = self._split_chunks(content, input, output, chunk_size, overlap)
+
+            async def enhance(chunk):
+                return await self._enhance(chunk[1], input, Format.TURTLE, strict=True)
+
+            results = [result async for result in async_bounded_map(enhance, chunks, max_in_flight)]
+            return self._merge_chunks(content, results)
+        return await self._enhance(content, input, output)
+
+    def enhance_many(self, contents, input=Format.TEXT, output=Format.JSON, max_in_flight=8, ordered=True):
+        """
+        Enhance many contents concurrently, keeping at most C{max_in_flight} requests (and contents)
+        in flight at any time::
+
+            async for result in analysis.enhance_many(contents):
+                ...
+
+        @param contents: iterable, or asynchronous iterable, of contents
+
+        @type input: C{FormatDef}
+        @param input: input type
+
+        @type output: C{FormatDef}
+        @param output: output type
+
+        @type max_in_flight: int
+        @param max_in_flight: maximum number of concurrent requests
+
+        @type ordered: bool
+        @param ordered: yield results in input order (default), or in completion order
+
+        @rtype: asynchronous generator of C{BatchResult}
+        @return: enhancements (as C{value}) or errors (as C{error}), with the C{index} of each content
+        """
+        async def enhance(content):
+            return await self._enhance(content, input, output, strict=True)
+
+        return async_bounded_map(enhance, contents, max_in_flight, ordered)
+
+    async def _enhance(self, content, input, output, strict=False):
+        resource = self._build_enhance_url(input, output)
+        logging.debug("Making request to %s" % resource)
+
+        response = await self._post(resource, content, input.mimetype, output.mimetype)
+        if strict:
+            self._check_enhancement(response)
+        return self._parse_enhancements(response)
+
+
+class AsyncPreparedQuery(PreparedQuery):
+    """
+    Prepared query of the asyncio data client
+    """
+
+    async def execute(self, **bindings):
+        """
+        Execute the query
+
+        @param bindings: rdflib terms (or plain values, bound as literals) by variable name
+        @return: query results
+        """
+        payload = self.render(**bindings).encode("UTF-8")
+        response = await self.client._request("POST", self._resource, payload, self._headers)
+        return self.client._parse_sparql_results(response, self.format)
+
+
+class AsyncRedlinkData(AsyncRedlinkClient, RedlinkDataBase):
+    """
+    Asyncio Redlink Data Client. Files are read, and graphs serialized, in the default executor
+    of the event loop, so imports never block it.
+    """
+
+    async def release(self, dataset):
+        """
+        Release the data in the dataset to be used for analysis
+
+        @param dataset: dataset name
+        """
+        response = await self._post(self._build_dataset_url(dataset, self.release_path), accept="application/json")
+        return 200 <= response.status_code < 300
+
+    async def import_dataset(self, data, mimetype, dataset, clean_before=False):
+        """
+        Import RDF data into the dataset
+
+        @param data: data to import, either as C{str}, C{bytes}, C{rdflib.Graph}, C{file}, path
+                     (C{os.PathLike}) or iterable of C{str}/C{bytes} chunks, all but strings streamed
+        @param mimetype: mimetype of the data
+        @param dataset: dataset name
+        @param clean_before: clean data in dataset before importing (default=False)
+
+        @rtype: C{bool}
+        @return: success or not
+        """
+        return await self._import(self._build_dataset_url(dataset), data, mimetype, clean_before)
+
+    async def bulk_import_dataset(self, data, mimetype, dataset, batch_size=10000, max_workers=4, max_retries=3,
+                                  progress=None, clean_before=False, release=False):
+        """
+        Import RDF data into the dataset in batches of triples, uploaded concurrently
+        (see C{RedlinkData.bulk_import_dataset})
+
+        @param data: data to import, as accepted by C{import_dataset}
+        @param mimetype: mimetype of the data
+        @param dataset: dataset name
+        @param batch_size: triples per batch (default=10000)
+        @param max_workers: maximum number of batches uploaded concurrently (default=4)
+        @param max_retries: times a failed batch is retried (default=3)
+        @param progress: function called with the C{BulkImportReport} after each batch
+        @param clean_before: clean data in dataset before importing (default=False)
+        @param release: release the dataset once all batches succeeded (default=False)
+
+        @rtype: C{BulkImportReport}
+        @return: import report, with the batches that finally failed
+        """
+        resource = self._build_dataset_url(dataset)
+        batches = await _run_in_executor(self._build_import_batches, data, mimetype, batch_size, max_retries)
+
+        if clean_before and not await self.clean_dataset(dataset):
+            raise RuntimeError("Cleaning dataset %s before importing failed" % dataset)
+
+        async def upload(batch):
+            payload = b"".join(batch)
+            for attempt in range(max_retries + 1):
+                if attempt > 0:
+                    await asyncio.sleep(_retry_delay(attempt))
+                try:
+                    response = await self._post(resource, payload, mimetype=Format.NTRIPLES.mimetype)
+                except Exception as e:
+                    error = self._check_batch_upload(dataset, error=e)
+                    continue
+                error = self._check_batch_upload(dataset, response)
+                if error is None:
+                    return len(batch), len(payload)
+            raise error
+
+        report = BulkImportReport()
+        async for result in async_bounded_map(upload, _iter_in_executor(batches), max_workers, ordered=False):
+            report.add(result)
+            if progress:
+                progress(report)
+
+        if release and report.ok and not await self.release(dataset):
+            raise RuntimeError("Releasing dataset %s after importing failed" % dataset)
+        return report
+
+    async def export_dataset(self, dataset):
+        """
+        Export the RDF data from a dataset
+
+        @param dataset: dataset name
+
+        @rtype: C{rdflib.Graph}
+        @return: data
+        """
+        response = await self._get(self._build_dataset_url(dataset), accept=Format.TURTLE.mimetype)
+        return self._parse_rdf(response)
+
+    async def export_dataset_to(self, dataset, destination, mimetype=Format.NTRIPLES.mimetype, chunk_size=65536):
+        """
+        Export the RDF data from a dataset into a file (held in memory meanwhile, as the
+        asyncio transport reads whole responses)
+
+        @param dataset: dataset name
+        @param destination: path or (binary) file object to write to
+        @param mimetype: mimetype to export the data as (default=N-Triples)
+        @param chunk_size: size of the chunks written (in bytes)
+
+        @rtype: C{int}
+        @return: number of bytes written
+        """
+        content = (await self._export(dataset, mimetype)).content
+        return await _run_in_executor(_write_content, content, destination, chunk_size)
+
+    async def iter_dataset_triples(self, dataset):
+        """
+        Export the RDF data from a dataset as N-Triples, parsed one triple at a time::
+
+            async for s, p, o in data.iter_dataset_triples(dataset):
+                ...
+
+        @param dataset: dataset name
+
+        @rtype: asynchronous generator of C{tuple}
+        @return: triples
+        """
+        from .ntriples import parse_lines
+        response = await self._export(dataset, Format.NTRIPLES.mimetype)
+        for triple in parse_lines(response.content.splitlines()):
+            yield triple
+
+    async def _export(self, dataset, mimetype):
+        response = await self._get(self._build_dataset_url(dataset), accept=mimetype)
+        self._check_export(dataset, response)
+        return response
+
+    async def clean_dataset(self, dataset):
+        """
+        Clean a data in a dataset
+
+        @param dataset: dataset name
+
+        @rtype: C{bool}
+        @return: success or not
+        """
+        response = await self._delete(self._build_dataset_url(dataset))
+        return 200 <= response.status_code < 300
+
+    async def import_resource(self, data, mimetype, uri, dataset, clean_before=False):
+        """
+        Import data for a resource
+
+        @param data: data to import, either as C{str}, C{bytes}, C{rdflib.Graph}, C{file}, path
+                     (C{os.PathLike}) or iterable of C{str}/C{bytes} chunks, all but strings streamed
+        @param mimetype: mimetype of the data
+        @param uri: reource uri
+        @param dataset: dataset name
+        @param clean_before: clean data in dataset before importing (default=False)
+
+        @rtype: C{bool}
+        @return: success or not
+        """
+        return await self._import(self._build_resource_url(uri, dataset), data, mimetype, clean_before)
+
+    async def _import(self, resource, data, mimetype, clean_before):
+        payload, mimetype = await _run_in_executor(self._build_import_payload, data, mimetype)
+        method = self._put if clean_before else self._post
+        response = await method(resource, _async_payload(payload), mimetype=mimetype)
+        return 200 <= response.status_code < 300
+
+    async def export_resource(self, uri, dataset):
+        """
+        Export the RDF data from a resource
+
+        @param uri: resource uri
+        @param dataset: dataset name
+
+        @rtype: C{rdflib.Graph}
+        @return: data
+        """
+        response = await self._get(self._build_resource_url(uri, dataset), accept=Format.TURTLE.mimetype)
+        return self._parse_rdf(response)
+
+    async def delete_resource(self, uri, dataset):
+        """
+        Delete a resource
+
+        @param uri: resource uri
+        @param dataset: dataset name
+
+        @rtype: C{bool}
+        @return: success or not
+        """
+        response = await self._delete(self._build_resource_url(uri, dataset))
+        return 200 <= response.status_code < 300
+
+    async def delete_resources(self, uris, dataset, batch_size=500, max_in_flight=4):
+        """
+        Delete many resources, with a few SPARQL updates deleting a batch of resources each
+
+        @param uris: resource uris
+        @param dataset: dataset name
+        @param batch_size: resources deleted per update (default=500)
+        @param max_in_flight: maximum number of concurrent updates (default=4)
+
+        @rtype: C{dict}
+        @return: success or not per resource uri
+        @raise ValueError: if any uri is not a valid IRI, before deleting anything
+        """
+        updates = self._build_delete_updates(uris, batch_size)
+
+        async def delete(update):
+            await self.sparql_update(update[1], dataset)
+
+        outcomes = {}
+        async for result in async_bounded_map(delete, updates, max_in_flight, ordered=False):
+            self._record_deletes(outcomes, result, dataset)
+        return outcomes
+
+    async def sync_dataset(self, data, dataset, batch_size=1000, max_in_flight=4):
+        """
+        Make the dataset contain exactly the given triples, sending only the difference
+        (see C{RedlinkData.sync_dataset})
+
+        @param data: C{rdflib.Graph} or iterable of triples
+        @param dataset: dataset name
+        @param batch_size: subjects or triples per request (default=1000)
+        @param max_in_flight: maximum number of concurrent updates (default=4)
+
+        @rtype: C{dict}
+        @return: number of triples C{inserted} and C{deleted}, of subjects C{removed} as a whole, and of
+                 subjects C{unchanged}
+        @raise RuntimeError: if any update failed
+        """
+        from .sync import FINGERPRINTS_QUERY, group_by_subject
+        local = group_by_subject(data)
+        results = await self._sparql_query(dataset, FINGERPRINTS_QUERY)
+        remote, removed, changed, inserts = self._diff_fingerprints(local, results)
+        deletes = []
+        for batch in chunked(changed, batch_size):
+            results = await self._sparql_query(dataset, self._build_subjects_query(batch))
+            self._diff_subjects(local, batch, results, inserts, deletes)
+
+        updates = self._build_sync_updates(removed, inserts, deletes, batch_size)
+
+        async def update(query):
+            return await self.sparql_update(query, dataset)
+
+        failed = [r async for r in async_bounded_map(update, updates, max_in_flight) if not r.ok]
+        self._check_sync_updates(failed, updates, dataset)
+        return self._sync_outcome(remote, removed, changed, inserts, deletes)
+
+    async def sparql_tuple_query(self, query, dataset=None, columnar=False):
+        """
+        Execute a tuple query (SELECT or ASK)
+
+        @param query: query
+        @param dataset: dataset name
+        @param columnar: return the results of a SELECT query column by column, as a
+                         C{redlink.columnar.ColumnarResults} (requires numpy, default=False)
+        @rtype: C{dict}
+        @return: query results
+        """
+        results = await self._sparql_query(dataset, query, Format.JSON.name)
+        if columnar:
+            from .columnar import ColumnarResults
+            return ColumnarResults.from_json(results)
+        return results
+
+    async def iter_sparql_tuple_query(self, query, dataset=None, page_size=1000, max_rows=None, prefetch=True):
+        """
+        Execute a SELECT query lazily, paging through the results with LIMIT and OFFSET
+        (see C{RedlinkData.iter_sparql_tuple_query})
+
+        @param query: query
+        @param dataset: dataset name
+        @param page_size: rows per page (default=1000)
+        @param max_rows: maximum number of rows (default: all)
+        @param prefetch: fetch the next page while the current one is consumed (default=True)
+
+        @rtype: asynchronous generator of C{dict}
+        @return: bindings of each row
+        """
+        self._check_paged_query(query)
+
+        async def fetch(offset):
+            paged = self._build_page_query(query, offset, page_size, max_rows)
+            if paged is None:
+                return []
+            return (await self.sparql_tuple_query(paged, dataset))["results"]["bindings"]
+
+        following = None
+        try:
+            offset = 0
+            page = await fetch(offset)
+            while page:
+                offset += len(page)
+                if max_rows is not None and offset >= max_rows:
+                    for row in page:
+                        yield row
+                    break
+                following = asyncio.ensure_future(fetch(offset)) if prefetch else None
+                for row in page:
+                    yield row
+                page = await following if following else await fetch(offset)
+                following = None
+        finally:
+            if following:
+                following.cancel()
+
+    async def iter_sparql_rows(self, query, dataset=None, terms=False):
+        """
+        Execute a SELECT query requesting the compact SPARQL TSV results format, whose rows
+        are parsed as they are iterated::
+
+            with await data.iter_sparql_rows(query, dataset) as rows:
+                for s, o in rows:
+                    ...
+
+        @param query: query
+        @param dataset: dataset name
+        @param terms: build rdflib terms, instead of plain C{str} values (default=False)
+
+        @rtype: C{TupleRows}
+        @return: rows as tuples, with the names of the variables in C{vars}
+        """
+        from .sparql import TupleRows
+        resource, payload, headers = self._build_rows_request(dataset, query)
+        response = await self._request("POST", resource, payload, headers)
+        self._check_sparql_response(response)
+        return TupleRows(iter(response.content.splitlines()), terms)
+
+    def prepare_sparql_query(self, query, dataset=None, format=Format.JSON.name):
+        """
+        Prepare a query to be executed many times, with different terms bound to its variables
+
+        @param query: query template
+        @param dataset: dataset name
+        @param format: C{json} for tuple queries (default), C{turtle} for graph queries
+        @rtype: C{AsyncPreparedQuery}
+        @return: prepared query
+        """
+        return AsyncPreparedQuery(self, query, dataset, format)
+
+    async def sparql_graph_query(self, query, dataset):
+        """
+        Execute a graph query (CONSTRUCT or DESCRIBE)
+
+        @param query: query
+        @param dataset: dataset name
+        @rtype: C{rdflib.Graph}
+        @return: query results
+        """
+        return await self._sparql_query(dataset, query, Format.TURTLE.name)
+
+    async def sparql_update(self, query, dataset):
+        """
+        Execute an update query
+
+        @param query: query
+        @param dataset: dataset name
+        @return: query results
+        """
+        return await self._sparql_query(dataset, query, Format.JSON.name, update=True)
+
+    async def _sparql_query(self, dataset, query, format=Format.JSON.name, update=False):
+        resource, payload, mimetype, accept = self._build_sparql_request(dataset, query, format, update)
+        response = await self._post(resource, payload, mimetype, accept)
+        return self._parse_sparql_results(response, format, update)
+
+    async def ldpath(self, uri, program, dataset):
+        """
+        Ezecute a LDPath program
+
+        @param uri: context resource uri
+        @param program: ldpath program
+        @param dataset: dataset name
+        @rtype: C{dict}
+        @return: results
+        """
+        resource = self._build_resource_url(uri, dataset, self.ldpath_path)
+        response = await self._post(resource, program, accept=Format.JSON.mimetype)
+        return self._parse_ldpath(response)
+
+    async def ldpath_many(self, uris, program, dataset, max_in_flight=8, sparql=False, batch_size=100):
+        """
+        Evaluate a LDPath program for many context resources concurrently
+        (see C{RedlinkData.ldpath_many})::
+
+            async for uri, results in data.ldpath_many(uris, program, dataset):
+                ...
+
+        @param uris: context resource uris
+        @param program: ldpath program
+        @param dataset: dataset name
+        @param max_in_flight: maximum number of concurrent requests (default=8)
+        @param sparql: evaluate simple programs with SPARQL queries (default=False)
+        @param batch_size: resources per SPARQL query (default=100)
+
+        @rtype: asynchronous generator of C{tuple}
+        @return: (uri, results) pairs, in completion order
+        @raise ValueError: if any uri is not a valid IRI, when evaluating with SPARQL, before evaluating anything
+        @raise RuntimeError: once all the others have been yielded, if the evaluation failed for any resource
+        """
+        simple, items = self._plan_ldpath_many(uris, program, sparql, batch_size)
+        if simple:
+            async def evaluate(batch):
+                return self._simple_ldpath_pairs(simple, batch, await self._sparql_query(dataset, simple.query(batch)))
+        else:
+            async def evaluate(uri):
+                return [(uri, await self.ldpath(uri, program, dataset))]
+
+        failed = []
+        async for result in async_bounded_map(evaluate, items, max_in_flight, ordered=False):
+            for pair in self._record_ldpath(result, failed):
+                yield pair
+        self._check_ldpath_many(failed, simple)
+
+
+async def _run_in_executor(func, *args):
+    # files and graphs are read in the default executor, so they never block the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+
+async def _iter_in_executor(iterator):
+    # lazy payloads (files, serialized graphs, batches of triples) are advanced in the executor
+    done = object()
+    iterator = iter(iterator)
+    while True:
+        item = await _run_in_executor(next, iterator, done)
+        if item is done:
+            break
+        yield item
+
+
+def _write_content(content, destination, chunk_size):
+    if hasattr(destination, "write"):
+        return _write_chunks(content, destination, chunk_size)
+    else:
+        with open(destination, "wb") as f:
+            return _write_chunks(content, f, chunk_size)
+
+
+def _write_chunks(content, f, chunk_size):
+    view = memoryview(content)
+    for start in range(0, len(view), chunk_size):
+        f.write(view[start:start + chunk_size])
+    return len(view)
+
+
+def _async_payload(payload):
+    # aiohttp streams strings, bytes, binary files and asynchronous iterables, but not plain generators
+    if payload is None or isinstance(payload, (str, bytes)) or hasattr(payload, "read"):
+        return payload
+    return _iter_in_executor(payload)
@@ -14,32 +14,133 @@
 
 import logging
 import json
-from xml.dom import minidom
-from rdflib.graph import Graph
 
-from .client import RedlinkClient
+from .batch import bounded_map
+from .cache import hash_key
+from .client import RedlinkClient, RedlinkClientBase
 from .format import from_mimetype, Format
+from .hooks import timed_parse
+from .profiling import section
 
 
-class RedlinkAnalysis(RedlinkClient):
+class RedlinkAnalysisBase(RedlinkClientBase):
     """
-    Redlink Analysis Client
+    Behaviour shared by the blocking and the asyncio Redlink Analysis clients: the urls of the
+    requests, the merging of the enhancements of chunks and the parsing of the responses
     """
 
     path = "analysis"
     enhance_path = "enhance"
 
-    def __init__(self, key):
+    def _split_chunks(self, content, input, output, chunk_size, overlap):
+        from .chunking import split_text
+        if input != Format.TEXT:
+            raise ValueError("only plain text can be enhanced in chunks")
+        if not output.rdflibMapping:
+            # the JSON of the service cannot be built back from the merged graph
+            raise ValueError("enhancements of chunks can only be merged for RDF outputs, not %s" % output.name)
+        return split_text(content, chunk_size, overlap)
+
+    def _merge_chunks(self, content, results):
+        # results of the chunks, in order
+        from .chunking import merge_enhancements
+        graphs = []
+        for result in results:
+            if not result.ok:
+                raise RuntimeError("Enhancing chunk %d (at offset %d) failed: %s" %
+                                   (result.index, result.item[0], result.error))
+            graphs.append((result.item[0], result.value))
+
+        return merge_enhancements(content, graphs)
+
+    def _check_enhancement(self, response):
+        if response.status_code != 200:
+            raise RuntimeError("Enhance request returned %d: %s" % (response.status_code, response.reason))
+
+    def _build_enhance_url(self, input, output):
+        analysis = self.status["analyses"][0]
+        params = {
+            self.param_in: input.name,
+            self.param_out: output.name
+        }
+        return self._build_url("/%s/%s/%s" % (self.path, analysis, self.enhance_path), params)
+
+    def _parse_enhancements(self, response):
+        if response.status_code != 200:
+            logging.error("Enhance request returned %d: %s" % (response.status_code, response.reason))
+            return response.text
+        else:
+            return self._parse_enhancements_content(response.headers["Content-Type"], response.text)
+
+    @timed_parse("enhancements")
+    def _parse_enhancements_content(self, mimetype, text):
+        content_type = from_mimetype(mimetype)
+        if content_type == Format.JSON or content_type == Format.REDLINKJSON:
+            with section("json.loads"):
+                return json.loads(text)
+        elif content_type == Format.XML or content_type == Format.REDLINKXML:
+            from xml.dom import minidom
+            with section("minidom"):
+                return minidom.parseString(text)
+        elif content_type.rdflibMapping:
+            from rdflib.graph import Graph
+            g = Graph()
+            with section("Graph.parse"):
+                g.parse(data=text, format=content_type.rdflibMapping)
+            return g
+        else:
+            logging.warn("Handler not found for %s, so returning raw text response..." % content_type.mimetype)
+            return text
+
+
+class RedlinkAnalysis(RedlinkClient, RedlinkAnalysisBase):
+    """
+    Redlink Analysis Client
+    """
+
+    cache = None
+
+    def __init__(self, key, transport=None, lazy=False, cache=None, timeout=None, hedging=None, limiter=None,
+                 endpoint=None):
         """
         @type key: str
         @param key: api key
+
+        @type transport: C{Transport}
+        @param transport: transport used to send the requests (default: shared pooled transport)
+
+        @type lazy: bool
+        @param lazy: do not validate the key until the status is first needed (default=False)
+
+        @type cache: C{Cache}
+        @param cache: cache for the enhancements of already seen contents (default: no cache)
+
+        @type timeout: float
+        @param timeout: default timeout of the requests, in seconds, capped by any C{deadline} (default: none)
+
+        @type hedging: C{Hedging}
+        @param hedging: policy for hedging slow enhancements (default: no hedging)
+
+        @type limiter: C{AdaptiveLimiter}
+        @param limiter: limiter of the requests in flight, retrying and circuit breaking (default: none)
+
+        @type endpoint: str
+        @param endpoint: base url of the api, such as the one of a local emulator (default: the service)
         """
-        super(RedlinkAnalysis, self).__init__(key)
+        super(RedlinkAnalysis, self).__init__(key, transport, lazy, timeout, hedging, limiter, endpoint)
+        self.cache = cache
 
-    def enhance(self, content, input=Format.TEXT, output=Format.JSON):
+    def enhance(self, content, input=Format.TEXT, output=Format.JSON, chunk_size=None, overlap=200,
+                max_in_flight=4):
         """
         Enhance the content
 
+        Long texts can be split in chunks (cut at paragraph, sentence or word boundaries, and
+        overlapping), which are enhanced concurrently: their enhancements are merged into the ones
+        of the whole text, with offsets relative to it and without the duplicated annotations of
+        the overlapping regions. Merged enhancements are returned as a C{rdflib.Graph}, so only RDF
+        outputs (such as C{Format.TURTLE}) can be requested for chunks.
+
         @type content: str
         @param content: target content
 
@@ -49,31 +150,77 @@ class RedlinkAnalysis(RedlinkClient):
         @type output: C{FormatDef}
         @param output: output type
 
+        @type chunk_size: int
+        @param chunk_size: enhance texts longer than this number of characters in chunks (default: never)
+
+        @type overlap: int
+        @param overlap: characters shared by consecutive chunks (default=200)
+
+        @type max_in_flight: int
+        @param max_in_flight: maximum number of chunks enhanced concurrently (default=4)
+
         @return: enhancements
+        @raise ValueError: if the text is split in chunks and the input is not plain text or the output not RDF
         """
-        analysis = self.status["analyses"][0]
-        params = {
-            self.param_in: input.name,
-            self.param_out: output.name
-        }
-        resource = self._build_url("/%s/%s/%s" % (self.path, analysis, self.enhance_path), params)
+        if chunk_size and isinstance(content, str) and len(content) > chunk_size:
+            return self._enhance_chunked(content, input, output, chunk_size, overlap, max_in_flight)
+        return self._enhance(content, input, output)
+
+    def enhance_many(self, contents, input=Format.TEXT, output=Format.JSON, max_in_flight=8, ordered=True):
+        """
+        Enhance many contents concurrently, keeping at most C{max_in_flight} requests (and contents)
+        in flight at any time, so arbitrarily large (lazy) iterables can be processed. Failures are
+        reported per content and never stop the batch. For best results, the transport should keep
+        at least C{max_in_flight} connections per host.
+
+        @param contents: iterable of contents
+
+        @type input: C{FormatDef}
+        @param input: input type
+
+        @type output: C{FormatDef}
+        @param output: output type
+
+        @type max_in_flight: int
+        @param max_in_flight: maximum number of concurrent requests
+
+        @type ordered: bool
+        @param ordered: yield results in input order (default), or in completion order
+
+        @rtype: generator of C{BatchResult}
+        @return: enhancements (as C{value}) or errors (as C{error}), with the C{index} of each content
+        """
+        def enhance(content):
+            return self._enhance(content, input, output, strict=True)
+
+        return bounded_map(enhance, contents, max_in_flight, ordered)
+
+    def _enhance(self, content, input, output, strict=False):
+        cache_key = self._build_cache_key(content, input, output)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return self._parse_enhancements_content(*cached)
+
+        resource = self._build_enhance_url(input, output)
         logging.debug("Making request to %s" % resource)
 
-        response = self._post(resource, content, input.mimetype, output.mimetype)
+        response = self._post(resource, content, input.mimetype, output.mimetype, idempotent=True)
+        if response.status_code == 200 and cache_key:
+            self.cache.put(cache_key, (response.headers["Content-Type"], response.text))
+        elif strict:
+            self._check_enhancement(response)
+        return self._parse_enhancements(response)
 
-        if response.status_code != 200:
-            logging.error("Enhance request returned %d: %s" % (response.status_code, response.reason))
-            return response.text
-        else:
-            content_type = from_mimetype(response.headers["Content-Type"])
-            if content_type == Format.JSON or content_type == Format.REDLINKJSON:
-                return json.loads(response.text)
-            elif content_type == Format.XML or content_type == Format.REDLINKXML:
-                return minidom.parse(response.text)
-            elif content_type.rdflibMapping:
-                g = Graph()
-                g.parse(data=response.text, format=content_type.rdflibMapping)
-                return g
-            else:
-                logging.warn("Handler not found for %s, so returning raw text response..." % content_type.mimetype)
-                return response.text
+    def _enhance_chunked(self, content, input, output, chunk_size, overlap, max_in_flight):
+        chunks = self._split_chunks(content, input, output, chunk_size, overlap)
+
+        def enhance(chunk):
+            return self._enhance(chunk[1], input, Format.TURTLE, strict=True)
+
+        return self._merge_chunks(content, bounded_map(enhance, chunks, max_in_flight))
+
+    def _build_cache_key(self, content, input, output):
+        if self.cache is None or not isinstance(content, (str, bytes)):
+            return None
+        return hash_key(self.status["analyses"][0], input.name, output.name, content)
@@ -0,0 +1,243 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .deadline import submit
+
+
+class BatchResult(object):
+    """
+    Outcome of processing one item of a batch
+    """
+
+    def __init__(self, index, item, value=None, error=None):
+        """
+        @type index: int
+        @param index: position of the item in the input
+
+        @param item: input item
+        @param value: result (if succeeded)
+        @param error: exception raised (if failed)
+        """
+        self.index = index
+        self.item = item
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return "BatchResult(%d, ok)" % self.index
+        else:
+            return "BatchResult(%d, error=%r)" % (self.index, self.error)
+
+
+def _call(func, index, item):
+    try:
+        return BatchResult(index, item, value=func(item))
+    except Exception as e:
+        return BatchResult(index, item, error=e)
+
+
+async def _call_async(func, index, item):
+    try:
+        return BatchResult(index, item, value=await func(item))
+    except Exception as e:
+        return BatchResult(index, item, error=e)
+
+
+def _check_max_in_flight(max_in_flight):
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+
+
+def bounded_map(func, iterable, max_in_flight=8, ordered=True):
+    """
+    Apply a function to every item of a (lazy) iterable from a pool of threads, keeping at most
+    C{max_in_flight} items in progress, so no more than that are held in memory at any time.
+    Errors are captured per item and never stop the batch. The deadline of the caller applies.
+
+    @param func: function to apply
+    @param iterable: items
+
+    @type max_in_flight: int
+    @param max_in_flight: maximum number of items processed concurrently
+
+    @type ordered: bool
+    @param ordered: yield in input order (default), or as soon as each item completes
+
+    @rtype: generator of C{BatchResult}
+    @return: results
+    """
+    _check_max_in_flight(max_in_flight)
+
+    items = enumerate(iterable)
+    executor = ThreadPoolExecutor(max_in_flight)
+    try:
+        if ordered:
+            pending = deque()
+            for index, item in items:
+                pending.append(submit(executor, _call, func, index, item))
+                if len(pending) >= max_in_flight:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        else:
+            pending = set()
+            for index, item in items:
+                pending.add(submit(executor, _call, func, index, item))
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    finally:
+        executor.shutdown(wait=False)
+
+
+async def async_bounded_map(func, iterable, max_in_flight=8, ordered=True):
+    """
+    Await a coroutine function for every item of a (lazy, and maybe asynchronous) iterable,
+    keeping at most C{max_in_flight} items in progress, as C{bounded_map} does with threads::
+
+        async for result in async_bounded_map(enhance, contents):
+            ...
+
+    @param func: coroutine function to apply
+    @param iterable: items, as an iterable or an asynchronous iterable
+
+    @type max_in_flight: int
+    @param max_in_flight: maximum number of items processed concurrently
+
+    @type ordered: bool
+    @param ordered: yield in input order (default), or as soon as each item completes
+
+    @rtype: asynchronous generator of C{BatchResult}
+    @return: results
+    """
+    import asyncio
+    _check_max_in_flight(max_in_flight)
+
+    pending = deque() if ordered else set()
+    try:
+        index = 0
+        async for item in _aiter(iterable):
+            task = asyncio.ensure_future(_call_async(func, index, item))
+            index += 1
+            if ordered:
+                pending.append(task)
+                if len(pending) >= max_in_flight:
+                    yield await pending.popleft()
+            else:
+                pending.add(task)
+                if len(pending) >= max_in_flight:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+        while pending:
+            if ordered:
+                yield await pending.popleft()
+            else:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _aiter(iterable):
+    if hasattr(iterable, "__aiter__"):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
+
+
+def chunked(iterable, size):
+    """
+    Split an iterable in lists of (at most) C{size} items, consuming it lazily
+
+    @param iterable: items
+    @type size: int
+    @param size: items per list
+    @rtype: generator of C{list}
+    @return: lists of items
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BulkImportReport(object):
+    """
+    Progress (and final outcome) of a bulk import
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.batches = 0
+        self.triples = 0
+        self.bytes = 0
+        self.failed = []
+
+    def add(self, result):
+        """
+        Account for a completed batch
+
+        @type result: C{BatchResult}
+        @param result: outcome of the batch, with the number of triples and bytes as value when succeeded
+        """
+        self.batches += 1
+        if result.ok:
+            triples, size = result.value
+            self.triples += triples
+            self.bytes += size
+        else:
+            self.failed.append(result)
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    @property
+    def elapsed(self):
+        return time.time() - self.started
+
+    @property
+    def triples_per_second(self):
+        return float(self.triples) / max(self.elapsed, 1e-6)
+
+    @property
+    def bytes_per_second(self):
+        return float(self.bytes) / max(self.elapsed, 1e-6)
+
+    def __repr__(self):
+        return "BulkImportReport(batches=%d, failed=%d, triples=%d, %.1f triples/s, %.1f bytes/s)" % \
+               (self.batches, len(self.failed), self.triples, self.triples_per_second, self.bytes_per_second)
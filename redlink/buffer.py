@@ -0,0 +1,199 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from queue import Queue
+
+from .format import from_mimetype, Format
+from .ntriples import relabel_blank_nodes
+from .sparql import format_iri
+
+_STOP = object()
+
+
+class BufferedWriter(object):
+    """
+    Write-behind buffer for the resources imported into a dataset. Resources are collected in
+    memory and written in bulk by a background thread: a single import for all their triples,
+    preceded by a single SPARQL update deleting the ones to be cleaned before. The buffer is flushed
+    when it reaches C{max_triples}, when its oldest resource is C{max_delay} seconds old, or
+    explicitly. Writers block when C{max_pending} flushes are already waiting to be written.
+    Blank node labels are made unique per imported resource, as they would be in separate imports.
+    """
+
+    def __init__(self, client, dataset, max_triples=10000, max_delay=5.0, max_pending=2):
+        """
+        @type client: C{RedlinkData}
+        @param client: data client
+
+        @param dataset: dataset name
+        @param max_triples: triples buffered before flushing (default=10000)
+        @param max_delay: seconds a resource can stay in the buffer (default=5)
+        @param max_pending: flushes waiting to be written before blocking (default=2)
+        """
+        self.client = client
+        self.dataset = dataset
+        self.max_triples = max_triples
+        self.max_delay = max_delay
+        self.errors = []
+        self._resources = OrderedDict()
+        self._clean = set()
+        self._triples = 0
+        self._oldest = None
+        self._documents = itertools.count()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._expired = threading.Condition(self._lock)
+        self._queue = Queue(max_pending)
+        self._writer = threading.Thread(target=self._write_batches, name="redlink-buffered-writer")
+        self._writer.daemon = True
+        self._writer.start()
+        self._timer = threading.Thread(target=self._flush_expired, name="redlink-buffered-writer-timer")
+        self._timer.daemon = True
+        self._timer.start()
+
+    def import_resource(self, data, mimetype, uri, clean_before=False):
+        """
+        Buffer the data of a resource
+
+        @param data: data to import, as accepted by C{RedlinkData.import_resource}
+        @param mimetype: mimetype of the data
+        @param uri: resource uri
+        @param clean_before: clean the data of the resource before importing (default=False)
+        @raise ValueError: if the resource uri is not a valid IRI
+        """
+        format_iri(uri)
+        rdf_format = from_mimetype(mimetype)
+        if not rdf_format:
+            rdf_format = Format.TURTLE
+        # each resource is a separate document, whose blank nodes must not merge with the others
+        lines = list(relabel_blank_nodes(self.client._get_ntriples_lines(data, rdf_format),
+                                         "r%d_" % next(self._documents)))
+
+        with self._lock:
+            if self._closed:
+                raise ValueError("writer already closed")
+            if clean_before:
+                self._triples -= len(self._resources.pop(uri, []))
+                self._clean.add(uri)
+            self._resources.setdefault(uri, []).extend(lines)
+            self._triples += len(lines)
+            if self._oldest is None:
+                self._oldest = time.time()
+                self._expired.notify()
+            full = self._triples >= self.max_triples
+
+        if full:
+            self.flush(wait=False)
+
+    def flush(self, wait=True):
+        """
+        Flush the buffer
+
+        @param wait: wait until everything buffered so far has been written (default=True)
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._take()
+            if batch:
+                self._queue.put(batch)
+        if wait:
+            self._queue.join()
+
+    def close(self):
+        """
+        Flush the buffer and stop the writer
+
+        @raise RuntimeError: if any flush failed
+        """
+        self._stop()
+        if self.errors:
+            raise RuntimeError("%d buffered flushes to dataset %s failed, first error: %s" %
+                               (len(self.errors), self.dataset, self.errors[0][1]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return
+        # do not hide the exception raised by the body of the with statement
+        self._stop()
+        if self.errors:
+            logging.error("%d buffered flushes to dataset %s failed, first error: %s" %
+                          (len(self.errors), self.dataset, self.errors[0][1]))
+
+    def _stop(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._expired.notify()
+        self.flush(wait=True)
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._timer.join()
+
+    def _take(self):
+        if not self._resources:
+            return None
+        clean = self._clean
+        lines = [line for resource in self._resources.values() for line in resource]
+        self._resources = OrderedDict()
+        self._clean = set()
+        self._triples = 0
+        self._oldest = None
+        return clean, lines
+
+    def _flush_expired(self):
+        while True:
+            with self._lock:
+                while not self._closed:
+                    if self._oldest is None:
+                        self._expired.wait()
+                    else:
+                        remaining = self._oldest + self.max_delay - time.time()
+                        if remaining <= 0:
+                            break
+                        self._expired.wait(remaining)
+                if self._closed:
+                    return
+            self.flush(wait=False)
+
+    def _write_batches(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is _STOP:
+                    return
+                self._write(*batch)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, clean, lines):
+        try:
+            if clean:
+                self.client.sparql_update(self.client._build_delete_subjects_query(clean), self.dataset)
+            if lines and not self.client.import_dataset(b"".join(lines), Format.NTRIPLES.mimetype, self.dataset):
+                raise RuntimeError("import into dataset %s failed" % self.dataset)
+        except Exception as e:
+            logging.error("Buffered flush of %d triples to %s failed: %s" % (len(lines), self.dataset, e))
+            self.errors.append(((clean, lines), e))
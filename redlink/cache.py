@@ -0,0 +1,215 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def hash_key(*parts):
+    """
+    Build a cache key hashing all the parts
+
+    @param parts: C{str} or C{bytes} parts of the key
+    @rtype: str
+    @return: key
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = part.encode("UTF-8")
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class Cache(object):
+    """
+    Base cache, keeping hit, miss and eviction counters
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a value
+
+        @type key: str
+        @param key: key
+        @return: value, or C{None} if not found
+        """
+        with self._lock:
+            value = self._get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store a value
+
+        @type key: str
+        @param key: key
+
+        @type value: tuple
+        @param value: mimetype and text of a response
+        """
+        raise NotImplementedError()
+
+    def clear(self):
+        """
+        Remove all the values
+        """
+        raise NotImplementedError()
+
+    def stats(self):
+        """
+        Cache statistics
+
+        @rtype: dict
+        @return: hits, misses, evictions and size
+        """
+        size = len(self)
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": size}
+
+    def _get(self, key):
+        # called holding the lock
+        raise NotImplementedError()
+
+    def __len__(self):
+        raise NotImplementedError()
+
+
+class LRUCache(Cache):
+    """
+    In-memory cache, evicting the least recently used values once full or expired
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        """
+        @type maxsize: int
+        @param maxsize: maximum number of values
+
+        @type ttl: int
+        @param ttl: seconds before a value expires (default: never)
+        """
+        super(LRUCache, self).__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._values = OrderedDict()
+
+    def _get(self, key):
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, stored = entry
+        if self.ttl is not None and time.time() - stored > self.ttl:
+            del self._values[key]
+            self.evictions += 1
+            return None
+        self._values.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._values[key] = (value, time.time())
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def __len__(self):
+        return len(self._values)
+
+
+class SqliteCache(Cache):
+    """
+    On-disk cache backed by sqlite, surviving restarts, storing the mimetype and text of the responses
+    """
+
+    def __init__(self, path, maxsize=None, ttl=None):
+        """
+        @type path: str
+        @param path: database file
+
+        @type maxsize: int
+        @param maxsize: maximum number of values (default: unlimited)
+
+        @type ttl: int
+        @param ttl: seconds before a value expires (default: never)
+        """
+        import sqlite3
+        super(SqliteCache, self).__init__()
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses "
+                         "(key TEXT PRIMARY KEY, mimetype TEXT, text TEXT, stored REAL, accessed REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.commit()
+
+    def _get(self, key):
+        row = self._db.execute("SELECT mimetype, text, stored FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if self.ttl is not None and now - row[2] > self.ttl:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+            self.evictions += 1
+            return None
+        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self._db.commit()
+        return row[0], row[1]
+
+    def put(self, key, value):
+        mimetype, text = value
+        with self._lock:
+            now = time.time()
+            self._db.execute("INSERT OR REPLACE INTO responses (key, mimetype, text, stored, accessed) "
+                             "VALUES (?, ?, ?, ?, ?)", (key, mimetype, text, now, now))
+            if self.maxsize is not None:
+                evicted = self._db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                                           "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.maxsize,)).rowcount
+                self.evictions += max(evicted, 0)
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def close(self):
+        """
+        Close the database
+        """
+        with self._lock:
+            self._db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
@@ -0,0 +1,144 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Splitting of long texts into overlapping chunks, and merging of the enhancements of the chunks
+into the ones of the whole text (FISE enhancement structure)
+"""
+
+import re
+
+from rdflib.graph import Graph
+from rdflib.namespace import Namespace, RDF
+from rdflib.term import Literal
+
+FISE = Namespace("http://fise.iks-project.eu/ontology/")
+DC = Namespace("http://purl.org/dc/terms/")
+
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_SENTENCE = re.compile(r"[.!?。]['\")\]]*\s+")
+_SPACE = re.compile(r"\s+")
+
+
+def split_text(text, chunk_size=4000, overlap=200):
+    """
+    Split a text into chunks of (at most) C{chunk_size} characters, cutting at paragraph,
+    sentence or word boundaries when possible. Consecutive chunks share (about) C{overlap}
+    characters, so the mentions around a cut are complete in at least one of them.
+
+    @param text: text
+    @param chunk_size: maximum characters per chunk
+    @param overlap: characters repeated at the beginning of the next chunk
+    @rtype: C{list}
+    @return: (offset, chunk) pairs
+    """
+    if overlap >= chunk_size / 2:
+        raise ValueError("overlap must be smaller than half the chunk size")
+    chunks = []
+    start = 0
+    while True:
+        if len(text) - start <= chunk_size:
+            chunks.append((start, text[start:]))
+            return chunks
+        end = _boundary(text, start + chunk_size // 2, start + chunk_size)
+        chunks.append((start, text[start:end]))
+        start = _boundary(text, end - overlap, end, last=False)
+
+
+def _boundary(text, lowest, highest, last=True):
+    # last (or first) paragraph, sentence or word boundary in the window, the highest otherwise
+    for pattern in (_PARAGRAPH, _SENTENCE, _SPACE):
+        ends = [match.end() for match in pattern.finditer(text, lowest, highest)]
+        if ends:
+            return ends[-1] if last else ends[0]
+    return highest
+
+
+def merge_enhancements(text, chunks):
+    """
+    Merge the enhancements of the chunks of a text: offsets are shifted to the text, the
+    enhancements of all the chunks are extracted from the same content item, and duplicated
+    text annotations (from the overlapping regions) and entity annotations are removed.
+
+    @param text: text
+    @param chunks: (offset, C{rdflib.Graph} of enhancements) pairs, sorted by offset
+    @rtype: C{rdflib.Graph}
+    @return: enhancements of the text
+    """
+    merged = Graph()
+    content_item = None
+    position = shift = 0
+    for offset, graph in chunks:
+        shift += _utf16_length(text[position:offset])
+        position = offset
+        items = set(graph.objects(None, FISE["extracted-from"]))
+        content_item = content_item or next(iter(items), None)
+        for s, p, o in graph:
+            if p in (FISE.start, FISE.end) and isinstance(o, Literal):
+                o = Literal(int(o) + shift, datatype=o.datatype)
+            elif o in items:
+                o = content_item
+            merged.add((content_item if s in items else s, p, o))
+        for prefix, namespace in graph.namespaces():
+            merged.bind(prefix, namespace, override=False)
+
+    _remove_duplicates(merged, FISE.TextAnnotation, _text_annotation_key)
+    _remove_duplicates(merged, FISE.EntityAnnotation, _entity_annotation_key)
+    _remove_duplicates(merged, FISE.TopicAnnotation, _entity_annotation_key)
+    return merged
+
+
+def _remove_duplicates(graph, kind, key):
+    # keep the most confident annotation of each key, redirecting the references to the others
+    kept = {}
+    for annotation in sorted(set(graph.subjects(RDF.type, kind))):
+        k = key(graph, annotation)
+        if k not in kept:
+            kept[k] = annotation
+            continue
+        duplicate = annotation
+        if _confidence(graph, duplicate) > _confidence(graph, kept[k]):
+            kept[k], duplicate = duplicate, kept[k]
+        for s, p in list(graph.subject_predicates(duplicate)):
+            graph.remove((s, p, duplicate))
+            graph.add((s, p, kept[k]))
+        graph.remove((duplicate, None, None))
+
+
+def _text_annotation_key(graph, annotation):
+    start = graph.value(annotation, FISE.start)
+    end = graph.value(annotation, FISE.end)
+    if start is None or end is None:
+        # annotations of the whole text, such as the language
+        return ("text", frozenset(graph.objects(annotation, DC.language)),
+                frozenset(graph.objects(annotation, DC.type)))
+    return ("selection", int(start), int(end), frozenset(graph.objects(annotation, DC.type)))
+
+
+def _entity_annotation_key(graph, annotation):
+    return ("entity", graph.value(annotation, FISE["entity-reference"]),
+            frozenset(graph.objects(annotation, DC.relation)))
+
+
+def _confidence(graph, annotation):
+    confidence = graph.value(annotation, FISE.confidence)
+    try:
+        return float(confidence)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _utf16_length(text):
+    # offsets are counted in UTF-16 code units by the service
+    return len(text.encode("UTF-16-LE")) // 2
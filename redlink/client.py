@@ -14,19 +14,21 @@
 
 
 from . import __version__, __agent__
-import requests
+from .deadline import remaining
+from .hooks import call_hooks, RequestInfo
+from .profiling import section, Profile
+from .status import status_cache
+from .transport import get_default_transport
 import json
 import os
 
-try:
-    from urllib import quote_plus
-except ImportError:
-    from urllib.parse import quote_plus
+from urllib.parse import quote_plus
 
 
-class RedlinkClient(object):
+class RedlinkClientBase(object):
     """
-    Redlink generic client, internally handling all details of the communication with the Redlink API.
+    Behaviour shared by the blocking and the asyncio Redlink clients, which is everything
+    but sending the requests: building their urls and parsing their responses.
     """
 
     endpoint = "https://api.redlink.io"
@@ -35,22 +37,14 @@ class RedlinkClient(object):
     param_in = "in"
     param_out = "out"
     path_crt = "redlink-CA.crt"
+    timeout = None
+    hooks = ()
 
-    def __init__(self, key):
-        """
-        @param key: api key
-        @return:
-        """
-        self.key = key
-        self.version = self._get_api_version()
-        self.user_agent = __agent__
-        self.cert = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), self.path_crt))
-
-        status = self.get_status()
+    def _check_status(self, status):
         if not (status and status["accessible"]):
             raise ValueError("invalid key")
         else:
-            self.status = status
+            return status
 
     def _build_url(self, endpoint="", params={}):
         if len(endpoint) > 0 and not endpoint.startswith("/"):
@@ -66,6 +60,86 @@ class RedlinkClient(object):
         versions = __version__.split(".")
         return "%s.%s" % (versions[0], versions[1])
 
+    def _parse_status(self, response):
+        if response.status_code != 200:
+            return None
+        else:
+            with section("json.loads"):
+                return json.loads(response.text)
+
+    def add_hook(self, hook):
+        """
+        Add an instrumentation hook, such as a C{redlink.metrics.MetricsCollector}
+
+        @type hook: C{redlink.hooks.Hook}
+        @param hook: hook
+        """
+        self.hooks = self.hooks + (hook,)
+
+    def remove_hook(self, hook):
+        """
+        Remove an instrumentation hook
+
+        @param hook: hook
+        """
+        self.hooks = tuple(h for h in self.hooks if h is not hook)
+
+    def _endpoint_name(self, resource):
+        # operation of the url, without dataset or analysis names, so there is a bounded set of them
+        segments = resource.split("?")[0][len(self.endpoint):].strip("/").split("/")[1:]
+        if len(segments) > 1 and segments[1] != "sparql":
+            del segments[1]
+        return "/".join(segments) or "status"
+
+
+class RedlinkClient(RedlinkClientBase):
+    """
+    Redlink generic client, internally handling all details of the communication with the Redlink API.
+    """
+
+    hedging = None
+    limiter = None
+
+    def __init__(self, key, transport=None, lazy=False, timeout=None, hedging=None, limiter=None,
+                 endpoint=None):
+        """
+        @param key: api key
+        @param transport: C{Transport} used to send the requests (default: shared pooled transport)
+        @param lazy: do not validate the key until the status is first needed (default=False)
+        @param timeout: default timeout of the requests, in seconds, capped by any C{deadline} (default: none)
+        @param hedging: C{Hedging} policy for the requests without side effects (default: no hedging)
+        @param limiter: C{AdaptiveLimiter} of the requests in flight, retrying and circuit breaking (default: none)
+        @param endpoint: base url of the api, such as the one of a local emulator (default: C{endpoint})
+        @return:
+        """
+        if not key:
+            raise ValueError("invalid key")
+
+        self.key = key
+        self.transport = transport if transport else get_default_transport()
+        self.timeout = timeout
+        self.hedging = hedging
+        self.limiter = limiter
+        if endpoint:
+            self.endpoint = endpoint.rstrip("/")
+        self.version = self._get_api_version()
+        self.user_agent = __agent__
+        self.cert = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), self.path_crt))
+
+        if not lazy:
+            self.status
+
+    @property
+    def status(self):
+        """
+        Status of the current key (analyses, datasets, owner...), cached and shared
+        by all the clients using the same key
+
+        @rtype: dict
+        @return: status
+        """
+        return self._check_status(status_cache.get((self.endpoint, self.key), self.get_status))
+
     def get_status(self):
         """
         Get api status of the current key
@@ -74,24 +148,75 @@ class RedlinkClient(object):
         @return: status
         """
         response = self._get(self._build_url(), accept="application/json")
-        if response.status_code != 200:
-            return None
-        else:
-            return json.loads(response.text)
+        return self._parse_status(response)
+
+    def profile(self):
+        """
+        Profile the calls made within a block, breaking their time down into network phases,
+        serialization and parsing::
 
-    def _get(self, resource, accept=None):
+            with client.profile() as profile:
+                client.export_dataset("dataset")
+            print(profile.report())
+
+        The calls of any client made within the block (in the same thread, or in the threads the
+        clients use for concurrent requests) are profiled, not only the ones of this client.
+
+        @rtype: C{redlink.profiling.Profile}
+        @return: profile, as a context manager
+        """
+        return Profile()
+
+    def _request(self, method, resource, payload=None, headers=None, stream=False, idempotent=False):
+        if not self.hooks:
+            return self._send(method, resource, payload, headers, stream, idempotent)
+        request = RequestInfo(method, resource, self._endpoint_name(resource), payload)
+        call_hooks(self.hooks, "before_request", request)
+        try:
+            response = self._send(method, resource, payload, headers, stream, idempotent, request)
+        except Exception as e:
+            request.done(error=e)
+            call_hooks(self.hooks, "after_response", request, None)
+            raise
+        request.done(response, stream=stream)
+        call_hooks(self.hooks, "after_response", request, response)
+        return response
+
+    def _send(self, method, resource, payload, headers, stream, idempotent, request=None):
+        # only requests whose payload can be sent again are hedged (if without side effects) or retried
+        replayable = payload is None or isinstance(payload, (str, bytes))
+        hedged = idempotent and replayable and self.hedging and not stream
+        retriable = replayable and (idempotent or method in ("GET", "PUT", "DELETE"))
+
+        def send():
+            timeout = remaining(self.timeout)
+            if request is not None:
+                request.attempts += 1
+
+            def attempt():
+                # hedged duplicates start later, so they have less time left
+                return self.transport.request(method, resource, data=payload, headers=headers, verify=self.cert,
+                                              stream=stream, timeout=remaining(self.timeout))
+
+            return self.hedging.call(attempt, timeout, self.limiter) if hedged else attempt()
+
+        if self.limiter:
+            return self.limiter.call(send, retriable)
+        return send()
+
+    def _get(self, resource, accept=None, stream=False):
         headers = {"User-Agent": self.user_agent}
         if accept:
             headers["Accept"] = accept
-        return requests.get(resource, headers=headers, verify=self.cert)
+        return self._request("GET", resource, headers=headers, stream=stream)
 
-    def _post(self, resource, payload=None, mimetype=None, accept=None):
+    def _post(self, resource, payload=None, mimetype=None, accept=None, idempotent=False):
         headers = {"User-Agent": self.user_agent}
         if mimetype:
             headers["Content-Type"] = mimetype
         if accept:
             headers["Accept"] = accept
-        return requests.post(resource, data=payload, headers=headers, verify=self.cert)
+        return self._request("POST", resource, payload, headers, idempotent=idempotent)
 
     def _put(self, resource, payload=None, mimetype=None, accept=None):
         headers = {"User-Agent": self.user_agent}
@@ -99,8 +224,8 @@ class RedlinkClient(object):
             headers["Content-Type"] = mimetype
         if accept:
             headers["Accept"] = accept
-        return requests.put(resource, data=payload, headers=headers, verify=self.cert)
+        return self._request("PUT", resource, payload, headers)
 
     def _delete(self, resource):
         headers = {"User-Agent": self.user_agent}
-        return requests.delete(resource, headers=headers, verify=self.cert)
+        return self._request("DELETE", resource, headers=headers)
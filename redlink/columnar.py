@@ -0,0 +1,304 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Columnar SPARQL results, built on top of NumPy (optional dependency)
+"""
+
+from collections import OrderedDict
+from sys import intern
+
+try:
+    import numpy
+except ImportError:
+    raise ImportError("columnar results require numpy, please install it (pip install numpy)")
+
+from rdflib.namespace import XSD
+from rdflib.term import BNode, Identifier, Literal
+
+from .sparql import term_from_binding
+
+_INTEGERS = frozenset(str(t) for t in (XSD.integer, XSD.int, XSD.long, XSD.short, XSD.byte,
+                                       XSD.nonNegativeInteger, XSD.positiveInteger, XSD.negativeInteger,
+                                       XSD.nonPositiveInteger, XSD.unsignedInt, XSD.unsignedLong,
+                                       XSD.unsignedShort, XSD.unsignedByte))
+_NUMBERS = _INTEGERS | frozenset(str(t) for t in (XSD.decimal, XSD.double, XSD.float))
+
+
+class TermDictionary(object):
+    """
+    Dictionary of the distinct terms (type, value, language and datatype) of columnar results,
+    shared by all their term columns: the value of each term is interned, and its type, language
+    and datatype are kept next to it.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.keys = []
+        self._codes = {}
+        self._value_codes = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+    def add(self, binding):
+        """
+        @type binding: dict
+        @param binding: binding of the SPARQL JSON results format
+        @rtype: int
+        @return: code of its term
+        """
+        kind = "literal" if binding["type"] == "typed-literal" else binding["type"]
+        key = (kind, binding["value"], binding.get("xml:lang"), binding.get("datatype"))
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self.values)
+            value = intern(binding["value"])
+            self.values.append(value)
+            self.keys.append((kind, value) + key[2:])
+            self._value_codes.setdefault(value, []).append(code)
+        return code
+
+    def codes(self, value):
+        """
+        @param value: rdflib term, or C{str} matching every term with that value
+        @rtype: list
+        @return: codes of the matching terms
+        """
+        if isinstance(value, Identifier):
+            code = self._codes.get(_term_key(value))
+            return [code] if code is not None else []
+        return self._value_codes.get(value, [])
+
+    def term(self, code):
+        """
+        @type code: int
+        @param code: code of a term
+        @return: rdflib term
+        """
+        kind, value, lang, datatype = self.keys[code]
+        return term_from_binding({"type": kind, "value": value, "xml:lang": lang, "datatype": datatype})
+
+
+class TermColumn(object):
+    """
+    Column of (non numeric) terms, stored as codes into a C{TermDictionary} shared by all the
+    columns of the results, one per distinct term (type, value, language and datatype).
+    Comparisons return boolean masks, as NumPy arrays do: a C{str} matches every term with that
+    value, and a rdflib term only that very term. Items are the values of the terms, unless
+    the terms themselves are requested.
+    """
+
+    __hash__ = None
+
+    def __init__(self, codes, terms):
+        """
+        @type codes: C{numpy.ndarray}
+        @param codes: code of the term of each row in C{terms}, -1 if unbound
+        @type terms: C{TermDictionary}
+        @param terms: dictionary of terms
+        """
+        self.codes = codes
+        self.terms = terms
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        codes = self.codes[index]
+        if isinstance(codes, numpy.ndarray):
+            return TermColumn(codes, self.terms)
+        return self.terms[codes] if codes >= 0 else None
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __eq__(self, value):
+        return numpy.isin(self.codes, self.terms.codes(value))
+
+    def __ne__(self, value):
+        return ~numpy.isin(self.codes, self.terms.codes(value))
+
+    def term(self, index):
+        """
+        @type index: int
+        @param index: row position
+        @return: rdflib term of the row, C{None} if unbound
+        """
+        code = self.codes[index]
+        return self.terms.term(code) if code >= 0 else None
+
+    def isin(self, values):
+        """
+        @param values: terms
+        @rtype: C{numpy.ndarray}
+        @return: mask of the rows holding any of the terms
+        """
+        return numpy.isin(self.codes, [code for value in values for code in self.terms.codes(value)])
+
+    def isnull(self):
+        """
+        @rtype: C{numpy.ndarray}
+        @return: mask of the unbound rows
+        """
+        return self.codes < 0
+
+    def counts(self):
+        """
+        @rtype: C{dict}
+        @return: number of rows per value (unbound ones excluded)
+        """
+        bound = self.codes[self.codes >= 0]
+        counts = numpy.bincount(bound, minlength=len(self.terms))
+        values = {}
+        for code in numpy.flatnonzero(counts):
+            value = self.terms[code]
+            values[value] = values.get(value, 0) + int(counts[code])
+        return values
+
+    def tolist(self, terms=False):
+        """
+        @param terms: return rdflib terms, instead of their values (default=False)
+        @rtype: C{list}
+        @return: items of the rows, C{None} if unbound
+        """
+        if terms:
+            return [self.terms.term(code) if code >= 0 else None for code in self.codes.tolist()]
+        values = self.terms.values
+        return [values[code] if code >= 0 else None for code in self.codes.tolist()]
+
+    def __repr__(self):
+        return "TermColumn(%d rows, %d terms)" % (len(self.codes), len(self.terms))
+
+
+class ColumnarResults(object):
+    """
+    Results of a SELECT query stored column by column: numeric literals as typed NumPy arrays
+    (C{float64}, with C{NaN} for unbound values, or C{int64} when all are bound integers), and
+    any other term as a C{TermColumn}. Columns are accessed by variable name, and rows by position::
+
+        results = data.sparql_tuple_query(query, dataset, columnar=True)
+        expensive = results.filter(results["price"] > 100)
+        expensive["price"].mean(), expensive.row(0)
+    """
+
+    def __init__(self, vars, columns, terms):
+        """
+        @param vars: variable names
+        @param columns: C{dict} of columns by variable name
+        @type terms: C{TermDictionary}
+        @param terms: dictionary of terms shared by the columns
+        """
+        self.vars = list(vars)
+        self.columns = columns
+        self.terms = terms
+
+    @classmethod
+    def from_json(cls, results):
+        """
+        Build the columns from the SPARQL JSON results format
+
+        @type results: C{dict}
+        @param results: parsed results of a SELECT query
+        @rtype: C{ColumnarResults}
+        """
+        if "results" not in results:
+            raise ValueError("columnar results are only available for SELECT queries")
+        vars = results["head"]["vars"]
+        bindings = results["results"]["bindings"]
+        terms = TermDictionary()
+        columns = OrderedDict((var, _build_column([b.get(var) for b in bindings], terms)) for var in vars)
+        return cls(vars, columns, terms)
+
+    def __len__(self):
+        return len(self.columns[self.vars[0]]) if self.vars else 0
+
+    def __getitem__(self, var):
+        return self.columns[var]
+
+    def __iter__(self):
+        columns = [self.columns[var].tolist() for var in self.vars]
+        return iter(zip(*columns))
+
+    def row(self, index, terms=False):
+        """
+        @type index: int
+        @param index: row position
+        @param terms: return rdflib terms for the term columns, instead of their values (default=False)
+        @rtype: C{dict}
+        @return: values of the row by variable name
+        """
+        row = {}
+        for var in self.vars:
+            column = self.columns[var]
+            row[var] = column.term(index) if terms and isinstance(column, TermColumn) else _item(column[index])
+        return row
+
+    def filter(self, mask):
+        """
+        @param mask: boolean mask (or array of positions) selecting the rows
+        @rtype: C{ColumnarResults}
+        @return: selected rows
+        """
+        columns = OrderedDict((var, self.columns[var][mask]) for var in self.vars)
+        return ColumnarResults(self.vars, columns, self.terms)
+
+    def __repr__(self):
+        return "ColumnarResults(%d rows, vars=%s)" % (len(self), self.vars)
+
+
+def _build_column(values, terms):
+    bound = [value for value in values if value is not None]
+    if bound and all(value["type"] in ("literal", "typed-literal") and value.get("datatype") in _NUMBERS
+                     for value in bound):
+        column = _build_numeric_column(values, len(bound) == len(values))
+        if column is not None:
+            return column
+
+    codes = numpy.empty(len(values), dtype=numpy.int32)
+    for i, value in enumerate(values):
+        codes[i] = terms.add(value) if value is not None else -1
+    return TermColumn(codes, terms)
+
+
+def _build_numeric_column(values, all_bound):
+    # None if any value is not a valid number for its datatype, so the column keeps the terms
+    try:
+        if all_bound and all(value["datatype"] in _INTEGERS for value in values):
+            try:
+                return numpy.array([int(value["value"]) for value in values], dtype=numpy.int64)
+            except OverflowError:
+                pass
+        return numpy.array([_float(value) if value is not None else numpy.nan for value in values],
+                           dtype=numpy.float64)
+    except (ValueError, OverflowError):
+        return None
+
+
+def _float(value):
+    # integers stored as floats (when some are unbound) must still be valid integers
+    return float(int(value["value"]) if value["datatype"] in _INTEGERS else value["value"])
+
+
+def _term_key(term):
+    if isinstance(term, Literal):
+        return "literal", str(term), term.language, str(term.datatype) if term.datatype else None
+    return ("bnode" if isinstance(term, BNode) else "uri"), str(term), None, None
+
+
+def _item(value):
+    return value.item() if isinstance(value, numpy.generic) else value
@@ -13,18 +13,27 @@
 # limitations under the License.
 
 import logging
-from rdflib.graph import Graph
-from SPARQLWrapper import SPARQLWrapper, JSON, POST, POSTDIRECTLY
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import json
 
-from . import __agent__
-from .client import RedlinkClient
+from .batch import bounded_map, chunked, BulkImportReport
+from .buffer import BufferedWriter
+from .cache import hash_key
+from .client import RedlinkClient, RedlinkClientBase
+from .deadline import submit
 from .format import from_mimetype, Format
+from .hooks import timed_parse
+from .profiling import section
 
 
-class RedlinkData(RedlinkClient):
+class RedlinkDataBase(RedlinkClientBase):
     """
-    Redlink Data Client
+    Behaviour shared by the blocking and the asyncio Redlink Data clients: the urls, queries and
+    payloads of the requests, and the parsing of their responses
     """
 
     path = "data"
@@ -36,12 +45,310 @@ class RedlinkData(RedlinkClient):
     sparql_update_path = "update"
     ldpath_path = "ldpath"
 
-    def __init__(self, key):
+    def _build_dataset_url(self, dataset, *segments):
+        return self._build_url("/".join(("", self.path, dataset) + segments))
+
+    def _build_resource_url(self, uri, dataset, path=None):
+        return self._build_url("/%s/%s/%s" % (self.path, dataset, path or self.resource_path), {self.param_uri: uri})
+
+    def _build_import_payload(self, data, mimetype):
+        rdf_format = from_mimetype(mimetype)
+        if not rdf_format:
+            rdf_format = Format.TURTLE
+
+        payload, rdf_format = self._get_payload_from_data(data, rdf_format)
+        return payload, rdf_format.mimetype
+
+    def _build_import_batches(self, data, mimetype, batch_size, max_retries):
+        from .ntriples import batch_lines
+        if max_retries < 0:
+            raise ValueError("max_retries cannot be negative")
+
+        rdf_format = from_mimetype(mimetype)
+        if not rdf_format:
+            rdf_format = Format.TURTLE
+        return batch_lines(self._get_ntriples_lines(data, rdf_format), batch_size)
+
+    def _check_batch_upload(self, dataset, response=None, error=None):
+        # error of an attempt of uploading a batch, or None if it succeeded
+        if error is not None:
+            logging.warn("Batch upload to %s failed: %s" % (dataset, error))
+            return error
+        if 200 <= response.status_code < 300:
+            return None
+        logging.warn("Batch upload to %s returned %d: %s" % (dataset, response.status_code, response.reason))
+        return RuntimeError("Import returned %d: %s" % (response.status_code, response.reason))
+
+    def _get_ntriples_lines(self, data, rdf_format):
+        from .ntriples import split_lines
+        if not _is_graph(data) and rdf_format != Format.NTRIPLES:
+            from rdflib.graph import Graph
+            graph = Graph()
+            with section("Graph.parse"):
+                if isinstance(data, (str, bytes)):
+                    graph.parse(data=data, format=rdf_format.rdflibMapping)
+                elif hasattr(data, "read"):
+                    graph.parse(file=data, format=rdf_format.rdflibMapping)
+                elif hasattr(data, "__fspath__"):
+                    graph.parse(source=data.__fspath__(), format=rdf_format.rdflibMapping)
+                else:
+                    graph.parse(data=b"".join(chunk if isinstance(chunk, bytes) else chunk.encode("UTF-8")
+                                              for chunk in data), format=rdf_format.rdflibMapping)
+            data = graph
+        payload, _ = self._get_payload_from_data(data, Format.NTRIPLES)
+        return split_lines(payload if payload is not None else [])
+
+    def _check_export(self, dataset, response):
+        if not 200 <= response.status_code < 300:
+            raise RuntimeError("Export of dataset %s returned %d: %s" %
+                               (dataset, response.status_code, response.reason))
+
+    def _build_delete_updates(self, uris, batch_size):
+        # built before sending any, so invalid uris are rejected before deleting anything
+        return [(batch, self._build_delete_subjects_query(batch)) for batch in chunked(uris, batch_size)]
+
+    def _record_deletes(self, outcomes, result, dataset):
+        batch = result.item[0]
+        if not result.ok:
+            logging.error("Deleting %d resources from %s failed: %s" % (len(batch), dataset, result.error))
+        for uri in batch:
+            outcomes[uri] = result.ok
+
+    def _build_subjects_query(self, subjects):
+        from .sync import SUBJECTS_QUERY
+        return SUBJECTS_QUERY % " ".join(s.n3() for s in subjects)
+
+    def _diff_fingerprints(self, local, results):
+        # remote fingerprints, subjects removed and changed, and triples of the new subjects
+        from rdflib.term import URIRef
+        from .sync import fingerprint
+        remote = dict((URIRef(b["s"]["value"]), b["h"]["value"]) for b in results["results"]["bindings"])
+        removed = [s for s in remote if s not in local]
+        changed = [s for s in local if s in remote and remote[s] != fingerprint(local[s])]
+        inserts = [(s, p, o) for s in local if s not in remote for p, o in local[s]]
+        return remote, removed, changed, inserts
+
+    def _diff_subjects(self, local, batch, results, inserts, deletes):
+        from rdflib.term import URIRef
+        from .sparql import term_from_binding
+        from .sync import normalize
+        current = {}
+        for b in results["results"]["bindings"]:
+            if b["o"]["type"] != "bnode":
+                o = term_from_binding(b["o"])
+                current.setdefault(URIRef(b["s"]["value"]), {})[(URIRef(b["p"]["value"]), normalize(o))] = o
+        for s in batch:
+            pairs = current.get(s, {})
+            deletes.extend((s, p, pairs[(p, o)]) for p, o in set(pairs) - local[s])
+            inserts.extend((s, p, o) for p, o in local[s] - set(pairs))
+
+    def _build_sync_updates(self, removed, inserts, deletes, batch_size):
+        from .ntriples import serialize_triple
+        updates = [self._build_delete_subjects_query(batch, keep_blank=True) for batch in chunked(removed, batch_size)]
+        updates.extend("DELETE DATA { %s }" % "".join(serialize_triple(t) for t in batch)
+                       for batch in chunked(deletes, batch_size))
+        updates.extend("INSERT DATA { %s }" % "".join(serialize_triple(t) for t in batch)
+                       for batch in chunked(inserts, batch_size))
+        return updates
+
+    def _check_sync_updates(self, failed, updates, dataset):
+        if failed:
+            raise RuntimeError("%d of %d updates syncing dataset %s failed, first error: %s" %
+                               (len(failed), len(updates), dataset, failed[0].error))
+
+    def _sync_outcome(self, remote, removed, changed, inserts, deletes):
+        return {
+            "inserted": len(inserts),
+            "deleted": len(deletes),
+            "removed": len(removed),
+            "unchanged": len(remote) - len(removed) - len(changed),
+        }
+
+    def _check_paged_query(self, query):
+        # the limit of a subquery would apply before the paging, and any other one would clash with it
+        if _LIMIT_OFFSET.search(_IGNORED_TOKENS.sub(" ", query)):
+            raise ValueError("paged queries cannot have their own LIMIT or OFFSET, not even in subqueries")
+
+    def _build_page_query(self, query, offset, page_size, max_rows):
+        # None once max_rows have been fetched
+        limit = page_size if max_rows is None else min(page_size, max_rows - offset)
+        if limit <= 0:
+            return None
+        return "%s\nLIMIT %d OFFSET %d" % (query, limit, offset)
+
+    def _build_rows_request(self, dataset, query):
+        resource, payload, mimetype, _ = self._build_sparql_request(dataset, query)
+        headers = {"User-Agent": self.user_agent, "Content-Type": mimetype, "Accept": "text/tab-separated-values"}
+        return resource, payload, headers
+
+    def _build_sparql_request(self, dataset, query, format=Format.JSON.name, update=False):
+        if update:
+            path = "/%s/%s/%s/%s" % (self.path, dataset, self.sparql_path, self.sparql_update_path)
+            mimetype = "application/sparql-update"
+        elif dataset is None:
+            path = "/%s/%s/%s" % (self.path, self.sparql_path, self.sparql_select_path)
+            mimetype = "application/sparql-query"
+        else:
+            path = "/%s/%s/%s/%s" % (self.path, dataset, self.sparql_path, self.sparql_select_path)
+            mimetype = "application/sparql-query"
+        if format == Format.TURTLE.name:
+            accept = Format.TURTLE.mimetype
+        else:
+            accept = "application/sparql-results+json,%s" % Format.JSON.mimetype
+        return self._build_url(path), query.encode("UTF-8"), mimetype, accept
+
+    def _check_sparql_response(self, response):
+        if not 200 <= response.status_code < 300:
+            raise RuntimeError("SPARQL request returned %d: %s" % (response.status_code, response.reason))
+
+    def _parse_sparql_results(self, response, format=Format.JSON.name, update=False):
+        self._check_sparql_response(response)
+        if update and not response.content:
+            return True
+        return self._parse_sparql_content(format, response.headers.get("Content-Type"), response.text)
+
+    def _parse_sparql_content(self, format, mimetype, text):
+        if format == Format.TURTLE.name:
+            return self._parse_rdf_content(mimetype, text)
+        else:
+            return self._parse_sparql_json(mimetype, text)
+
+    @timed_parse("sparql")
+    def _parse_sparql_json(self, mimetype, text):
+        with section("json.loads"):
+            return json.loads(text)
+
+    def _parse_rdf(self, response):
+        return self._parse_rdf_content(response.headers["Content-Type"], response.text)
+
+    @timed_parse("rdf")
+    def _parse_rdf_content(self, mimetype, text):
+        content_type = from_mimetype(mimetype)
+        if content_type.rdflibMapping:
+            from rdflib.graph import Graph
+            g = Graph()
+            with section("Graph.parse"):
+                g.parse(data=text, format=content_type.rdflibMapping)
+            return g
+        else:
+            logging.warn("Handler not found for parsing %s as RDF, so returning raw response..." % content_type.mimetype)
+            return text
+
+    def _build_delete_subjects_query(self, uris, keep_blank=False):
+        from .sparql import format_iri
+        values = " ".join(format_iri(uri) for uri in uris)
+        where = "?s ?p ?o FILTER(!isBlank(?o))" if keep_blank else "?s ?p ?o"
+        return "DELETE { ?s ?p ?o } WHERE { VALUES ?s { %s } %s }" % (values, where)
+
+    def _get_payload_from_data(self, data, rdf_format, chunk_size=65536):
+        # everything but strings is streamed (files as they are, the rest with chunked transfer encoding)
+        if data is None:
+            return None, rdf_format
+        elif isinstance(data, (str, bytes)):
+            return (data if data else None), rdf_format
+        elif _is_graph(data):
+            # only a line-based serialization can be produced incrementally
+            from .ntriples import serialize_triples
+            return serialize_triples(data), Format.NTRIPLES
+        elif hasattr(data, "read"):
+            if isinstance(data.read(0), bytes):
+                return data, rdf_format
+            else:
+                return _encode_chunks(iter(lambda: data.read(chunk_size), "")), rdf_format
+        elif hasattr(data, "__fspath__"):
+            return _read_chunks(data.__fspath__(), chunk_size), rdf_format
+        elif hasattr(data, "__iter__"):
+            return _encode_chunks(data), rdf_format
+        else:
+            raise ValueError("unsupported type %s as data payload" % type(data))
+
+    def _build_dataset_base_uri(self, dataset):
+        return "%s/%s/%s/" % (self.datahub, self.status["owner"], dataset)
+
+    def _plan_ldpath_many(self, uris, program, sparql, batch_size):
+        # simple program (if evaluated with SPARQL) and the items to evaluate: batches of uris, or uris
+        from .ldpath import SimpleProgram
+        from .sparql import format_iri
+        simple = SimpleProgram.parse(program) if sparql else None
+        if simple:
+            # checked before sending any query, as for the deletes
+            unique = list(_unique(uris))
+            for uri in unique:
+                format_iri(uri)
+            return simple, chunked(unique, batch_size)
+        return None, _unique(uris)
+
+    def _simple_ldpath_pairs(self, simple, batch, results):
+        return list(simple.results(batch, results["results"]["bindings"]).items())
+
+    def _record_ldpath(self, result, failed):
+        # (uri, results) pairs of an evaluation
+        if result.ok:
+            return result.value
+        logging.error("LDPath evaluation for %s failed: %s" % (result.item, result.error))
+        failed.append(result)
+        return []
+
+    def _check_ldpath_many(self, failed, simple):
+        if failed:
+            raise RuntimeError("LDPath evaluation failed for %d %s, first error: %s" %
+                               (len(failed), "batches" if simple else "resources", failed[0].error))
+
+    def _parse_ldpath(self, response):
+        if 200 <= response.status_code < 300:
+            return self._parse_ldpath_content(response.headers["Content-Type"], response.text)
+        else:
+            raise RuntimeError("LDPath program evaluation returned %d: %s" % (response.status_code, response.reason))
+
+    @timed_parse("ldpath")
+    def _parse_ldpath_content(self, mimetype, text):
+        if Format.JSON == from_mimetype(mimetype):
+            with section("json.loads"):
+                return json.loads(text)
+        else:
+            logging.warn("Content type should be 'application/json' but was %s" % mimetype)
+            return text
+
+
+class RedlinkData(RedlinkClient, RedlinkDataBase):
+    """
+    Redlink Data Client
+    """
+
+    cache = None
+
+    def __init__(self, key, transport=None, lazy=False, cache=None, timeout=None, hedging=None, limiter=None,
+                 endpoint=None):
         """
         @type key: str
         @param key: api key
+
+        @type transport: C{Transport}
+        @param transport: transport used to send the requests (default: shared pooled transport)
+
+        @type lazy: bool
+        @param lazy: do not validate the key until the status is first needed (default=False)
+
+        @type cache: C{Cache}
+        @param cache: cache for the results of SPARQL queries and LDPath programs, invalidated for a
+                      dataset whenever this client writes to it (default: no cache)
+
+        @type timeout: float
+        @param timeout: default timeout of the requests, in seconds, capped by any C{deadline} (default: none)
+
+        @type hedging: C{Hedging}
+        @param hedging: policy for hedging slow queries and LDPath programs (default: no hedging)
+
+        @type limiter: C{AdaptiveLimiter}
+        @param limiter: limiter of the requests in flight, retrying and circuit breaking (default: none)
+
+        @type endpoint: str
+        @param endpoint: base url of the api, such as the one of a local emulator (default: the service)
         """
-        super(RedlinkData, self).__init__(key)
+        super(RedlinkData, self).__init__(key, transport, lazy, timeout, hedging, limiter, endpoint)
+        self.cache = cache
+        self._generations = {}
+        self._generations_lock = threading.Lock()
 
     def release(self, dataset):
         """
@@ -49,15 +356,19 @@ class RedlinkData(RedlinkClient):
 
         @param dataset: dataset name
         """
-        resource = self._build_url("/%s/%s/%s" % (self.path, dataset, self.release_path))
-        response = self._post(resource, accept="application/json")
+        resource = self._build_dataset_url(dataset, self.release_path)
+        try:
+            response = self._post(resource, accept="application/json")
+        finally:
+            self._invalidate(dataset)
         return 200 <= response.status_code < 300
 
     def import_dataset(self, data, mimetype, dataset, clean_before=False):
         """
         Import RDF data into the dataset
 
-        @param data: data to import, either as C{str}, {rdflib.Graph} or C{file}
+        @param data: data to import, either as C{str}, C{bytes}, C{rdflib.Graph}, C{file}, path
+                     (C{os.PathLike}) or iterable of C{str}/C{bytes} chunks, all but strings streamed
         @param mimetype: mimetype of the data
         @param dataset: dataset name
         @param clean_before: clean data in dataset before importing (default=False)
@@ -65,17 +376,71 @@ class RedlinkData(RedlinkClient):
         @rtype: C{bool}
         @return: success or not
         """
-        resource = self._build_url("/%s/%s" % (self.path, dataset))
-
-        rdf_format = from_mimetype(mimetype)
-        if not rdf_format:
-            rdf_format = Format.TURTLE
-
-        payload = self._get_payload_from_data(data, rdf_format)
+        resource = self._build_dataset_url(dataset)
+        payload, mimetype = self._build_import_payload(data, mimetype)
         method = self._put if clean_before else self._post
-        response = method(resource, payload, mimetype=rdf_format.mimetype)
+        try:
+            response = method(resource, payload, mimetype=mimetype)
+        finally:
+            self._invalidate(dataset)
         return 200 <= response.status_code < 300
 
+    def bulk_import_dataset(self, data, mimetype, dataset, batch_size=10000, max_workers=4, max_retries=3,
+                            progress=None, clean_before=False, release=False):
+        """
+        Import RDF data into the dataset in batches of triples, uploaded in parallel. Failed batches
+        are retried on their own, so a failure does not require uploading everything again.
+        N-Triples data and graphs are split while they are read; any other format needs to be
+        parsed (in memory) first. Triples with blank nodes are held in memory and uploaded together
+        in a last batch, so the ones sharing a blank node still share it in the dataset.
+
+        @param data: data to import, as accepted by C{import_dataset}
+        @param mimetype: mimetype of the data
+        @param dataset: dataset name
+        @param batch_size: triples per batch (default=10000)
+        @param max_workers: maximum number of batches uploaded concurrently (default=4)
+        @param max_retries: times a failed batch is retried (default=3)
+        @param progress: function called with the C{BulkImportReport} after each batch
+        @param clean_before: clean data in dataset before importing (default=False)
+        @param release: release the dataset once all batches succeeded (default=False)
+
+        @rtype: C{BulkImportReport}
+        @return: import report, with the batches that finally failed
+        """
+        resource = self._build_dataset_url(dataset)
+        batches = self._build_import_batches(data, mimetype, batch_size, max_retries)
+
+        if clean_before and not self.clean_dataset(dataset):
+            raise RuntimeError("Cleaning dataset %s before importing failed" % dataset)
+
+        def upload(batch):
+            payload = b"".join(batch)
+            for attempt in range(max_retries + 1):
+                if attempt > 0:
+                    time.sleep(_retry_delay(attempt))
+                try:
+                    response = self._post(resource, payload, mimetype=Format.NTRIPLES.mimetype)
+                except Exception as e:
+                    error = self._check_batch_upload(dataset, error=e)
+                    continue
+                error = self._check_batch_upload(dataset, response)
+                if error is None:
+                    return len(batch), len(payload)
+            raise error
+
+        report = BulkImportReport()
+        try:
+            for result in bounded_map(upload, batches, max_workers, ordered=False):
+                report.add(result)
+                if progress:
+                    progress(report)
+        finally:
+            self._invalidate(dataset)
+
+        if release and report.ok and not self.release(dataset):
+            raise RuntimeError("Releasing dataset %s after importing failed" % dataset)
+        return report
+
     def export_dataset(self, dataset):
         """
         Export the RDF data from a dataset
@@ -85,17 +450,66 @@ class RedlinkData(RedlinkClient):
         @rtype: C{rdflib.Graph}
         @return: data
         """
-        resource = self._build_url("/%s/%s" % (self.path, dataset))
-        rdf_format = Format.TURTLE
-        response = self._get(resource, accept=rdf_format.mimetype)
-        content_type = from_mimetype(response.headers["Content-Type"])
-        if content_type.rdflibMapping:
-            g = Graph()
-            g.parse(data=response.text, format=content_type.rdflibMapping)
-            return g
-        else:
-            logging.warn("Handler not found for parsing %s as RDF, so returning raw response..." % content_type.mimetype)
-            return response.text
+        resource = self._build_dataset_url(dataset)
+        response = self._get(resource, accept=Format.TURTLE.mimetype)
+        return self._parse_rdf(response)
+
+    def export_dataset_to(self, dataset, destination, mimetype=Format.NTRIPLES.mimetype, chunk_size=65536):
+        """
+        Export the RDF data from a dataset straight into a file, streaming the response
+        so the dataset is never held in memory
+
+        @param dataset: dataset name
+        @param destination: path or (binary) file object to write to
+        @param mimetype: mimetype to export the data as (default=N-Triples)
+        @param chunk_size: size of the chunks written (in bytes)
+
+        @rtype: C{int}
+        @return: number of bytes written
+        """
+        response = self._export_stream(dataset, mimetype)
+        try:
+            if hasattr(destination, "write"):
+                return self._write_stream(response, destination, chunk_size)
+            else:
+                with open(destination, "wb") as f:
+                    return self._write_stream(response, f, chunk_size)
+        finally:
+            response.close()
+
+    def iter_dataset_triples(self, dataset):
+        """
+        Export the RDF data from a dataset as N-Triples, parsing the response while it is
+        streamed, so the dataset is never held in memory
+
+        @param dataset: dataset name
+
+        @rtype: generator of C{tuple}
+        @return: triples
+        """
+        from .ntriples import parse_lines
+        response = self._export_stream(dataset, Format.NTRIPLES.mimetype)
+        try:
+            for triple in parse_lines(response.iter_lines()):
+                yield triple
+        finally:
+            response.close()
+
+    def _export_stream(self, dataset, mimetype):
+        response = self._get(self._build_dataset_url(dataset), accept=mimetype, stream=True)
+        try:
+            self._check_export(dataset, response)
+        except RuntimeError:
+            response.close()
+            raise
+        return response
+
+    def _write_stream(self, response, f, chunk_size):
+        written = 0
+        for chunk in response.iter_content(chunk_size):
+            f.write(chunk)
+            written += len(chunk)
+        return written
 
     def clean_dataset(self, dataset):
         """
@@ -106,15 +520,19 @@ class RedlinkData(RedlinkClient):
         @rtype: C{bool}
         @return: success or not
         """
-        resource = self._build_url("/%s/%s" % (self.path, dataset))
-        response = self._delete(resource)
+        resource = self._build_dataset_url(dataset)
+        try:
+            response = self._delete(resource)
+        finally:
+            self._invalidate(dataset)
         return 200 <= response.status_code < 300
 
     def import_resource(self, data, mimetype, uri, dataset, clean_before=False):
         """
         Import data for a resource
 
-        @param data: data to import, either as C{str}, {rdflib.Graph} or C{file}
+        @param data: data to import, either as C{str}, C{bytes}, C{rdflib.Graph}, C{file}, path
+                     (C{os.PathLike}) or iterable of C{str}/C{bytes} chunks, all but strings streamed
         @param mimetype: mimetype of the data
         @param uri: reource uri
         @param dataset: dataset name
@@ -123,17 +541,33 @@ class RedlinkData(RedlinkClient):
         @rtype: C{bool}
         @return: success or not
         """
-        resource = self._build_url("/%s/%s/%s" % (self.path, dataset, self.resource_path), {self.param_uri: uri})
-
-        rdf_format = from_mimetype(mimetype)
-        if not rdf_format:
-            rdf_format = Format.TURTLE
-
-        payload = self._get_payload_from_data(data, rdf_format)
+        resource = self._build_resource_url(uri, dataset)
+        payload, mimetype = self._build_import_payload(data, mimetype)
         method = self._put if clean_before else self._post
-        response = method(resource, payload, mimetype=rdf_format.mimetype)
+        try:
+            response = method(resource, payload, mimetype=mimetype)
+        finally:
+            self._invalidate(dataset)
         return 200 <= response.status_code < 300
 
+    def buffered_writer(self, dataset, max_triples=10000, max_delay=5.0, max_pending=2):
+        """
+        Create a write-behind buffer for importing many resources into a dataset with a few bulk
+        requests, to be used as a context manager::
+
+            with data.buffered_writer("dataset") as writer:
+                writer.import_resource(data, mimetype, uri, clean_before=True)
+
+        @param dataset: dataset name
+        @param max_triples: triples buffered before flushing (default=10000)
+        @param max_delay: seconds a resource can stay in the buffer (default=5)
+        @param max_pending: flushes waiting to be written before blocking writers (default=2)
+
+        @rtype: C{BufferedWriter}
+        @return: writer
+        """
+        return BufferedWriter(self, dataset, max_triples, max_delay, max_pending)
+
     def export_resource(self, uri, dataset):
         """
         Export the RDF data from a resource
@@ -144,17 +578,8 @@ class RedlinkData(RedlinkClient):
         @rtype: C{rdflib.Graph}
         @return: data
         """
-        resource = self._build_url("/%s/%s/%s" % (self.path, dataset, self.resource_path), {self.param_uri: uri})
-        rdf_format = Format.TURTLE
-        response = self._get(resource, accept=rdf_format.mimetype)
-        content_type = from_mimetype(response.headers["Content-Type"])
-        if content_type.rdflibMapping:
-            g = Graph()
-            g.parse(data=response.text, format=content_type.rdflibMapping)
-            return g
-        else:
-            logging.warn("Handler not found for parsing %s as RDF, so returning raw response..." % content_type.mimetype)
-            return response.text
+        response = self._get(self._build_resource_url(uri, dataset), accept=Format.TURTLE.mimetype)
+        return self._parse_rdf(response)
 
     def delete_resource(self, uri, dataset):
         """
@@ -166,20 +591,171 @@ class RedlinkData(RedlinkClient):
         @rtype: C{bool}
         @return: success or not
         """
-        resource = self._build_url("/%s/%s/%s" % (self.path, dataset, self.resource_path), {self.param_uri: uri})
-        response = self._delete(resource)
+        resource = self._build_resource_url(uri, dataset)
+        try:
+            response = self._delete(resource)
+        finally:
+            self._invalidate(dataset)
         return 200 <= response.status_code < 300
 
-    def sparql_tuple_query(self, query, dataset=None):
+    def delete_resources(self, uris, dataset, batch_size=500, max_in_flight=4):
+        """
+        Delete many resources, with a few SPARQL updates deleting a batch of resources each
+
+        @param uris: resource uris
+        @param dataset: dataset name
+        @param batch_size: resources deleted per update (default=500)
+        @param max_in_flight: maximum number of concurrent updates (default=4)
+
+        @rtype: C{dict}
+        @return: success or not per resource uri
+        @raise ValueError: if any uri is not a valid IRI, before deleting anything
+        """
+        updates = self._build_delete_updates(uris, batch_size)
+
+        def delete(update):
+            self.sparql_update(update[1], dataset)
+
+        outcomes = {}
+        for result in bounded_map(delete, updates, max_in_flight, ordered=False):
+            self._record_deletes(outcomes, result, dataset)
+        return outcomes
+
+    def sync_dataset(self, data, dataset, batch_size=1000, max_in_flight=4):
+        """
+        Make the dataset contain exactly the given triples, sending only the difference. The remote
+        triples are only downloaded for the subjects whose fingerprint differs from the local one.
+        Blank nodes are not supported, and remote triples with blank node objects are left untouched,
+        even for the subjects removed as a whole.
+
+        @param data: C{rdflib.Graph} or iterable of triples
+        @param dataset: dataset name
+        @param batch_size: subjects or triples per request (default=1000)
+        @param max_in_flight: maximum number of concurrent updates (default=4)
+
+        @rtype: C{dict}
+        @return: number of triples C{inserted} and C{deleted}, of subjects C{removed} as a whole, and of
+                 subjects C{unchanged}
+        @raise RuntimeError: if any update failed
+        """
+        from .sync import FINGERPRINTS_QUERY, group_by_subject
+        local = group_by_subject(data)
+        results = self._sparql_query(dataset, FINGERPRINTS_QUERY)
+        remote, removed, changed, inserts = self._diff_fingerprints(local, results)
+        deletes = []
+        for batch in chunked(changed, batch_size):
+            results = self._sparql_query(dataset, self._build_subjects_query(batch))
+            self._diff_subjects(local, batch, results, inserts, deletes)
+
+        updates = self._build_sync_updates(removed, inserts, deletes, batch_size)
+        failed = [r for r in bounded_map(lambda update: self.sparql_update(update, dataset), updates, max_in_flight)
+                  if not r.ok]
+        self._check_sync_updates(failed, updates, dataset)
+        return self._sync_outcome(remote, removed, changed, inserts, deletes)
+
+    def sparql_tuple_query(self, query, dataset=None, columnar=False):
         """
         Execute a tuple query (SELECT or ASK)
 
         @param query: query
         @param dataset: dataset name
+        @param columnar: return the results of a SELECT query column by column, as a
+                         C{redlink.columnar.ColumnarResults} (requires numpy, default=False)
         @rtype: C{dict}
         @return: query results
         """
-        return self._sparql_query(dataset, query, Format.JSON.name)
+        results = self._cached_sparql_query(dataset, query, Format.JSON.name)
+        if columnar:
+            from .columnar import ColumnarResults
+            return ColumnarResults.from_json(results)
+        return results
+
+    def iter_sparql_tuple_query(self, query, dataset=None, page_size=1000, max_rows=None, prefetch=True):
+        """
+        Execute a SELECT query lazily, paging through the results with LIMIT and OFFSET. The query
+        should have an ORDER BY clause, so pages are stable, and no LIMIT or OFFSET of its own, not even
+        in a subquery. Paging goes on until an empty page, as the service may return shorter ones.
+
+        @param query: query
+        @param dataset: dataset name
+        @param page_size: rows per page (default=1000)
+        @param max_rows: maximum number of rows (default: all)
+        @param prefetch: fetch the next page while the current one is consumed (default=True)
+
+        @rtype: generator of C{dict}
+        @return: bindings of each row
+        """
+        self._check_paged_query(query)
+
+        def fetch(offset):
+            paged = self._build_page_query(query, offset, page_size, max_rows)
+            if paged is None:
+                return []
+            return self.sparql_tuple_query(paged, dataset)["results"]["bindings"]
+
+        executor = ThreadPoolExecutor(1) if prefetch else None
+        try:
+            offset = 0
+            page = fetch(offset)
+            while page:
+                offset += len(page)
+                # the service may return shorter pages than requested, so only an empty one is the last
+                last = max_rows is not None and offset >= max_rows
+                following = None
+                if not last and executor:
+                    following = submit(executor, fetch, offset)
+                for row in page:
+                    yield row
+                if last:
+                    break
+                page = following.result() if following else fetch(offset)
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
+    def iter_sparql_rows(self, query, dataset=None, terms=False):
+        """
+        Execute a SELECT query requesting the compact SPARQL TSV results format, and parse the
+        rows while the response is streamed, so they are available as soon as they arrive::
+
+            with data.iter_sparql_rows(query, dataset) as rows:
+                for s, o in rows:
+                    ...
+
+        @param query: query
+        @param dataset: dataset name
+        @param terms: build rdflib terms, instead of plain C{str} values (default=False)
+
+        @rtype: C{TupleRows}
+        @return: rows as tuples, with the names of the variables in C{vars}
+        """
+        from .sparql import TupleRows
+        resource, payload, headers = self._build_rows_request(dataset, query)
+        response = self._request("POST", resource, payload, headers, stream=True)
+        try:
+            self._check_sparql_response(response)
+        except RuntimeError:
+            response.close()
+            raise
+        return TupleRows(response.iter_lines(), terms, response.close)
+
+    def prepare_sparql_query(self, query, dataset=None, format=Format.JSON.name):
+        """
+        Prepare a query (SELECT, ASK, CONSTRUCT or DESCRIBE) to be executed many times, with
+        different terms bound to its variables::
+
+            labels = data.prepare_sparql_query("SELECT ?label WHERE { ?s rdfs:label ?label }", dataset)
+            for uri in uris:
+                results = labels.execute(s=URIRef(uri))
+
+        @param query: query template
+        @param dataset: dataset name
+        @param format: C{json} for tuple queries (default), C{turtle} for graph queries
+        @rtype: C{PreparedQuery}
+        @return: prepared query
+        """
+        from .sparql import PreparedQuery
+        return PreparedQuery(self, query, dataset, format)
 
     def sparql_graph_query(self, query, dataset):
         """
@@ -190,7 +766,7 @@ class RedlinkData(RedlinkClient):
         @rtype: C{rdflib.Graph}
         @return: query results
         """
-        return self._sparql_query(dataset, query, Format.TURTLE.name)
+        return self._cached_sparql_query(dataset, query, Format.TURTLE.name)
 
     def sparql_update(self, query, dataset):
         """
@@ -200,46 +776,44 @@ class RedlinkData(RedlinkClient):
         @param dataset: dataset name
         @return: query results
         """
-        return self._sparql_query(dataset, query, Format.JSON.name)
-
-    def _sparql_query(self, dataset, query, format=JSON):
-        if dataset is None:
-            sparql_endpoint_select = "%s/%s/%s/%s/%s" % (self.endpoint, self.version, self.path,
-                                                         self.sparql_path, self.sparql_select_path)
-        else:
-            sparql_endpoint_select = "%s/%s/%s/%s/%s/%s" % (self.endpoint, self.version, self.path,
-                                                            dataset, self.sparql_path, self.sparql_select_path)
-        sparql_endpoint_update = "%s/%s/%s/%s/%s/%s" % (self.endpoint, self.version, self.path,
-                                                        dataset, self.sparql_path, self.sparql_update_path)
-        sparql = SPARQLWrapper(sparql_endpoint_select, sparql_endpoint_update)
-        sparql.addCustomParameter(self.param_key, self.key)
-        sparql.agent = __agent__
-        sparql.setMethod(POST)
-        sparql.setRequestMethod(POSTDIRECTLY)
-        sparql.setReturnFormat(format)
-        sparql.setQuery(query)
-        return sparql.query().convert()
-
-    def _get_payload_from_data(self, data, rdf_format):
-        # TODO: do this in a more pythonic way
-        if (data):
-            if isinstance(data, str):
-                return data
-            elif isinstance(data, Graph):
-                return data.serialize(format=rdf_format.rdflibMapping)
-            elif hasattr(data, 'read'):
-                raw = data.read()
-                try:
-                    return raw.encode('UTF-8')
-                except UnicodeDecodeError:
-                    return raw
-            else:
-                raise ValueError("unsupported type %s as data payload" % type(data))
-        else:
+        try:
+            return self._sparql_query(dataset, query, Format.JSON.name, update=True)
+        finally:
+            self._invalidate(dataset)
+
+    def _sparql_query(self, dataset, query, format=Format.JSON.name, update=False):
+        resource, payload, mimetype, accept = self._build_sparql_request(dataset, query, format, update)
+        response = self._post(resource, payload, mimetype, accept, idempotent=not update)
+        return self._parse_sparql_results(response, format, update)
+
+    def _cached_sparql_query(self, dataset, query, format):
+        from .sparql import normalize_query
+        cache_key = self._build_cache_key("sparql", dataset, format, normalize_query(query))
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return self._parse_sparql_content(format, *cached)
+
+        resource, payload, mimetype, accept = self._build_sparql_request(dataset, query, format)
+        response = self._post(resource, payload, mimetype, accept, idempotent=True)
+        if cache_key and 200 <= response.status_code < 300:
+            self.cache.put(cache_key, (response.headers["Content-Type"], response.text))
+        return self._parse_sparql_results(response, format)
+
+    def _build_cache_key(self, kind, dataset, *parts):
+        # the generation of the dataset changes with every write, so older results are never hit again
+        if self.cache is None:
             return None
+        generation = str(self._generations.get(dataset, 0))
+        return hash_key(kind, self.endpoint, self.key, dataset or "", generation, *parts)
 
-    def _build_dataset_base_uri(self, dataset):
-        return "%s/%s/%s/" % (self.datahub, self.status["owner"], dataset)
+    def _invalidate(self, dataset):
+        # queries without dataset run over all of them, so they are invalidated by any write
+        if self.cache is None:
+            return
+        with self._generations_lock:
+            for name in set([dataset, None]):
+                self._generations[name] = self._generations.get(name, 0) + 1
 
     def ldpath(self, uri, program, dataset):
         """
@@ -251,14 +825,90 @@ class RedlinkData(RedlinkClient):
         @rtype: C{dict}
         @return: results
         """
-        resource = self._build_url("/%s/%s/%s" % (self.path, dataset, self.ldpath_path), {self.param_uri: uri})
-        response = self._post(resource, program, accept=Format.JSON.mimetype)
-        if 200 <= response.status_code < 300:
-            content_type = from_mimetype(response.headers["Content-Type"])
-            if Format.JSON == content_type:
-                return json.loads(response.text)
-            else:
-                logging.warn("Content type should be 'application/json' but was %s" % response.headers["Content-Type"])
-                return response.text
+        from .sparql import normalize_query
+        cache_key = self._build_cache_key("ldpath", dataset, uri, normalize_query(program))
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return self._parse_ldpath_content(*cached)
+
+        resource = self._build_resource_url(uri, dataset, self.ldpath_path)
+        response = self._post(resource, program, accept=Format.JSON.mimetype, idempotent=True)
+        if cache_key and 200 <= response.status_code < 300:
+            self.cache.put(cache_key, (response.headers["Content-Type"], response.text))
+        return self._parse_ldpath(response)
+
+    def ldpath_many(self, uris, program, dataset, max_in_flight=8, sparql=False, batch_size=100):
+        """
+        Evaluate a LDPath program for many context resources concurrently, keeping at most
+        C{max_in_flight} requests in flight. Duplicated uris are only evaluated once, and results
+        are yielded as soon as they are available::
+
+            for uri, results in data.ldpath_many(uris, program, dataset):
+                ...
+
+        Simple programs (see C{redlink.ldpath}) can be translated into SPARQL instead, evaluating
+        them for a whole batch of resources with a single query.
+
+        @param uris: context resource uris
+        @param program: ldpath program
+        @param dataset: dataset name
+        @param max_in_flight: maximum number of concurrent requests (default=8)
+        @param sparql: evaluate simple programs with SPARQL queries (default=False)
+        @param batch_size: resources per SPARQL query (default=100)
+
+        @rtype: generator of C{tuple}
+        @return: (uri, results) pairs, in completion order
+        @raise ValueError: if any uri is not a valid IRI, when evaluating with SPARQL, before evaluating anything
+        @raise RuntimeError: once all the others have been yielded, if the evaluation failed for any resource
+        """
+        simple, items = self._plan_ldpath_many(uris, program, sparql, batch_size)
+        if simple:
+            def evaluate(batch):
+                return self._simple_ldpath_pairs(simple, batch, self._sparql_query(dataset, simple.query(batch)))
         else:
-            raise RuntimeError("LDPath program evaluation returned %d: %s", response.status_code, response.reason)
+            def evaluate(uri):
+                return [(uri, self.ldpath(uri, program, dataset))]
+
+        failed = []
+        for result in bounded_map(evaluate, items, max_in_flight, ordered=False):
+            for pair in self._record_ldpath(result, failed):
+                yield pair
+        self._check_ldpath_many(failed, simple)
+
+
+# literals, IRIs and comments, which may contain anything, skipped when looking for keywords
+_IGNORED_TOKENS = re.compile(r'"""(?:[^"\\]|\\.|"(?!""))*"""|\'\'\'(?:[^\'\\]|\\.|\'(?!\'\'))*\'\'\'|'
+                             r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|<[^<>"{}|^`\\\s]*>|#[^\n]*')
+# LIMIT or OFFSET keywords, not variables or prefixed names
+_LIMIT_OFFSET = re.compile(r"(?<![?$\w:-])(LIMIT|OFFSET)(?![\w:-])", re.IGNORECASE)
+
+
+def _retry_delay(attempt):
+    # exponential backoff between the attempts of uploading a batch
+    return min(0.5 * 2 ** (attempt - 1), 10)
+
+
+def _unique(items):
+    seen = set()
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            yield item
+
+
+def _encode_chunks(chunks):
+    for chunk in chunks:
+        yield chunk if isinstance(chunk, bytes) else chunk.encode("UTF-8")
+
+
+def _read_chunks(path, chunk_size):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            yield chunk
+
+
+def _is_graph(data):
+    # rdflib is only imported when needed, and there cannot be graphs before it is
+    graph = sys.modules.get("rdflib.graph")
+    return graph is not None and isinstance(data, graph.Graph)
@@ -0,0 +1,80 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-call deadlines, applying to all the requests sent while they are active::
+
+    with redlink.deadline(2.5):
+        enhancements = analysis.enhance(content)
+
+The deadline is kept in a context variable, so it follows asyncio tasks, and it is carried
+into the threads the clients use for concurrent requests.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+_expires = ContextVar("redlink_deadline", default=None)
+
+
+class DeadlineExceeded(RuntimeError):
+    """
+    Raised when a request would be sent after the deadline
+    """
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Limit the time available for the requests sent within the block; nested deadlines can only
+    shorten the enclosing one
+
+    @type seconds: float
+    @param seconds: time available, from now
+    """
+    expires = time.monotonic() + seconds
+    current = _expires.get()
+    token = _expires.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _expires.reset(token)
+
+
+def remaining(timeout=None):
+    """
+    Time left until the current deadline
+
+    @param timeout: default timeout, also capping the time left (default: none)
+    @return: seconds, or C{None} if there is neither deadline nor default timeout
+    @raise DeadlineExceeded: if the deadline has already expired
+    """
+    expires = _expires.get()
+    if expires is None:
+        return timeout
+    left = expires - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("deadline exceeded by %.3f seconds" % -left)
+    return left if timeout is None else min(left, timeout)
+
+
+def submit(executor, func, *args):
+    """
+    Submit a function to an executor, running it within the deadline (and any other context
+    variable) of the caller
+
+    @rtype: C{Future}
+    """
+    return executor.submit(copy_context().run, func, *args)
@@ -74,6 +74,7 @@ class Format:
     RDFJSON = FormatDef("rdfjson", "application/rdf+json")
     TURTLE = FormatDef("turtle", "text/turtle", "turtle")
     NT = FormatDef("nt", "text/rdf+n3", "n3")
+    NTRIPLES = FormatDef("ntriples", "application/n-triples", "nt")
 
 
 def from_mimetype(mimetype):
@@ -0,0 +1,162 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .deadline import submit
+
+
+class Hedging(object):
+    """
+    Hedged requests: when a request has not answered after the given percentile of the recent
+    latencies, a duplicate is sent and the first successful answer is taken (an error status is
+    only taken when the other request fails too). Extra load is limited by a
+    budget: each request earns C{budget} duplicates, which can be saved up to C{burst}. Only
+    used for requests without side effects (enhancements, queries, LDPath).
+    """
+
+    def __init__(self, percentile=95, window=200, min_samples=20, budget=0.05, burst=10, max_workers=32):
+        """
+        @param percentile: percentile of the recent latencies after which a duplicate is sent (default=95)
+        @param window: number of recent latencies kept (default=200)
+        @param min_samples: latencies needed before hedging (default=20)
+        @param budget: duplicates earned per request, 0.05 meaning at most 5% of extra requests (default=0.05)
+        @param burst: maximum number of duplicates saved up (default=10)
+        @param max_workers: threads sending hedged requests (default=32)
+        """
+        if not 0 < percentile < 100:
+            raise ValueError("percentile must be between 0 and 100")
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.budget = budget
+        self.burst = burst
+        self.requests = 0
+        self.hedged = 0
+        self.won = 0
+        self._latencies = deque(maxlen=window)
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers)
+
+    def delay(self):
+        """
+        @rtype: float
+        @return: seconds after which a duplicate is sent, or C{None} if there are not enough latencies yet
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.percentile / 100.0))]
+
+    def call(self, send, timeout=None, limiter=None):
+        """
+        Send a request, hedging it when it is slow
+
+        @param send: function sending the request, returning its response
+        @param timeout: seconds available for the request (default: unlimited)
+        @param limiter: C{AdaptiveLimiter} the duplicate needs a slot of (default: none)
+        @return: first successful response, or the error one if both failed
+        """
+        delay = self.delay()
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self._tokens + self.budget, self.burst)
+        if delay is None or (timeout is not None and delay >= timeout):
+            return self._timed(send)
+
+        primary = submit(self._executor, self._timed, send)
+        done, _ = wait([primary], delay)
+        if done or not self._spend(limiter):
+            return primary.result()
+
+        logging.debug("Hedging request after %.3f seconds" % delay)
+        backup = submit(self._executor, self._timed, send if limiter is None else _limited(send, limiter))
+        pending = set([primary, backup])
+        failed = None
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                elif _is_error(future.result()) and (pending or len(done) > 1):
+                    # the other request may still succeed
+                    if failed is None:
+                        failed = future
+                    else:
+                        _discard(future)
+                else:
+                    return self._win(future, backup, (done | pending | set([failed])) - set([future, None]))
+        if failed is not None:
+            return self._win(failed, backup, set())
+        raise error
+
+    def stats(self):
+        """
+        @rtype: C{dict}
+        @return: number of C{requests}, of C{hedged} ones, of duplicates that answered first
+                 (C{won}), and current C{delay}
+        """
+        return {"requests": self.requests, "hedged": self.hedged, "won": self.won, "delay": self.delay()}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def _spend(self, limiter):
+        with self._lock:
+            if self._tokens < 1 or (limiter is not None and not limiter.acquire_duplicate()):
+                return False
+            self._tokens -= 1
+            self.hedged += 1
+            return True
+
+    def _win(self, future, backup, others):
+        for other in others:
+            other.add_done_callback(_discard)
+        if future is backup:
+            with self._lock:
+                self.won += 1
+        return future.result()
+
+    def _timed(self, send):
+        start = time.monotonic()
+        response = send()
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+        return response
+
+
+def _limited(send, limiter):
+    def duplicate():
+        try:
+            return send()
+        finally:
+            limiter.release_duplicate()
+    return duplicate
+
+
+def _is_error(response):
+    status = getattr(response, "status_code", None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+def _discard(future):
+    # release the connection of the response that lost the race
+    if future.exception() is None and hasattr(future.result(), "close"):
+        future.result().close()
@@ -0,0 +1,156 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Instrumentation hooks of the clients, to see where the time of a call goes: in the requests
+(and their retries) or in the parsing of the responses. Clients without hooks skip all of it.
+"""
+
+import functools
+import logging
+import re
+import time
+
+_KEY = re.compile(r"([?&]key=)[^&]*")
+
+
+class Hook(object):
+    """
+    Base class of the hooks added to a client with C{add_hook}, whose methods do nothing: override
+    the ones needed. Hooks are called in the thread sending the request (or parsing its response),
+    so they should be fast and thread safe; their errors are logged and ignored.
+    """
+
+    def before_request(self, request):
+        """
+        Called before a request is sent
+
+        @type request: C{RequestInfo}
+        @param request: request
+        """
+        pass
+
+    def after_response(self, request, response):
+        """
+        Called once the response of a request has been received (after any retry), or sending it failed
+
+        @type request: C{RequestInfo}
+        @param request: request, with its C{elapsed} time, C{status} and C{error}
+        @param response: response, or C{None} if sending the request failed
+        """
+        pass
+
+    def on_parse_done(self, kind, mimetype, size, elapsed):
+        """
+        Called once the content of a response has been parsed
+
+        @param kind: kind of content (C{sparql}, C{rdf}, C{ldpath} or C{enhancements})
+        @param mimetype: mimetype of the content
+        @param size: length of the content
+        @param elapsed: seconds spent parsing it
+        """
+        pass
+
+
+class RequestInfo(object):
+    """
+    Request seen by the hooks
+    """
+
+    def __init__(self, method, url, endpoint, payload=None):
+        """
+        @param method: http method
+        @param url: url, without the api key
+        @param endpoint: operation of the api, without dataset or analysis names (such as C{data/sparql/select})
+        @param payload: payload, to measure the bytes sent when it is not streamed
+        """
+        self.method = method
+        self.url = _KEY.sub(r"\1***", url)
+        self.endpoint = endpoint
+        if isinstance(payload, bytes):
+            self.sent = len(payload)
+        elif isinstance(payload, str):
+            self.sent = len(payload.encode("UTF-8"))
+        else:
+            self.sent = None if payload is not None else 0
+        self.received = None
+        self.status = None
+        self.error = None
+        self.attempts = 0
+        self.started = time.time()
+        self.elapsed = None
+
+    @property
+    def retries(self):
+        """
+        Times the request was sent again, by a C{AdaptiveLimiter}
+        """
+        return max(self.attempts - 1, 0)
+
+    def done(self, response=None, error=None, stream=False):
+        """
+        Record the outcome of the request
+
+        @param response: response
+        @param error: exception raised sending the request
+        @param stream: whether the response is streamed, so its content is not read to measure it
+        """
+        self.elapsed = time.time() - self.started
+        self.error = error
+        if response is not None:
+            self.status = response.status_code
+            length = response.headers.get("Content-Length")
+            if length is not None:
+                self.received = int(length)
+            elif not stream:
+                self.received = len(response.content)
+
+    def __repr__(self):
+        return "RequestInfo(%s %s, status=%s, elapsed=%s)" % (self.method, self.url, self.status, self.elapsed)
+
+
+def call_hooks(hooks, name, *args):
+    """
+    Call a method of all the hooks, logging (and ignoring) their errors
+
+    @param hooks: hooks
+    @param name: method name
+    """
+    for hook in hooks:
+        try:
+            getattr(hook, name)(*args)
+        except Exception as e:
+            logging.warn("Hook %s failed in %s: %s" % (hook, name, e))
+
+
+def timed_parse(kind):
+    """
+    Decorator of the client methods parsing the content of the responses, taking its mimetype
+    and text as the last arguments, reporting the time spent to the hooks of the client
+
+    @param kind: kind of content
+    """
+    def decorate(parse):
+        @functools.wraps(parse)
+        def wrapper(self, *args):
+            if not self.hooks:
+                return parse(self, *args)
+            start = time.time()
+            result = parse(self, *args)
+            mimetype, text = args[-2:]
+            call_hooks(self.hooks, "on_parse_done", kind, mimetype, len(text) if text else 0, time.time() - start)
+            return result
+        return wrapper
+    return decorate
@@ -0,0 +1,163 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Translation of simple LDPath programs into SPARQL, to evaluate them for many context
+resources with a single query.
+
+Only programs made of C{@prefix} declarations and fields selecting a property (or a sequence
+of properties), optionally filtered by language and converted to a type, are supported::
+
+    @prefix foaf: <http://xmlns.com/foaf/0.1/> ;
+    name = foaf:name[@en] :: xsd:string ;
+    friends = foaf:knows / foaf:name :: xsd:string ;
+
+Results mimic the ones of the LDPath endpoint: the values of each field, as dictionaries with
+their C{type} and C{value} (and C{lang} or C{datatype} for untransformed literals).
+"""
+
+import re
+
+from .sparql import format_iri
+
+NAMESPACES = {
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "owl": "http://www.w3.org/2002/07/owl#",
+    "xsd": "http://www.w3.org/2001/XMLSchema#",
+    "foaf": "http://xmlns.com/foaf/0.1/",
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "dct": "http://purl.org/dc/terms/",
+    "skos": "http://www.w3.org/2004/02/skos/core#",
+    "schema": "http://schema.org/",
+}
+
+_PREFIX = re.compile(r"^@prefix\s+([A-Za-z][\w.-]*)\s*:\s*<([^<>\s]*)>$")
+_FIELD = re.compile(r"^([A-Za-z_][\w.-]*)\s*=\s*(.+?)(?:\s*\[\s*@(\w+(?:-\w+)*)\s*\])?(?:\s*::\s*([\w.-]+:[\w.-]+))?$")
+_STEP = re.compile(r"^(?:<([^<>\s]*)>|([A-Za-z][\w.-]*):([\w.-]*))$")
+_PATH = re.compile(r"\s*(<[^<>\s]*>|[^\s/<>]+)\s*(?:/|$)")
+
+
+class SimpleProgram(object):
+    """
+    LDPath program translated into SPARQL
+    """
+
+    def __init__(self, fields):
+        """
+        @param fields: list of (name, SPARQL property path, language or C{None}, transformed) tuples
+        """
+        self.fields = fields
+
+    @classmethod
+    def parse(cls, program):
+        """
+        Translate a program, when it is simple enough
+
+        @param program: LDPath program
+        @rtype: C{SimpleProgram}
+        @return: translated program, or C{None} if it is not simple
+        """
+        namespaces = dict(NAMESPACES)
+        fields = []
+        for statement in _split_statements(program):
+            prefix = _PREFIX.match(statement)
+            if prefix:
+                namespaces[prefix.group(1)] = prefix.group(2)
+                continue
+            field = _FIELD.match(statement)
+            if not field:
+                return None
+            name, path, lang, transformer = field.groups()
+            steps = [_resolve(step, namespaces) for step in _split_path(path)]
+            if not steps or not all(steps) or (transformer and not _resolve(transformer, namespaces)):
+                return None
+            fields.append((name, "/".join(steps), lang, transformer is not None))
+        return cls(fields) if fields else None
+
+    def query(self, uris):
+        """
+        @param uris: context resource uris
+        @rtype: str
+        @return: SPARQL query evaluating the program for all of them
+        @raise ValueError: if any uri is not a valid IRI
+        """
+        patterns = []
+        for name, path, lang, _ in self.fields:
+            pattern = "?uri %s ?value . BIND(\"%s\" AS ?field)" % (path, name)
+            if lang == "none":
+                pattern += " FILTER(LANG(?value) = \"\")"
+            elif lang is not None:
+                pattern += " FILTER(langMatches(LANG(?value), \"%s\"))" % lang
+            patterns.append("{ %s }" % pattern)
+        values = " ".join(format_iri(uri) for uri in uris)
+        return "SELECT ?uri ?field ?value WHERE { VALUES ?uri { %s } %s }" % (values, " UNION ".join(patterns))
+
+    def results(self, uris, bindings):
+        """
+        @param uris: context resource uris
+        @param bindings: bindings of the results of the query
+        @rtype: C{dict}
+        @return: results of the program per context resource uri (empty for the ones without bindings)
+        """
+        transformed = dict((name, t) for name, _, _, t in self.fields)
+        results = dict((uri, dict((name, []) for name, _, _, _ in self.fields)) for uri in uris)
+        for binding in bindings:
+            fields = results.get(binding.get("uri", {}).get("value"))
+            field = binding.get("field", {}).get("value")
+            value = binding.get("value")
+            if fields is None or field not in fields or value is None:
+                continue
+            if transformed[field] or value["type"] != "literal":
+                value = {"type": "uri" if value["type"] == "uri" else "literal", "value": value["value"]}
+            else:
+                value = dict((k, v) for k, v in (("type", "literal"), ("value", value["value"]),
+                                                 ("lang", value.get("xml:lang")),
+                                                 ("datatype", value.get("datatype"))) if v)
+            fields[field].append(value)
+        return results
+
+
+def _split_statements(program):
+    # statements end with ";": an IRI containing one breaks its statement, so the program is not simple
+    return [statement.strip() for statement in program.split(";") if statement.strip()]
+
+
+def _split_path(path):
+    steps = []
+    position = 0
+    while position < len(path):
+        match = _PATH.match(path, position)
+        if not match or match.end() == position:
+            return [None]
+        steps.append(match.group(1))
+        position = match.end()
+    return steps
+
+
+def _resolve(step, namespaces):
+    # encoded IRI of a step, or None if it cannot be translated
+    match = _STEP.match(step) if step else None
+    if not match:
+        return None
+    elif match.group(1) is not None:
+        iri = match.group(1)
+    elif match.group(2) in namespaces:
+        iri = namespaces[match.group(2)] + match.group(3)
+    else:
+        return None
+    try:
+        return format_iri(iri)
+    except ValueError:
+        return None
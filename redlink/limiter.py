@@ -0,0 +1,289 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from .deadline import remaining, DeadlineExceeded
+
+OVERLOADED = frozenset([429, 503])
+RETRIABLE = frozenset([429, 500, 502, 503, 504])
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Raised when requests fail fast, because the circuit breaker is open
+    """
+
+
+class RetryPolicy(object):
+    """
+    Retries with exponential backoff and full jitter, honoring C{Retry-After}
+    """
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30.0, statuses=RETRIABLE):
+        """
+        @param max_retries: times a request is retried (default=3)
+        @param backoff: base of the backoff, in seconds (default=0.5)
+        @param max_backoff: maximum backoff, in seconds (default=30)
+        @param statuses: response status codes retried (default: 429, 500, 502, 503 and 504)
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+
+    def delay(self, attempt, retry_after=None):
+        """
+        @param attempt: number of the failed attempt, starting at 0
+        @param retry_after: value of the C{Retry-After} header, if any
+        @rtype: float
+        @return: seconds to wait before retrying
+        """
+        delay = _parse_retry_after(retry_after)
+        if delay is not None:
+            return min(delay, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class CircuitBreaker(object):
+    """
+    Circuit breaker: after C{failure_threshold} consecutive failures requests fail fast for
+    C{reset_timeout} seconds, then a single probe decides whether the circuit closes again
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        @param failure_threshold: consecutive failures opening the circuit (default=5)
+        @param reset_timeout: seconds the circuit stays open before probing (default=30)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before(self):
+        """
+        @rtype: bool
+        @return: whether the request is the probe of a half-open circuit
+        @raise CircuitOpenError: if the request has to fail fast
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            if self.state == self.OPEN and time.monotonic() - self._opened >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+        raise CircuitOpenError("circuit open after %d consecutive failures" % self._failures)
+
+    def cancel(self):
+        """
+        Give up probing, when the probe could not be sent
+        """
+        with self._lock:
+            self._probing = False
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self.state = self.CLOSED
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logging.warn("Opening circuit after %d consecutive failures" % self._failures)
+                self.state = self.OPEN
+                self._opened = time.monotonic()
+
+
+class AdaptiveLimiter(object):
+    """
+    Limiter of the requests in flight, adapting the limit to the observed latency and errors
+    (AIMD): it grows by one request per round of successful ones, and shrinks by C{decrease} when
+    the API answers 429 or 5xx, fails, or gets C{tolerance} times slower than the median latency
+    of its recent successful requests. Requests failing fast, without reaching the API (open
+    circuit, exceeded deadline), leave the limit as it is. Idempotent requests are retried
+    following the C{RetryPolicy}, and all of them go through the C{CircuitBreaker}. Hedged
+    duplicates take a slot of their own. A limiter can be shared by many clients, so they adapt
+    together.
+    """
+
+    def __init__(self, initial=8, min_limit=1, max_limit=64, decrease=0.7, tolerance=3.0, window=100,
+                 retry=None, breaker=None):
+        """
+        @param initial: initial limit of requests in flight (default=8)
+        @param min_limit: minimum limit (default=1)
+        @param max_limit: maximum limit (default=64)
+        @param decrease: factor applied to the limit on overload (default=0.7)
+        @param tolerance: latency, relative to the median recent one, considered overload (default=3)
+        @param window: number of recent latencies considered (default=100)
+        @param retry: C{RetryPolicy} (default: C{RetryPolicy()})
+        @param breaker: C{CircuitBreaker} (default: C{CircuitBreaker()})
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.in_flight = 0
+        self.retries = 0
+        self._latencies = deque(maxlen=window)
+        self._decreased = 0
+        self._available = threading.Condition()
+
+    def call(self, send, idempotent=False):
+        """
+        Send a request within the limit
+
+        @param send: function sending the request, returning its response
+        @param idempotent: the request can be retried
+        @return: response (the last one, if all attempts failed)
+        @raise CircuitOpenError: if the circuit is open
+        """
+        attempt = 0
+        while True:
+            self._acquire()
+            start = time.monotonic()
+            probe = False
+            try:
+                probe = self.breaker.before()
+                response = send()
+            except (CircuitOpenError, DeadlineExceeded):
+                self._abandon()
+                if probe:
+                    self.breaker.cancel()
+                raise
+            except Exception as e:
+                self._release(start, True)
+                self.breaker.failure()
+                if not idempotent or not self._wait(attempt, None):
+                    raise
+                logging.warn("Retrying request after error: %s" % e)
+            else:
+                overloaded = response.status_code in OVERLOADED or response.status_code >= 500
+                self._release(start, overloaded)
+                if overloaded:
+                    self.breaker.failure()
+                else:
+                    self.breaker.success()
+                if not (idempotent and response.status_code in self.retry.statuses):
+                    return response
+                if not self._wait(attempt, response.headers.get("Retry-After")):
+                    return response
+                logging.warn("Retrying request after status %d" % response.status_code)
+                response.close()
+            attempt += 1
+
+    def acquire_duplicate(self):
+        """
+        Take a slot for a duplicate of a request already in flight (such as a hedged one), without
+        waiting for it: a duplicate is not worth sending once the limit is reached
+
+        @rtype: bool
+        @return: whether the duplicate can be sent, then releasing its slot with C{release_duplicate}
+        """
+        with self._available:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release_duplicate(self):
+        """
+        Release the slot of a duplicate, whose latency is accounted for by its original request
+        """
+        self._abandon()
+
+    def stats(self):
+        """
+        @rtype: C{dict}
+        @return: current C{limit}, requests C{in_flight}, C{retries} so far and circuit C{state}
+        """
+        return {"limit": self.limit, "in_flight": self.in_flight, "retries": self.retries,
+                "state": self.breaker.state}
+
+    def _wait(self, attempt, retry_after):
+        # backoff before retrying, unless out of retries or the deadline would pass first
+        if attempt >= self.retry.max_retries:
+            return False
+        delay = self.retry.delay(attempt, retry_after)
+        left = remaining()
+        if left is not None and delay >= left:
+            return False
+        with self._available:
+            self.retries += 1
+        time.sleep(delay)
+        return True
+
+    def _acquire(self):
+        with self._available:
+            while self.in_flight >= int(self.limit):
+                self._available.wait(remaining())
+            self.in_flight += 1
+
+    def _release(self, start, overloaded):
+        latency = time.monotonic() - start
+        with self._available:
+            self.in_flight -= 1
+            if not overloaded:
+                if len(self._latencies) >= 10:
+                    overloaded = latency > self.tolerance * sorted(self._latencies)[len(self._latencies) // 2]
+                self._latencies.append(latency)
+            if overloaded:
+                # one decrease per round of requests, as they all see the same overload
+                now = time.monotonic()
+                if now - self._decreased > latency:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._decreased = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._available.notify_all()
+
+    def _abandon(self):
+        # the request failed before reaching the api, so it says nothing about its load
+        with self._available:
+            self.in_flight -= 1
+            self._available.notify_all()
+
+
+def _parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        import email.utils
+        date = email.utils.parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0.0, email.utils.mktime_tz(date) - time.time())
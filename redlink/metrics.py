@@ -0,0 +1,268 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Built-in metrics of the requests of the clients, collected by a hook::
+
+    metrics = MetricsCollector()
+    data.add_hook(metrics)
+    ...
+    print(metrics.to_prometheus())
+"""
+
+import bisect
+import threading
+
+from .hooks import Hook
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram(object):
+    """
+    Histogram of durations, with cumulative buckets (not thread safe on its own)
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        @param buckets: upper bounds of the buckets, in seconds, sorted
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        @param value: observed duration
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        @rtype: C{list}
+        @return: (upper bound, observations up to it) pairs, the last bound being C{inf}
+        """
+        pairs = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q):
+        """
+        Estimate a quantile, interpolating in its bucket
+
+        @param q: quantile, between 0 and 1
+        @return: estimated duration, or C{None} without observations
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower = 0.0
+        previous = 0
+        for bound, total in self.cumulative():
+            if total >= rank:
+                if bound == float("inf"):
+                    return lower
+                inside = total - previous
+                return lower + (bound - lower) * ((rank - previous) / inside if inside else 0)
+            lower, previous = bound, total
+        return lower
+
+    def snapshot(self):
+        """
+        @rtype: C{dict}
+        @return: C{count}, C{sum}, estimated C{p50}, C{p95} and C{p99}, and cumulative C{buckets}
+        """
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": [(bound, total) for bound, total in self.cumulative()],
+        }
+
+
+class _EndpointMetrics(object):
+
+    def __init__(self, buckets):
+        self.latency = Histogram(buckets)
+        self.statuses = {}
+        self.sent = 0
+        self.received = 0
+        self.retries = 0
+        self.in_flight = 0
+
+
+class _ParseMetrics(object):
+
+    def __init__(self, buckets):
+        self.duration = Histogram(buckets)
+        self.size = 0
+
+
+class MetricsCollector(Hook):
+    """
+    Hook collecting, per endpoint and method, a latency histogram, the bytes sent and received,
+    the status codes and the retries of the requests, and, per kind of content, a histogram of
+    the time spent parsing responses. It can be shared by several clients.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix="redlink"):
+        """
+        @param buckets: upper bounds of the buckets of the histograms, in seconds
+        @param prefix: prefix of the names of the exported metrics (default=redlink)
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._endpoints = {}
+        self._parsing = {}
+        self._lock = threading.Lock()
+
+    def before_request(self, request):
+        with self._lock:
+            self._endpoint(request).in_flight += 1
+
+    def after_response(self, request, response):
+        status = str(request.status) if request.status is not None else "error"
+        with self._lock:
+            metrics = self._endpoint(request)
+            metrics.in_flight -= 1
+            metrics.latency.observe(request.elapsed)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.sent += request.sent or 0
+            metrics.received += request.received or 0
+            metrics.retries += request.retries
+
+    def on_parse_done(self, kind, mimetype, size, elapsed):
+        with self._lock:
+            metrics = self._parsing.get(kind)
+            if metrics is None:
+                metrics = self._parsing[kind] = _ParseMetrics(self.buckets)
+            metrics.duration.observe(elapsed)
+            metrics.size += size
+
+    def snapshot(self):
+        """
+        Copy of the metrics collected so far
+
+        @rtype: C{dict}
+        @return: C{requests} per "method endpoint" (with their C{latency}, C{statuses}, C{bytes_sent},
+                 C{bytes_received}, C{retries} and C{in_flight}), and C{parsing} per kind of content
+                 (with their C{duration} and C{bytes})
+        """
+        with self._lock:
+            return {
+                "requests": dict(("%s %s" % (method, endpoint), {
+                    "latency": m.latency.snapshot(),
+                    "statuses": dict(m.statuses),
+                    "bytes_sent": m.sent,
+                    "bytes_received": m.received,
+                    "retries": m.retries,
+                    "in_flight": m.in_flight,
+                }) for (endpoint, method), m in self._endpoints.items()),
+                "parsing": dict((kind, {
+                    "duration": m.duration.snapshot(),
+                    "bytes": m.size,
+                }) for kind, m in self._parsing.items()),
+            }
+
+    def reset(self):
+        """
+        Forget the metrics collected so far (but the requests in flight)
+        """
+        with self._lock:
+            for key, metrics in list(self._endpoints.items()):
+                fresh = _EndpointMetrics(self.buckets)
+                fresh.in_flight = metrics.in_flight
+                self._endpoints[key] = fresh
+            self._parsing = {}
+
+    def to_prometheus(self):
+        """
+        Export the metrics in the Prometheus text format
+
+        @rtype: str
+        @return: metrics
+        """
+        p = self.prefix
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            parsing = sorted(self._parsing.items())
+            lines = []
+            _family(lines, "%s_request_duration_seconds" % p, "histogram", "Latency of the requests, retries included")
+            for (endpoint, method), m in endpoints:
+                _histogram(lines, "%s_request_duration_seconds" % p, m.latency,
+                           [("endpoint", endpoint), ("method", method)])
+            _family(lines, "%s_requests_total" % p, "counter", "Requests by status code (error if none was received)")
+            for (endpoint, method), m in endpoints:
+                for status, count in sorted(m.statuses.items()):
+                    _sample(lines, "%s_requests_total" % p, [("endpoint", endpoint), ("method", method),
+                                                             ("status", status)], count)
+            for name, attribute, kind, help in (
+                    ("request_bytes_sent_total", "sent", "counter", "Bytes sent in the payloads of the requests"),
+                    ("response_bytes_received_total", "received", "counter", "Bytes received in the responses"),
+                    ("request_retries_total", "retries", "counter", "Requests sent again after a failure"),
+                    ("requests_in_flight", "in_flight", "gauge", "Requests waiting for their response")):
+                _family(lines, "%s_%s" % (p, name), kind, help)
+                for (endpoint, method), m in endpoints:
+                    _sample(lines, "%s_%s" % (p, name), [("endpoint", endpoint), ("method", method)],
+                            getattr(m, attribute))
+            _family(lines, "%s_parse_duration_seconds" % p, "histogram", "Time spent parsing the responses")
+            for kind, m in parsing:
+                _histogram(lines, "%s_parse_duration_seconds" % p, m.duration, [("kind", kind)])
+            _family(lines, "%s_parsed_bytes_total" % p, "counter", "Length of the parsed responses")
+            for kind, m in parsing:
+                _sample(lines, "%s_parsed_bytes_total" % p, [("kind", kind)], m.size)
+        return "\n".join(lines) + "\n"
+
+    def _endpoint(self, request):
+        key = (request.endpoint, request.method)
+        metrics = self._endpoints.get(key)
+        if metrics is None:
+            metrics = self._endpoints[key] = _EndpointMetrics(self.buckets)
+        return metrics
+
+
+def _family(lines, name, kind, help):
+    lines.append("# HELP %s %s" % (name, help))
+    lines.append("# TYPE %s %s" % (name, kind))
+
+
+def _histogram(lines, name, histogram, labels):
+    for bound, total in histogram.cumulative():
+        _sample(lines, "%s_bucket" % name, labels + [("le", _format_value(bound))], total)
+    _sample(lines, "%s_sum" % name, labels, histogram.sum)
+    _sample(lines, "%s_count" % name, labels, histogram.count)
+
+
+def _sample(lines, name, labels, value):
+    pairs = ",".join("%s=\"%s\"" % (k, _escape(v)) for k, v in labels)
+    lines.append("%s{%s} %s" % (name, pairs, _format_value(value)))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,169 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Incremental N-Triples (de)serialization, one line at a time
+"""
+
+import re
+from itertools import islice
+
+from rdflib.plugins.serializers.nt import _nt_row
+
+from .profiling import section, profiling
+
+try:
+    from rdflib.plugins.parsers.ntriples import W3CNTriplesParser as NTriplesParser
+except ImportError:
+    from rdflib.plugins.parsers.ntriples import NTriplesParser
+
+
+def serialize_triple(triple):
+    """
+    Serialize a triple as a N-Triples line
+
+    @param triple: triple of rdflib terms
+    @rtype: str
+    @return: line (including the line break)
+    """
+    return _nt_row(triple)
+
+
+def serialize_triples(triples, lines_per_chunk=1000):
+    """
+    Serialize triples as UTF-8 encoded N-Triples, a chunk of lines at a time
+
+    @param triples: iterable of triples
+    @param lines_per_chunk: number of lines per chunk
+    @rtype: generator of C{bytes}
+    @return: chunks
+    """
+    triples = iter(triples)
+    while True:
+        with section("ntriples.serialize"):
+            chunk = "".join(_nt_row(triple) for triple in islice(triples, lines_per_chunk)).encode("UTF-8")
+        if not chunk:
+            return
+        yield chunk
+
+
+def split_lines(data):
+    """
+    Split N-Triples data in statement lines (skipping blank lines and comments), consuming it lazily
+
+    @param data: C{str}, C{bytes}, file or iterable of C{str}/C{bytes} chunks
+    @rtype: generator of C{bytes}
+    @return: lines (including the line break)
+    """
+    if isinstance(data, (str, bytes)):
+        data = [data]
+    buffer = b""
+    for chunk in data:
+        if not isinstance(chunk, bytes):
+            chunk = chunk.encode("UTF-8")
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            if _is_statement(line):
+                yield line + b"\n"
+    if _is_statement(buffer):
+        yield buffer + b"\n"
+
+
+def batch_lines(lines, size):
+    """
+    Split N-Triples lines in batches of (at most) C{size} lines, to be imported separately. Blank
+    node labels only identify a node within a single document, so the lines with blank nodes are
+    held back and returned together as the last batch, whatever its size
+
+    @param lines: iterable of lines (C{bytes})
+    @param size: lines per batch
+    @rtype: generator of C{list}
+    @return: batches of lines
+    """
+    batch = []
+    blank = []
+    for line in lines:
+        if _BLANK_NODE.search(line):
+            blank.append(line)
+        else:
+            batch.append(line)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+    if blank:
+        yield blank
+
+
+def relabel_blank_nodes(lines, prefix):
+    """
+    Prefix the blank node labels of N-Triples lines, so lines coming from different documents
+    can be imported together without their blank nodes being merged
+
+    @param lines: iterable of lines (C{bytes})
+    @param prefix: prefix of the labels, unique per document (C{str})
+    @rtype: generator of C{bytes}
+    @return: lines
+    """
+    label = b"\\1_:" + prefix.encode("UTF-8") + b"\\2"
+    for line in lines:
+        if _BLANK_NODE.search(line):
+            line = _BLANK_OBJECT.sub(label + b"\\3", _BLANK_SUBJECT.sub(label, line, 1), 1)
+        yield line
+
+
+# blank node subject, or blank node object (literals always end with a quote, language or datatype)
+_BLANK_NODE = re.compile(br'^\s*_:|\s_:[^\s"<>]+\s*\.\s*$')
+_BLANK_SUBJECT = re.compile(br'^(\s*)_:(\S+)')
+_BLANK_OBJECT = re.compile(br'(\s)_:([^\s"<>]+)(\s*\.\s*)$')
+
+
+def _is_statement(line):
+    line = line.strip()
+    return bool(line) and not line.startswith(b"#")
+
+
+def parse_lines(lines):
+    """
+    Parse N-Triples lines as they come
+
+    @param lines: iterable of lines (C{str} or C{bytes})
+    @rtype: generator of C{tuple}
+    @return: triples
+    """
+    triples = []
+    parser = NTriplesParser(_TripleSink(triples))
+    bnodes = {}
+    timed = profiling()
+    for line in lines:
+        if line:
+            if timed:
+                with section("ntriples.parse"):
+                    parser.parsestring(line, bnode_context=bnodes)
+            else:
+                parser.parsestring(line, bnode_context=bnodes)
+            for triple in triples:
+                yield triple
+            del triples[:]
+
+
+class _TripleSink(object):
+
+    def __init__(self, triples):
+        self.triples = triples
+
+    def triple(self, s, p, o):
+        self.triples.append((s, p, o))
@@ -0,0 +1,330 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Profiling of the SDK calls, breaking their time down into network phases (DNS, connect, TLS,
+upload, server wait and download), serialization and parsing::
+
+    with data.profile() as profile:
+        graph = data.export_dataset("dataset")
+    print(profile.report())
+    profile.write_folded("export.folded")  # flamegraph.pl export.folded > export.svg
+
+The profile is kept in a context variable, so only the calls made within the block are recorded,
+including the requests sent by the threads the clients use for concurrent requests. While any
+profile is active, a few functions of urllib3 (and C{socket.getaddrinfo}) are wrapped to time
+the network phases of the blocking clients; the asyncio ones only report serialization and
+parsing. Profiling adds some overhead per timed section, so absolute times are slightly inflated.
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+from contextvars import ContextVar
+
+_current = ContextVar("redlink_profile", default=None)
+_PACKAGE = os.path.dirname(os.path.realpath(__file__))
+
+
+class _Node(object):
+
+    __slots__ = ("profile", "stack", "child_wall", "child_cpu")
+
+    def __init__(self, profile, stack):
+        self.profile = profile
+        self.stack = stack
+        self.child_wall = 0.0
+        self.child_cpu = 0.0
+
+
+class _Section(object):
+    # times a section, recording its own time (the one of its nested sections excluded)
+
+    __slots__ = ("parent", "name", "node", "token", "wall", "cpu")
+
+    def __init__(self, parent, name):
+        self.parent = parent
+        self.name = name
+
+    def __enter__(self):
+        parent = self.parent
+        stack = parent.stack + (self.name,) if parent.stack else (_call_name(), self.name)
+        self.node = _Node(parent.profile, stack)
+        self.token = _current.set(self.node)
+        self.cpu = time.thread_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        _current.reset(self.token)
+        node = self.node
+        if self.parent.stack:
+            self.parent.child_wall += wall
+            self.parent.child_cpu += cpu
+        node.profile._record(node.stack, wall - node.child_wall, cpu - node.child_cpu)
+
+
+class _NoSection(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NO_SECTION = _NoSection()
+
+
+def section(name):
+    """
+    Time a section of the SDK (such as parsing) within the current profile, doing nothing when
+    there is none::
+
+        with section("json.loads"):
+            results = json.loads(text)
+
+    @param name: section name
+    @return: context manager
+    """
+    node = _current.get()
+    if node is None or (node.stack and node.stack[-1] == name):
+        return _NO_SECTION
+    return _Section(node, name)
+
+
+def profiling():
+    """
+    @rtype: bool
+    @return: whether there is a profile active in the current context
+    """
+    return _current.get() is not None
+
+
+def attributed(iterator):
+    """
+    Attribute the sections run while an iterator returned by a call is consumed, once the call
+    has returned, to that call
+
+    @param iterator: iterator
+    @return: iterator
+    """
+    node = _current.get()
+    if node is None:
+        return iterator
+    return _attributed(_Node(node.profile, node.stack[:1] or (_call_name(),)), iterator)
+
+
+def _attributed(node, iterator):
+    while True:
+        token = _current.set(node)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _current.reset(token)
+        yield item
+
+
+def _call_name():
+    # outermost public method of a client in the stack of the thread, which is the profiled call
+    from .client import RedlinkClientBase
+    name = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        if not code.co_name.startswith("_") and code.co_filename.startswith(_PACKAGE):
+            owner = frame.f_locals.get("self")
+            if isinstance(owner, RedlinkClientBase):
+                name = "%s.%s" % (type(owner).__name__, code.co_name)
+        frame = frame.f_back
+    return name or "(other)"
+
+
+class Profile(object):
+    """
+    Wall and CPU time of the sections of the SDK calls made within a block, per call and
+    section; the time of nested sections is only accounted to the innermost one
+    """
+
+    def __init__(self):
+        self.wall = None
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._token = None
+        self._started = None
+
+    def __enter__(self):
+        _install()
+        self._token = _current.set(_Node(self, ()))
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall = time.perf_counter() - self._started
+        _current.reset(self._token)
+        _uninstall()
+
+    def _record(self, stack, wall, cpu):
+        with self._lock:
+            entry = self.stats.get(stack)
+            if entry is None:
+                entry = self.stats[stack] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += wall
+            entry[2] += cpu
+
+    def breakdown(self):
+        """
+        Time per call and section, sorted by decreasing wall time
+
+        @rtype: C{list}
+        @return: C{dict}s with the C{call}, C{section}, C{count}, C{wall} and C{cpu} time
+        """
+        totals = {}
+        with self._lock:
+            for stack, (count, wall, cpu) in self.stats.items():
+                entry = totals.setdefault((stack[0], stack[-1]), [0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += wall
+                entry[2] += cpu
+        rows = [{"call": call, "section": name, "count": count, "wall": wall, "cpu": cpu}
+                for (call, name), (count, wall, cpu) in totals.items()]
+        return sorted(rows, key=lambda row: row["wall"], reverse=True)
+
+    def report(self, limit=None):
+        """
+        Sorted report of the time per call and section
+
+        @param limit: maximum number of rows (default: all)
+        @rtype: str
+        @return: report
+        """
+        rows = self.breakdown()[:limit]
+        wall = self.wall if self.wall is not None else time.perf_counter() - self._started
+        lines = ["Profile of %.3fs (wall), %.3fs in the timed sections" % (wall, sum(r["wall"] for r in rows)),
+                 "%-40s %-20s %7s %10s %7s %10s" % ("call", "section", "count", "wall", "%", "cpu")]
+        for r in rows:
+            lines.append("%-40s %-20s %7d %9.4fs %6.1f%% %9.4fs" %
+                         (r["call"], r["section"], r["count"], r["wall"], 100.0 * r["wall"] / wall if wall else 0,
+                          r["cpu"]))
+        return "\n".join(lines)
+
+    def folded(self, cpu=False):
+        """
+        Stacks in the folded format of C{flamegraph.pl} (and speedscope, inferno...), one line
+        per stack with its time in microseconds
+
+        @param cpu: dump the CPU time instead of the wall time (default=False)
+        @rtype: str
+        @return: stacks
+        """
+        with self._lock:
+            lines = ["%s %d" % (";".join(stack), round((cpu_time if cpu else wall) * 1000000))
+                     for stack, (_, wall, cpu_time) in sorted(self.stats.items())]
+        return "\n".join(lines) + "\n"
+
+    def write_folded(self, path, cpu=False):
+        """
+        Write the folded stacks to a file
+
+        @param path: file path
+        @param cpu: dump the CPU time instead of the wall time (default=False)
+        """
+        with open(path, "w") as f:
+            f.write(self.folded(cpu))
+
+
+def _timed(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with section(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _timed_generator(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        chunks = func(*args, **kwargs)
+        if not profiling():
+            return chunks
+        return _timed_steps(name, chunks)
+    return wrapper
+
+
+def _timed_steps(name, chunks):
+    while True:
+        with section(name):
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+        yield chunk
+
+
+_patches = []
+_profiles = 0
+_patches_lock = threading.Lock()
+
+
+def _network_functions():
+    # (owner, attribute, section, generator) of the functions timing the network phases
+    import socket
+    try:
+        import urllib3.connection
+        import urllib3.response
+        import urllib3.util.connection
+    except ImportError:
+        return [(socket, "getaddrinfo", "dns", False)]
+    functions = [
+        (socket, "getaddrinfo", "dns", False),
+        (urllib3.util.connection, "create_connection", "connect", False),
+        (urllib3.connection.HTTPSConnection, "connect", "tls", False),
+        (urllib3.connection.HTTPConnection, "request", "upload", False),
+        (urllib3.connection.HTTPConnection, "request_chunked", "upload", False),
+        (urllib3.connection.HTTPConnection, "getresponse", "wait", False),
+        (urllib3.response.HTTPResponse, "read", "download", False),
+        (urllib3.response.HTTPResponse, "read_chunked", "download", True),
+    ]
+    return [f for f in functions if f[1] in vars(f[0])]
+
+
+def _install():
+    global _profiles
+    with _patches_lock:
+        _profiles += 1
+        if _profiles > 1:
+            return
+        for owner, attribute, name, generator in _network_functions():
+            original = vars(owner)[attribute]
+            setattr(owner, attribute, (_timed_generator if generator else _timed)(name, original))
+            _patches.append((owner, attribute, original))
+
+
+def _uninstall():
+    global _profiles
+    with _patches_lock:
+        _profiles -= 1
+        if _profiles > 0:
+            return
+        while _patches:
+            owner, attribute, original = _patches.pop()
+            setattr(owner, attribute, original)
@@ -0,0 +1,357 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+SPARQL utilities
+"""
+
+import re
+
+from rdflib.namespace import XSD
+from rdflib.term import URIRef, Literal, BNode, Node
+
+from .profiling import attributed, section, profiling
+
+
+def term_from_binding(binding):
+    """
+    Build a rdflib term from a binding of the SPARQL JSON results format
+
+    @type binding: dict
+    @param binding: binding (with C{type}, C{value} and optionally C{xml:lang} or C{datatype})
+    @return: term
+    """
+    kind = binding["type"]
+    if kind == "uri":
+        return URIRef(binding["value"])
+    elif kind == "bnode":
+        return BNode(binding["value"])
+    elif kind in ("literal", "typed-literal"):
+        return Literal(binding["value"], lang=binding.get("xml:lang"), datatype=binding.get("datatype"))
+    else:
+        raise ValueError("unsupported binding type %s" % kind)
+
+
+class PreparedQuery(object):
+    """
+    Query template compiled once for a dataset, whose variables can be bound to terms on
+    each execution, à la Jena's parameterized strings::
+
+        labels = data.prepare_sparql_query("SELECT ?label WHERE { ?s rdfs:label ?label }", dataset)
+        labels.execute(s=URIRef("http://example.org/a"))
+
+    Bound variables are replaced everywhere in the query by the (escaped) terms, so they should
+    not be projected. Requests reuse the pooled connections of the client transport.
+    """
+
+    def __init__(self, client, query, dataset=None, format="json"):
+        """
+        @type client: C{RedlinkData}
+        @param client: data client
+        @param query: query template
+        @param dataset: dataset name
+        @param format: results format, C{json} or C{turtle} (default=json)
+        """
+        self.client = client
+        self.query = query
+        self.dataset = dataset
+        self.format = format
+        self._segments, self._vars = _compile(query)
+        self.vars = frozenset(name for name, _ in self._vars)
+        resource, _, mimetype, accept = client._build_sparql_request(dataset, query, format)
+        self._resource = resource
+        self._headers = {"User-Agent": client.user_agent, "Content-Type": mimetype, "Accept": accept}
+
+    def render(self, **bindings):
+        """
+        Bind variables of the template
+
+        @param bindings: rdflib terms (or plain values, bound as literals) by variable name
+        @rtype: str
+        @return: query
+        """
+        unknown = set(bindings) - self.vars
+        if unknown:
+            raise ValueError("unknown variables %s" % ", ".join(sorted(unknown)))
+        terms = dict((name, _to_n3(value)) for name, value in bindings.items())
+        parts = [self._segments[0]]
+        for (name, original), segment in zip(self._vars, self._segments[1:]):
+            parts.append(terms.get(name, original))
+            parts.append(segment)
+        return "".join(parts)
+
+    def execute(self, **bindings):
+        """
+        Execute the query
+
+        @param bindings: rdflib terms (or plain values, bound as literals) by variable name
+        @return: query results, as C{sparql_tuple_query} or C{sparql_graph_query} return them
+        """
+        payload = self.render(**bindings).encode("UTF-8")
+        response = self.client._request("POST", self._resource, payload, self._headers, idempotent=True)
+        return self.client._parse_sparql_results(response, self.format)
+
+    def __call__(self, **bindings):
+        return self.execute(**bindings)
+
+    def __repr__(self):
+        return "PreparedQuery(%r, dataset=%s)" % (self.query, self.dataset)
+
+
+_TOKENS = re.compile(r"<[^<>\"{}|^`\\\s]*>"
+                     r'|"""(?:[^"\\]|\\.|"(?!""))*"""'
+                     r"|'''(?:[^'\\]|\\.|'(?!''))*'''"
+                     r'|"(?:[^"\\\n]|\\.)*"'
+                     r"|'(?:[^'\\\n]|\\.)*'"
+                     r"|#[^\n]*"
+                     r"|[?$](?P<var>[A-Za-z0-9_\u00B7\u00C0-\uFFFF]+)", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+_INVALID_IRI = re.compile(r'[<>"{}|^`\\\s]')
+_LANGUAGE_TAG = re.compile(r"^[A-Za-z]{1,8}(?:-[A-Za-z0-9]{1,8})*$")
+
+
+def normalize_query(query):
+    """
+    Normalize a query (or LDPath program), so the ones only differing in comments or
+    whitespace (outside IRIs and strings) are equal
+
+    @param query: query
+    @rtype: str
+    @return: normalized query
+    """
+    parts = []
+    pending = []
+    last = 0
+    for match in _TOKENS.finditer(query):
+        token = match.group(0)
+        pending.append(query[last:match.start()])
+        if token[0] == "#":
+            pending.append(" ")
+        else:
+            parts.append(_WHITESPACE.sub(" ", "".join(pending)))
+            parts.append(token)
+            pending = []
+        last = match.end()
+    pending.append(query[last:])
+    parts.append(_WHITESPACE.sub(" ", "".join(pending)))
+    return "".join(parts).strip()
+
+
+def _compile(query):
+    # split the query around its variables, skipping the ones inside IRIs, strings and comments
+    segments = []
+    variables = []
+    last = 0
+    for match in _TOKENS.finditer(query):
+        if match.group("var"):
+            segments.append(query[last:match.start()])
+            variables.append((match.group("var"), match.group(0)))
+            last = match.end()
+    segments.append(query[last:])
+    return segments, variables
+
+
+def format_iri(iri):
+    """
+    Encode an IRI for a query
+
+    @param iri: IRI
+    @rtype: str
+    @return: encoded IRI
+    @raise ValueError: if it is not a valid (absolute or relative) IRI
+    """
+    if not iri or _INVALID_IRI.search(iri):
+        raise ValueError("invalid IRI %s" % iri)
+    return "<%s>" % iri
+
+
+def format_literal(literal):
+    """
+    Encode a literal for a query, escaping its lexical form
+
+    @type literal: C{rdflib.Literal}
+    @param literal: literal
+    @rtype: str
+    @return: encoded literal
+    @raise ValueError: if its language tag or datatype IRI is not valid
+    """
+    value = _quote(literal)
+    if literal.language:
+        if not _LANGUAGE_TAG.match(literal.language):
+            raise ValueError("invalid language tag %s" % literal.language)
+        return "%s@%s" % (value, literal.language)
+    elif literal.datatype:
+        return "%s^^%s" % (value, format_iri(literal.datatype))
+    else:
+        return value
+
+
+def _quote(value):
+    return "\"%s\"" % str(value).replace("\\", "\\\\").replace("\"", "\\\"") \
+        .replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
+
+
+def _to_n3(value):
+    if isinstance(value, URIRef):
+        return format_iri(value)
+    elif isinstance(value, Literal):
+        return format_literal(value)
+    elif isinstance(value, Node):
+        raise ValueError("unsupported term %r" % value)
+    else:
+        return format_literal(Literal(value))
+
+
+class TupleRows(object):
+    """
+    Rows of a SELECT query, parsed one at a time while the SPARQL TSV results are read
+    """
+
+    def __init__(self, lines, terms=False, close=None):
+        """
+        @param lines: iterator of result lines, the first one being the header
+        @param terms: build rdflib terms, instead of plain C{str} values (default=False)
+        @param close: function releasing the underlying response
+        """
+        self._lines = lines
+        self._parse = parse_tsv_term if terms else parse_tsv_value
+        self._close = close
+        header = next(lines, b"")
+        self.vars = [var.lstrip("?$") for var in _decode(header).rstrip("\r\n").split("\t")] if header else []
+        self._rows = attributed(self._parse_rows())
+
+    def __iter__(self):
+        return self._rows
+
+    def _parse_rows(self):
+        try:
+            parse = self._parse
+            if profiling():
+                for line in self._lines:
+                    with section("tsv.parse"):
+                        row = tuple(parse(field) for field in _decode(line).rstrip("\r\n").split("\t"))
+                    yield row
+            else:
+                for line in self._lines:
+                    yield tuple(parse(field) for field in _decode(line).rstrip("\r\n").split("\t"))
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Release the underlying response
+        """
+        if self._close:
+            self._close()
+            self._close = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_LITERAL = re.compile(r'^"(.*)"(?:@([A-Za-z0-9-]+)|\^\^<([^>]*)>)?$', re.DOTALL)
+_ESCAPES = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+_INTEGER = re.compile(r"^[+-]?\d+$")
+_ESCAPED = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", "\"": "\"", "'": "'", "\\": "\\"}
+
+
+def parse_tsv_value(field):
+    """
+    Value of a term of the SPARQL TSV results format: IRIs without brackets, literals
+    without quotes, language or datatype
+
+    @param field: encoded term
+    @return: value, or C{None} if unbound
+    """
+    if not field:
+        return None
+    elif field[0] == "<":
+        return field[1:-1]
+    elif field[0] == "\"":
+        match = _LITERAL.match(field)
+        return _unescape(match.group(1)) if match else field
+    else:
+        return field
+
+
+def parse_tsv_term(field):
+    """
+    Term of the SPARQL TSV results format
+
+    @param field: encoded term
+    @return: rdflib term, or C{None} if unbound
+    """
+    if not field:
+        return None
+    elif field[0] == "<":
+        return URIRef(field[1:-1])
+    elif field.startswith("_:"):
+        return BNode(field[2:])
+    elif field[0] == "\"":
+        match = _LITERAL.match(field)
+        if not match:
+            raise ValueError("invalid literal %s" % field)
+        return Literal(_unescape(match.group(1)), lang=match.group(2), datatype=match.group(3))
+    elif field in ("true", "false"):
+        return Literal(field, datatype=XSD.boolean)
+    elif _INTEGER.match(field):
+        return Literal(field, datatype=XSD.integer)
+    elif "e" in field or "E" in field:
+        return Literal(field, datatype=XSD.double)
+    else:
+        return Literal(field, datatype=XSD.decimal)
+
+
+def format_tsv_term(term):
+    """
+    Encode a term for the SPARQL TSV results format
+
+    @param term: rdflib term, or C{None} if unbound
+    @rtype: str
+    @return: encoded term
+    """
+    if term is None:
+        return ""
+    elif isinstance(term, URIRef):
+        return "<%s>" % term
+    elif isinstance(term, BNode):
+        return "_:%s" % term
+    else:
+        value = _quote(term)
+        if term.language:
+            return "%s@%s" % (value, term.language)
+        elif term.datatype:
+            return "%s^^<%s>" % (value, term.datatype)
+        else:
+            return value
+
+
+def _unescape(value):
+    if "\\" not in value:
+        return value
+    return _ESCAPES.sub(_unescape_match, value)
+
+
+def _unescape_match(match):
+    code = match.group(1) or match.group(2)
+    if code:
+        return chr(int(code, 16))
+    return _ESCAPED.get(match.group(3), match.group(3))
+
+
+def _decode(line):
+    return line.decode("UTF-8") if isinstance(line, bytes) else line
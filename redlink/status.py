@@ -0,0 +1,120 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+
+
+class StatusCache(object):
+    """
+    Cache of the status documents of the api keys, shared by all the clients using the same key.
+    Entries older than the ttl are still served, while they get refreshed in the background.
+    """
+
+    def __init__(self, ttl=300):
+        """
+        @type ttl: int
+        @param ttl: seconds before an entry gets refreshed
+        """
+        self.ttl = ttl
+        self._entries = {}
+        self._locks = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, key, fetch):
+        """
+        Get the status for a key, fetching it only when it is not cached yet
+
+        @param key: cache key
+        @param fetch: function retrieving the status, returning C{None} when not available
+
+        @rtype: dict
+        @return: status
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._get_lock(key):
+                entry = self._entries.get(key)
+                if entry is None:
+                    status = fetch()
+                    if status:
+                        self.put(key, status)
+                    return status
+        status, fetched = entry
+        if time.time() - fetched > self.ttl:
+            self._refresh(key, fetch)
+        return status
+
+    def peek(self, key):
+        """
+        Get the cached status for a key, if any
+
+        @param key: cache key
+        @rtype: dict
+        @return: status
+        """
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def put(self, key, status):
+        """
+        Store the status for a key
+
+        @param key: cache key
+        @param status: status
+        """
+        self._entries[key] = (status, time.time())
+
+    def invalidate(self, key=None):
+        """
+        Drop the cached status of a key, or of all of them
+
+        @param key: cache key (default: all)
+        """
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def _get_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _refresh(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                status = fetch()
+                if status:
+                    self.put(key, status)
+                else:
+                    self.invalidate(key)
+            except Exception as e:
+                logging.warn("Status refresh failed, keeping the cached one: %s" % e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        thread = threading.Thread(target=refresh, name="redlink-status-refresh")
+        thread.daemon = True
+        thread.start()
+
+
+status_cache = StatusCache()
@@ -0,0 +1,91 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Fingerprints for computing the difference between a local graph and a remote dataset.
+
+The fingerprint of a subject is the SHA-1 of its sorted predicate/object keys, computed
+locally in Python and remotely in SPARQL. The remote one relies on GROUP_CONCAT following
+the order of the subquery, which SPARQL does not guarantee: in stores where it does not,
+unchanged subjects are reported as changed, costing an extra download but never a wrong sync.
+"""
+
+import hashlib
+
+from rdflib.namespace import XSD
+from rdflib.term import URIRef, Literal, BNode
+
+FINGERPRINTS_QUERY = u"""SELECT ?s (SHA1(GROUP_CONCAT(?t; separator="\\n")) AS ?h) WHERE {
+  SELECT ?s ?t WHERE {
+    ?s ?p ?o .
+    FILTER(isIRI(?s))
+    BIND(CONCAT(STR(?p), " ", IF(isIRI(?o), CONCAT("<", STR(?o), ">"), IF(isBlank(?o), "_:",
+         CONCAT("\\"", STR(?o), "\\"@", LANG(?o), "^^",
+                IF(LANG(?o) != "" || COALESCE(DATATYPE(?o) = <%s>, true), "", STR(DATATYPE(?o))))))) AS ?t)
+  } ORDER BY ?s ?t
+} GROUP BY ?s""" % XSD.string
+
+SUBJECTS_QUERY = u"SELECT ?s ?p ?o WHERE { VALUES ?s { %s } ?s ?p ?o }"
+
+
+def normalize(term):
+    """
+    Normalize a term, so plain and C{xsd:string} literals compare equal
+
+    @param term: rdflib term
+    @return: term
+    """
+    if isinstance(term, Literal) and term.datatype == XSD.string:
+        return Literal(str(term))
+    return term
+
+
+def fingerprint(pairs):
+    """
+    Fingerprint of a subject
+
+    @param pairs: (predicate, object) pairs of the subject
+    @rtype: str
+    @return: hex digest
+    """
+    keys = sorted(_key(p, o) for p, o in pairs)
+    return hashlib.sha1(u"\n".join(keys).encode("UTF-8")).hexdigest()
+
+
+def group_by_subject(triples):
+    """
+    Group the (normalized) triples of a graph by subject
+
+    @param triples: iterable of triples
+    @rtype: C{dict}
+    @return: set of (predicate, object) pairs per subject
+    @raise ValueError: if there are blank nodes, which cannot be matched against the remote dataset
+    """
+    subjects = {}
+    for s, p, o in triples:
+        if isinstance(s, BNode) or isinstance(o, BNode):
+            raise ValueError("blank nodes are not supported for syncing (%s %s %s)" % (s, p, o))
+        subjects.setdefault(s, set()).add((p, normalize(o)))
+    return subjects
+
+
+def _key(p, o):
+    if isinstance(o, URIRef):
+        value = u"<%s>" % o
+    elif isinstance(o, BNode):
+        value = u"_:"
+    else:
+        datatype = o.datatype if o.datatype and not o.language else u""
+        value = u"\"%s\"@%s^^%s" % (o, o.language or u"", datatype)
+    return u"%s %s" % (p, value)
@@ -0,0 +1,524 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Local emulator of the Redlink API, to test and benchmark the clients without the service::
+
+    with RedlinkEmulator(latency=0.05, error_rate=0.01) as emulator:
+        data = redlink.create_data_client(emulator.key, endpoint=emulator.endpoint)
+
+It serves the status, analysis, data (import, export, resources and release), SPARQL and LDPath
+endpoints on top of an in-memory rdflib store, with a named graph per dataset. Contents are
+enhanced by spotting the labels of the resources of the datasets, and only the LDPath programs
+simple enough to be translated into SPARQL (see C{redlink.ldpath}) can be evaluated.
+
+It can also be run as a standalone server::
+
+    python -m redlink.testing --port 8080 --latency 0.05 --error-rate 0.01
+"""
+
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+from rdflib.graph import Dataset, Graph
+from rdflib.namespace import Namespace, RDF, RDFS, SKOS, FOAF, XSD
+from rdflib.term import URIRef, Literal
+
+from .chunking import FISE, DC
+from .format import from_mimetype, Format
+from .ldpath import SimpleProgram
+from .sparql import format_tsv_term
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs
+
+SCHEMA = Namespace("http://schema.org/")
+LABELS = (RDFS.label, SKOS.prefLabel, FOAF.name, SCHEMA.name)
+
+
+class RedlinkEmulator(object):
+    """
+    In-memory stand-in of the Redlink API, served over HTTP from a background thread
+    """
+
+    def __init__(self, key="emulator", datasets=("test",), analyses=("test",), owner="emulator",
+                 host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503,
+                 retry_after=None, language="en", seed=None):
+        """
+        @param key: api key accepted by the emulator
+        @param datasets: names of the datasets of the key
+        @param analyses: names of the analyses of the key
+        @param owner: owner of the key, part of the base uri of the datasets
+        @param host: address to listen on (default=127.0.0.1)
+        @param port: port to listen on (default: any free one)
+        @param latency: seconds each request takes at least (default=0)
+        @param jitter: maximum seconds randomly added to the latency (default=0)
+        @param error_rate: fraction of the requests failing with C{error_status} (default=0), but
+                           the ones for the status, so clients can always be created
+        @param error_status: status of the injected errors (default=503)
+        @param retry_after: C{Retry-After} seconds sent along with the injected errors (default: none)
+        @param language: language reported for every enhanced content (default=en)
+        @param seed: seed of the random generator of latencies and errors
+        """
+        self.key = key
+        self.analyses = list(analyses)
+        self.owner = owner
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.language = language
+        self.requests = 0
+        self.store = Dataset(default_union=True)
+        self._datasets = {}
+        self._faults = []
+        self._labels = None
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._server = None
+        self._thread = None
+        for name in datasets:
+            self.dataset(name)
+
+    @property
+    def endpoint(self):
+        """
+        Endpoint to point the clients at, once started
+
+        @rtype: str
+        """
+        if self._server is None:
+            raise RuntimeError("emulator not started")
+        return "http://%s:%d" % (self.host, self._server.server_address[1])
+
+    def start(self):
+        """
+        Start serving requests in a background thread
+
+        @return: the emulator itself
+        """
+        if self._server is None:
+            self._server = _Server((self.host, self.port), _Handler)
+            self._server.emulator = self
+            self._thread = threading.Thread(target=self._server.serve_forever, name="redlink-emulator")
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving requests
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def dataset(self, name):
+        """
+        Graph of a dataset, created when missing, to load fixtures or inspect the
+        outcome of the requests (holding C{lock} while it is being served)
+
+        @param name: dataset name
+        @rtype: C{rdflib.Graph}
+        @return: graph
+        """
+        with self._lock:
+            if name not in self._datasets:
+                identifier = URIRef("http://data.redlink.io/%s/%s/" % (self.owner, name))
+                self._datasets[name] = self.store.graph(identifier)
+            self._labels = None
+            return self._datasets[name]
+
+    @property
+    def lock(self):
+        """
+        Lock guarding the store (rdflib is not thread safe)
+        """
+        return self._lock
+
+    def inject(self, status=None, count=1, path=None, retry_after=None):
+        """
+        Make the next requests fail
+
+        @param status: status of the responses (default: C{error_status})
+        @param count: number of requests failing (default=1)
+        @param path: only fail requests whose path contains this (default: any but the status)
+        @param retry_after: C{Retry-After} seconds sent along with the errors (default: none)
+        """
+        with self._lock:
+            self._faults.extend([(status or self.error_status, path, retry_after)] * count)
+
+    @property
+    def status(self):
+        """
+        Status document of the key
+
+        @rtype: dict
+        """
+        return {
+            "accessible": True,
+            "owner": self.owner,
+            "datasets": sorted(self._datasets),
+            "analyses": list(self.analyses),
+        }
+
+    def _fault(self, path, status_request):
+        # explicitly injected faults go first, then the random ones
+        with self._lock:
+            for i, (status, contains, retry_after) in enumerate(self._faults):
+                if (contains is None and not status_request) or (contains is not None and contains in path):
+                    del self._faults[i]
+                    return status, retry_after
+            if not status_request and self.error_rate and self._random.random() < self.error_rate:
+                return self.error_status, self.retry_after
+            return None
+
+    def _delay(self):
+        with self._lock:
+            return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def _route(self, method, segments, params, headers, body):
+        if not segments:
+            return _json(self.status)
+        kind = segments[0]
+        if kind == "analysis" and len(segments) == 3 and segments[2] == "enhance" and method == "POST":
+            if segments[1] not in self.analyses:
+                return _error(404, "unknown analysis %s" % segments[1])
+            return self._enhance(body, params.get("in", Format.TEXT.name), params.get("out", Format.JSON.name))
+        if kind != "data" or len(segments) < 2:
+            return _error(404, "unknown resource /%s" % "/".join(segments))
+        if segments[1:] == ["sparql", "select"] and method == "POST":
+            return self._select(self.store, body, headers.get("Accept"))
+
+        dataset = self._datasets.get(segments[1])
+        if dataset is None:
+            return _error(404, "unknown dataset %s" % segments[1])
+        rest = segments[2:]
+        if not rest:
+            return self._dataset(method, dataset, None, headers, body)
+        elif rest == ["resource"] and params.get("uri"):
+            return self._dataset(method, dataset, URIRef(params["uri"]), headers, body)
+        elif rest == ["release"] and method == "POST":
+            return _json({})
+        elif rest == ["sparql", "select"] and method == "POST":
+            return self._select(dataset, body, headers.get("Accept"))
+        elif rest == ["sparql", "update"] and method == "POST":
+            return self._update(dataset, body)
+        elif rest == ["ldpath"] and method == "POST" and params.get("uri"):
+            return self._ldpath(dataset, params["uri"], body)
+        return _error(404, "unknown resource /%s" % "/".join(segments))
+
+    def _dataset(self, method, dataset, uri, headers, body):
+        if method == "GET":
+            rdf_format = _rdf_format(headers.get("Accept"))
+            with self._lock:
+                graph = dataset
+                if uri is not None:
+                    graph = Graph()
+                    for triple in dataset.triples((uri, None, None)):
+                        graph.add(triple)
+                return 200, rdf_format.mimetype, _serialize(graph, rdf_format), {}
+        elif method in ("POST", "PUT"):
+            rdf_format = from_mimetype(headers.get("Content-Type", ""))
+            if not (rdf_format and rdf_format.rdflibMapping):
+                return _error(415, "unsupported RDF format %s" % headers.get("Content-Type"))
+            try:
+                graph = _parse(body.decode("UTF-8"), rdf_format)
+            except Exception as e:
+                return _error(400, "invalid RDF data: %s" % e)
+            with self._lock:
+                if method == "PUT":
+                    dataset.remove((uri, None, None))
+                for triple in graph:
+                    dataset.add(triple)
+                self._labels = None
+            return 200, "text/plain", b"", {}
+        elif method == "DELETE":
+            with self._lock:
+                dataset.remove((uri, None, None))
+                self._labels = None
+            return 200, "text/plain", b"", {}
+        return _error(405, "method %s not allowed" % method)
+
+    def _select(self, graph, body, accept):
+        accept = accept or ""
+        try:
+            with self._lock:
+                results = graph.query(body.decode("UTF-8"))
+                if results.type in ("CONSTRUCT", "DESCRIBE"):
+                    rdf_format = _rdf_format(accept)
+                    return 200, rdf_format.mimetype, _serialize(results.graph, rdf_format), {}
+                elif "text/tab-separated-values" in accept and results.type == "SELECT":
+                    lines = ["\t".join("?%s" % var for var in results.vars)]
+                    lines.extend("\t".join(format_tsv_term(row[var]) for var in results.vars) for row in results)
+                    return 200, "text/tab-separated-values", ("\n".join(lines) + "\n").encode("UTF-8"), {}
+                else:
+                    return 200, "application/sparql-results+json", results.serialize(format="json"), {}
+        except Exception as e:
+            return _error(400, "invalid SPARQL query: %s" % e)
+
+    def _update(self, dataset, body):
+        try:
+            with self._lock:
+                dataset.update(body.decode("UTF-8"))
+                self._labels = None
+        except Exception as e:
+            return _error(400, "invalid SPARQL update: %s" % e)
+        return 200, "text/plain", b"", {}
+
+    def _ldpath(self, dataset, uri, body):
+        program = SimpleProgram.parse(body.decode("UTF-8"))
+        if program is None:
+            return _error(400, "LDPath program not supported by the emulator")
+        with self._lock:
+            results = json.loads(dataset.query(program.query([uri])).serialize(format="json").decode("UTF-8"))
+        return _json(program.results([uri], results["results"]["bindings"])[uri])
+
+    def _enhance(self, body, input, output):
+        output = getattr(Format, output.upper(), None)
+        if output is None or not (output == Format.JSON or output.rdflibMapping):
+            return _error(415, "unsupported output format")
+        text = body.decode("UTF-8", "replace")
+        if input == Format.HTML.name:
+            text = _TAGS.sub(" ", text)
+
+        digest = hashlib.sha1(text.encode("UTF-8")).hexdigest()
+        content_item = URIRef("urn:content-item-sha1-%s" % digest)
+        graph = Graph()
+        graph.bind("fise", FISE)
+        graph.bind("dct", DC)
+        language = _annotation(graph, FISE.TextAnnotation, content_item, digest, "language")
+        graph.add((language, DC.language, Literal(self.language)))
+        graph.add((language, DC.type, DC.LinguisticSystem))
+
+        pattern, entities = self._spotting()
+        for match in pattern.finditer(text) if pattern else []:
+            start = _utf16_length(text[:match.start()])
+            end = start + _utf16_length(match.group(0))
+            mention = _annotation(graph, FISE.TextAnnotation, content_item, digest, start, end)
+            graph.add((mention, FISE.start, Literal(start, datatype=XSD.integer)))
+            graph.add((mention, FISE.end, Literal(end, datatype=XSD.integer)))
+            graph.add((mention, FISE["selected-text"], Literal(match.group(0), lang=self.language)))
+            for entity, types in entities[match.group(0)]:
+                annotation = _annotation(graph, FISE.EntityAnnotation, content_item, digest, start, end, entity)
+                graph.add((annotation, DC.relation, mention))
+                graph.add((annotation, FISE["entity-reference"], entity))
+                graph.add((annotation, FISE["entity-label"], Literal(match.group(0))))
+                graph.add((annotation, FISE.confidence, Literal(1.0)))
+                for kind in types:
+                    graph.add((annotation, FISE["entity-type"], kind))
+
+        if output == Format.JSON:
+            return 200, Format.JSON.mimetype, _serialize(graph, Format.JSONLD), {}
+        return 200, output.mimetype, _serialize(graph, output), {}
+
+    def _spotting(self):
+        # pattern matching the labels of all the resources, rebuilt after any write
+        with self._lock:
+            if self._labels is None:
+                entities = {}
+                for prop in LABELS:
+                    for entity, label in self.store.subject_objects(prop):
+                        if isinstance(entity, URIRef) and isinstance(label, Literal) and str(label).strip():
+                            types = tuple(self.store.objects(entity, RDF.type))
+                            entities.setdefault(str(label), set()).add((entity, types))
+                labels = sorted(entities, key=len, reverse=True)
+                pattern = re.compile(r"\b(?:%s)\b" % "|".join(re.escape(l) for l in labels), re.UNICODE) \
+                    if labels else None
+                self._labels = (pattern, dict((l, sorted(e)) for l, e in entities.items()))
+            return self._labels
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def log_message(self, format, *args):
+        logging.debug("Emulator: %s" % (format % args))
+
+    def _handle(self, method):
+        emulator = self.server.emulator
+        body = self._read_body()
+        url = urlsplit(self.path)
+        params = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+        segments = [segment for segment in url.path.split("/") if segment][1:]
+        with emulator.lock:
+            emulator.requests += 1
+
+        delay = emulator._delay()
+        if delay > 0:
+            time.sleep(delay)
+        if params.get("key") != emulator.key:
+            status, mimetype, content, headers = _error(401, "invalid key")
+        else:
+            fault = emulator._fault(url.path, not segments)
+            if fault:
+                status, retry_after = fault
+                status, mimetype, content, headers = _error(status, "injected error")
+                if retry_after is not None:
+                    headers["Retry-After"] = str(retry_after)
+            else:
+                try:
+                    status, mimetype, content, headers = emulator._route(method, segments, params, self.headers, body)
+                except Exception as e:
+                    logging.error("Emulator failed handling %s %s: %s" % (method, url.path, e))
+                    status, mimetype, content, headers = _error(500, str(e))
+
+        self.send_response(status)
+        self.send_header("Content-Type", mimetype)
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    while self.rfile.readline().strip():
+                        pass
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+
+_TAGS = re.compile(r"<[^>]*>")
+
+
+def _json(document, status=200):
+    return status, Format.JSON.mimetype, json.dumps(document).encode("UTF-8"), {}
+
+
+def _error(status, message):
+    return _json({"error": message, "status": status}, status)
+
+
+def _rdf_format(accept):
+    # first acceptable RDF format, Turtle otherwise
+    for mimetype in (accept or "").split(","):
+        rdf_format = from_mimetype(mimetype.split(";")[0].strip())
+        if rdf_format and rdf_format.rdflibMapping:
+            return rdf_format
+    return Format.TURTLE
+
+
+def _parse(data, rdf_format):
+    # N-Triples and N3 are parsed leniently, as Turtle, when they are not strictly valid (single quoted literals...)
+    graph = Graph()
+    try:
+        graph.parse(data=data, format=rdf_format.rdflibMapping)
+    except Exception:
+        if rdf_format.rdflibMapping not in ("nt", "n3"):
+            raise
+        graph = Graph()
+        graph.parse(data=data, format="turtle")
+    return graph
+
+
+def _serialize(graph, rdf_format):
+    content = graph.serialize(format=rdf_format.rdflibMapping)
+    return content.encode("UTF-8") if not isinstance(content, bytes) else content
+
+
+def _annotation(graph, kind, content_item, digest, *parts):
+    # stable identifiers, so the same content always gets the same enhancements
+    uri = URIRef("urn:enhancement-%s" % hashlib.sha1(("%s %s" % (digest, parts)).encode("UTF-8")).hexdigest())
+    graph.add((uri, RDF.type, FISE.Enhancement))
+    graph.add((uri, RDF.type, kind))
+    graph.add((uri, FISE["extracted-from"], content_item))
+    return uri
+
+
+def _utf16_length(text):
+    return len(text.encode("UTF-16-LE")) // 2
+
+
+def main(args=None):
+    """
+    Run the emulator as a standalone server, until interrupted
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description="Local emulator of the Redlink API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--key", default="emulator")
+    parser.add_argument("--dataset", action="append", dest="datasets", help="dataset name (repeatable)")
+    parser.add_argument("--analysis", action="append", dest="analyses", help="analysis name (repeatable)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds each request takes at least")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum seconds randomly added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of the requests failing")
+    parser.add_argument("--error-status", type=int, default=503, help="status of the failing requests")
+    parser.add_argument("--retry-after", type=int, help="Retry-After seconds of the failing requests")
+    parser.add_argument("--load", nargs=2, action="append", default=[], metavar=("DATASET", "FILE"),
+                        help="load a RDF file into a dataset (repeatable)")
+    options = parser.parse_args(args)
+
+    emulator = RedlinkEmulator(options.key, options.datasets or ["test"], options.analyses or ["test"],
+                               host=options.host, port=options.port, latency=options.latency,
+                               jitter=options.jitter, error_rate=options.error_rate,
+                               error_status=options.error_status, retry_after=options.retry_after)
+    for dataset, path in options.load:
+        emulator.dataset(dataset).parse(path)
+    emulator.start()
+    print("Redlink emulator listening on %s (key: %s)" % (emulator.endpoint, emulator.key))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == "__main__":
+    main()
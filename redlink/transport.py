@@ -0,0 +1,125 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class Transport(object):
+    """
+    Base transport, in charge of actually sending the HTTP requests built by the clients.
+    """
+
+    def request(self, method, url, data=None, headers=None, verify=True, stream=False, timeout=None):
+        """
+        Send a request
+
+        @type method: str
+        @param method: HTTP method
+
+        @type url: str
+        @param url: target url
+
+        @param data: request payload
+        @param headers: request headers
+        @param verify: certificate (bundle) used to verify the server
+        @param stream: do not read the response body in advance
+        @param timeout: request timeout (in seconds)
+
+        @rtype: C{requests.Response}
+        @return: response
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        """
+        Release the resources held by the transport
+        """
+        pass
+
+
+class SimpleTransport(Transport):
+    """
+    Transport opening a new connection for every request (the original behaviour)
+    """
+
+    def request(self, method, url, data=None, headers=None, verify=True, stream=False, timeout=None):
+        return requests.request(method, url, data=data, headers=headers, verify=verify, stream=stream,
+                                timeout=timeout)
+
+
+class SessionTransport(Transport):
+    """
+    Transport keeping a pool of keep-alive connections per host, so the TCP and TLS
+    handshakes are paid only once per connection. Instances can be shared by several
+    clients.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False):
+        """
+        @type pool_connections: int
+        @param pool_connections: number of hosts to keep connection pools for
+
+        @type pool_maxsize: int
+        @param pool_maxsize: maximum number of connections kept alive per host
+
+        @type pool_block: bool
+        @param pool_block: block when no free connection is available, instead of opening a new one
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, data=None, headers=None, verify=True, stream=False, timeout=None):
+        return self.session.request(method, url, data=data, headers=headers, verify=verify, stream=stream,
+                                    timeout=timeout)
+
+    def close(self):
+        self.session.close()
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport():
+    """
+    Returns the transport shared by all clients created without an explicit one
+
+    @rtype: C{Transport}
+    @return: shared transport
+    """
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = SessionTransport()
+    return _default_transport
+
+
+def set_default_transport(transport):
+    """
+    Replaces the transport shared by all clients created without an explicit one
+
+    @type transport: C{Transport}
+    @param transport: new shared transport
+    """
+    global _default_transport
+    with _default_transport_lock:
+        _default_transport = transport
@@ -14,20 +14,15 @@
 
 import os
 from setuptools import setup
-from pip.req import parse_requirements
-from pip.download import PipSession
 import re
 
 version = ''
 with open('redlink/__init__.py', 'r') as f:
     version = re.search(r'^__version__\s*=\s*[\'"]([^\'"]*)[\'"]', f.read(), re.MULTILINE).group(1)
 
-requirements = list(parse_requirements('requirements.txt', session=PipSession()))
-try:
-    requires = [str(r.req.project_name) for r in requirements]
-except AttributeError:
-    requires = [str(r.req.name) for r in requirements]
-install_requires = [str(r.req) for r in requirements]
+with open('requirements.txt', 'r') as f:
+    install_requires = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+requires = [re.split(r'[<>=!~;\[ ]', r, 1)[0] for r in install_requires]
 
 setup(
       name = 'redlink',
@@ -40,9 +35,14 @@ setup(
       url = 'https://github.com/redlink-gmbh/redlink-python-sdk',
       download_url = 'https://github.com/redlink-gmbh/redlink-python-sdk/releases',
       platforms = ['any'],
+      python_requires = '>=3.7',
       packages = ['redlink'],
       requires = requires,
       install_requires = install_requires,
+      extras_require = {
+        "async": ["aiohttp"],
+        "columnar": ["numpy"]
+      },
       include_package_data = True,
       package_data = {
         "redlink": [os.path.join("redlink", "redlink-CA.crt")]
@@ -52,9 +52,14 @@ setup(
         'Intended Audience :: Developers',
         'License :: OSI Approved :: Apache Software License',
         'Operating System :: OS Independent',
-        'Programming Language :: Python :: 2',
         'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
+        'Programming Language :: Python :: 3.12',
       ],
       keywords = 'python redlink api client sdk linkeddata rdf marmotta analysis nlp stanbol',
-      use_2to3 = True,
 )
@@ -0,0 +1,129 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import io
+import os
+import pathlib
+import tempfile
+from nose.tools import assert_true, assert_equals
+from .utils import setup_func, with_setup_args
+
+from rdflib import Graph, URIRef, Literal
+from rdflib.namespace import RDFS
+
+import redlink
+from redlink.chunking import FISE
+from redlink.format import Format
+from redlink.testing import RedlinkEmulator
+
+
+@with_setup_args(setup_func)
+def test_async_analysis_enhancements(key, endpoint):
+    async def enhance():
+        async with await redlink.create_async_analysis_client(key, endpoint=endpoint) as analysis:
+            assert_true(analysis.status["accessible"])
+            return await analysis.enhance("Lorem Ipsum is simply dummy text of the printing and typesetting industry.")
+    enhancements = asyncio.run(enhance())
+    assert_true(len(enhancements) > 0)
+
+
+@with_setup_args(setup_func)
+def test_async_sparql(key, endpoint):
+    async def query():
+        async with await redlink.create_async_data_client(key, endpoint=endpoint) as data:
+            assert_true(data.status["accessible"])
+            return await data.sparql_tuple_query("select * where { ?s ?p ?o }", "test")
+    results = asyncio.run(query())
+    assert_true(len(results["results"]["bindings"]) >= 0)
+
+
+def test_async_data_batches():
+    async def run(emulator):
+        async with await redlink.create_async_data_client(emulator.key, endpoint=emulator.endpoint) as data:
+            uris = ["http://example.org/%d" % i for i in range(10)]
+            triples = "".join("<%s> <http://example.org/label> \"%d\" .\n" % (uri, i) for i, uri in enumerate(uris))
+            report = await data.bulk_import_dataset(triples, Format.NTRIPLES.mimetype, "test", batch_size=3)
+            assert_true(report.ok)
+            assert_equals(10, report.triples)
+
+            assert_equals(10, len([t async for t in data.iter_dataset_triples("test")]))
+            output = io.BytesIO()
+            assert_true(await data.export_dataset_to("test", output, chunk_size=100) > 0)
+            assert_equals(10, len(output.getvalue().splitlines()))
+            with await data.iter_sparql_rows("select ?s where { ?s ?p ?o }", "test") as rows:
+                assert_equals(sorted(uris), sorted(row[0] for row in rows))
+            pages = [row async for row in data.iter_sparql_tuple_query(
+                "select ?s where { ?s ?p ?o } order by ?s", "test", page_size=4)]
+            assert_equals(10, len(pages))
+            results = dict([pair async for pair in data.ldpath_many(uris[:3], "name = <http://example.org/label> ;",
+                                                                    "test")])
+            assert_equals({"name": [{"type": "literal", "value": "1"}]}, results[uris[1]])
+
+            outcomes = await data.delete_resources(uris[:4], "test", batch_size=2)
+            assert_equals(dict((uri, True) for uri in uris[:4]), outcomes)
+            assert_equals(6, len(emulator.dataset("test")))
+
+            graph = Graph()
+            graph.add((URIRef(uris[9]), URIRef("http://example.org/label"), Literal("changed")))
+            outcome = await data.sync_dataset(graph, "test")
+            assert_equals({"inserted": 1, "deleted": 1, "removed": 5, "unchanged": 0}, outcome)
+            assert_equals(1, len(emulator.dataset("test")))
+
+            assert_true(not hasattr(data, "buffered_writer"))
+
+    with RedlinkEmulator() as emulator:
+        asyncio.run(run(emulator))
+
+
+def test_async_import_payloads():
+    triples = ["<http://example.org/%d> <http://example.org/label> \"%d\" .\n" % (i, i) for i in range(6)]
+
+    async def run(emulator, path):
+        async with await redlink.create_async_data_client(emulator.key, endpoint=emulator.endpoint) as data:
+            assert_true(await data.import_dataset(pathlib.Path(path), Format.NTRIPLES.mimetype, "test"))
+            assert_true(await data.import_dataset(io.StringIO("".join(triples[2:4])), Format.NTRIPLES.mimetype,
+                                                  "test"))
+            assert_true(await data.import_dataset(iter(triples[4:]), Format.NTRIPLES.mimetype, "test"))
+            report = await data.bulk_import_dataset(pathlib.Path(path), Format.NTRIPLES.mimetype, "other")
+            assert_equals(2, report.triples)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "data.nt")
+        with open(path, "w") as f:
+            f.write("".join(triples[:2]))
+        with RedlinkEmulator() as emulator:
+            emulator.dataset("other")
+            asyncio.run(run(emulator, path))
+            assert_equals(6, len(emulator.dataset("test")))
+            assert_equals(2, len(emulator.dataset("other")))
+
+
+def test_async_enhance_many():
+    async def run(emulator):
+        async with await redlink.create_async_analysis_client(emulator.key, endpoint=emulator.endpoint) as analysis:
+            results = [r async for r in analysis.enhance_many(["Salzburg", "Paris and Salzburg"],
+                                                              output=Format.TURTLE, max_in_flight=1)]
+            assert_equals([0, 1], [r.index for r in results])
+            assert_true(all(r.ok and len(r.value) > 0 for r in results))
+            text = "Salzburg is nice. " * 20
+            chunked = await analysis.enhance(text, output=Format.TURTLE, chunk_size=100, overlap=20)
+            whole = await analysis.enhance(text, output=Format.TURTLE)
+            assert_equals(len(set(whole.objects(None, FISE["selected-text"]))),
+                          len(set(chunked.objects(None, FISE["selected-text"]))))
+
+    with RedlinkEmulator() as emulator:
+        emulator.dataset("test").add((URIRef("http://example.org/Salzburg"), RDFS.label, Literal("Salzburg")))
+        asyncio.run(run(emulator))
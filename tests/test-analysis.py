@@ -16,11 +16,40 @@ from nose.tools import assert_true
 from .utils import setup_func, with_setup_args
 
 import redlink
+from redlink.format import Format
 
 
 @with_setup_args(setup_func)
-def test_analysis_enhancements(key):
-    analysis = redlink.create_analysis_client(key)
+def test_analysis_enhancements(key, endpoint):
+    analysis = redlink.create_analysis_client(key, endpoint=endpoint)
     assert_true(analysis.status["accessible"])
     enhancements = analysis.enhance("Lorem Ipsum is simply dummy text of the printing and typesetting industry.")
     assert_true(len(enhancements) > 0)
+
+
+@with_setup_args(setup_func)
+def test_analysis_enhance_many(key, endpoint):
+    analysis = redlink.create_analysis_client(key, endpoint=endpoint)
+    contents = ["Lorem Ipsum is simply dummy text of the printing and typesetting industry."] * 4
+    results = list(analysis.enhance_many(contents, max_in_flight=2))
+    assert_true(len(results) == 4)
+    assert_true(all(r.ok and len(r.value) > 0 for r in results))
+
+
+@with_setup_args(setup_func)
+def test_analysis_cached_enhancements(key, endpoint):
+    cache = redlink.LRUCache(maxsize=16)
+    analysis = redlink.create_analysis_client(key, cache=cache, endpoint=endpoint)
+    content = "Lorem Ipsum is simply dummy text of the printing and typesetting industry."
+    first = analysis.enhance(content)
+    second = analysis.enhance(content)
+    assert_true(first == second)
+    assert_true(cache.hits == 1 and cache.misses == 1)
+
+
+@with_setup_args(setup_func)
+def test_analysis_chunked_enhancements(key, endpoint):
+    analysis = redlink.create_analysis_client(key, endpoint=endpoint)
+    content = "Lorem Ipsum is simply dummy text of the printing and typesetting industry. " * 50
+    enhancements = analysis.enhance(content, output=Format.TURTLE, chunk_size=1000, overlap=100)
+    assert_true(len(enhancements) > 0)
@@ -0,0 +1,82 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import time
+from nose.tools import assert_true, assert_equals, raises
+
+from redlink.batch import bounded_map, chunked, BatchResult, BulkImportReport
+
+
+def test_bounded_map_ordered():
+    results = list(bounded_map(lambda x: x * 2, range(20), max_in_flight=4))
+    assert_equals(list(range(20)), [r.index for r in results])
+    assert_equals([x * 2 for x in range(20)], [r.value for r in results])
+
+
+def test_bounded_map_completion_order():
+    def slow_first(x):
+        time.sleep(0.2 if x == 0 else 0)
+        return x
+
+    results = list(bounded_map(slow_first, range(4), max_in_flight=4, ordered=False))
+    assert_equals(0, results[-1].value)
+    assert_equals(set(range(4)), set(r.value for r in results))
+
+
+def test_bounded_map_collects_errors():
+    def fail_on_odd(x):
+        if x % 2:
+            raise ValueError(x)
+        return x
+
+    results = list(bounded_map(fail_on_odd, range(6), max_in_flight=2))
+    assert_equals(6, len(results))
+    assert_equals([0, 2, 4], [r.value for r in results if r.ok])
+    assert_true(all(isinstance(r.error, ValueError) for r in results if not r.ok))
+
+
+def test_bounded_map_consumes_lazily():
+    consumed = []
+
+    def items():
+        for i in range(1000):
+            consumed.append(i)
+            yield i
+
+    results = bounded_map(lambda x: x, items(), max_in_flight=3)
+    next(results)
+    assert_true(len(consumed) <= 4)
+    results.close()
+
+
+@raises(ValueError)
+def test_bounded_map_invalid_bound():
+    list(bounded_map(lambda x: x, range(3), max_in_flight=0))
+
+
+def test_chunked():
+    assert_equals([[0, 1, 2], [3, 4, 5], [6]], list(chunked(range(7), 3)))
+
+
+def test_bulk_import_report():
+    report = BulkImportReport()
+    report.add(BatchResult(0, None, value=(10, 100)))
+    report.add(BatchResult(1, None, error=RuntimeError()))
+    assert_equals(2, report.batches)
+    assert_equals(10, report.triples)
+    assert_equals(100, report.bytes)
+    assert_equals(1, len(report.failed))
+    assert_true(not report.ok)
+    assert_true(report.triples_per_second > 0)
@@ -0,0 +1,119 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import threading
+
+from nose.tools import assert_true, assert_equals, raises
+from rdflib import URIRef
+
+import redlink
+from redlink.format import Format
+from redlink.ntriples import parse_lines
+from .utils import FakeResponse, FakeTransport
+
+
+class Recorder(object):
+    """
+    Handler of a C{FakeTransport} recording the imports, optionally holding them until released
+    """
+
+    def __init__(self, status_code=200, hold=False):
+        self.status_code = status_code
+        self.imports = []
+        self.imported = threading.Event()
+        self.released = threading.Event()
+        if not hold:
+            self.released.set()
+
+    def __call__(self, method, url, data):
+        if "sparql" not in url:
+            self.imports.append(data)
+            self.imported.set()
+            self.released.wait(5)
+        return FakeResponse(self.status_code)
+
+
+def create_writer(recorder, **kwargs):
+    data = redlink.create_data_client("key", FakeTransport(handler=recorder), lazy=True)
+    return data.buffered_writer("test", **kwargs)
+
+
+def import_resource(writer, i):
+    uri = "http://example.org/%d" % i
+    writer.import_resource("<%s> <http://example.org/label> \"%d\" ." % (uri, i), Format.NTRIPLES.mimetype, uri)
+
+
+def test_size_trigger():
+    recorder = Recorder()
+    with create_writer(recorder, max_triples=3, max_delay=60) as writer:
+        for i in range(2):
+            import_resource(writer, i)
+        assert_true(not recorder.imported.wait(0.2))
+        import_resource(writer, 2)
+        assert_true(recorder.imported.wait(5))
+        assert_equals(3, recorder.imports[0].count(b"\n"))
+    assert_equals(1, len(recorder.imports))
+
+
+def test_time_trigger():
+    recorder = Recorder()
+    with create_writer(recorder, max_triples=100, max_delay=0.1) as writer:
+        import_resource(writer, 0)
+        assert_true(recorder.imported.wait(5))
+        assert_equals(1, len(recorder.imports))
+    assert_equals(1, len(recorder.imports))
+
+
+def test_backpressure():
+    recorder = Recorder(hold=True)
+    with create_writer(recorder, max_triples=1, max_delay=60, max_pending=1) as writer:
+        import_resource(writer, 0)
+        assert_true(recorder.imported.wait(5))
+        import_resource(writer, 1)
+        blocked = threading.Thread(target=import_resource, args=(writer, 2))
+        blocked.start()
+        blocked.join(0.2)
+        assert_true(blocked.is_alive())
+        recorder.released.set()
+        blocked.join(5)
+        assert_true(not blocked.is_alive())
+    assert_equals(3, len(recorder.imports))
+
+
+@raises(RuntimeError)
+def test_failed_flush():
+    with create_writer(Recorder(status_code=500)) as writer:
+        import_resource(writer, 0)
+
+
+@raises(KeyError)
+def test_failed_flush_keeps_exception():
+    with create_writer(Recorder(status_code=500)) as writer:
+        import_resource(writer, 0)
+        raise KeyError("body")
+
+
+def test_blank_nodes_per_resource():
+    recorder = Recorder()
+    with create_writer(recorder, max_triples=100, max_delay=60) as writer:
+        for i in range(2):
+            uri = "http://example.org/%d" % i
+            writer.import_resource("<%s> <http://example.org/author> _:b0 .\n_:b0 <http://example.org/name> \"%d\" ."
+                                   % (uri, i), Format.NTRIPLES.mimetype, uri)
+    assert_equals(1, len(recorder.imports))
+    triples = list(parse_lines(recorder.imports[0].splitlines()))
+    authors = set(o for s, p, o in triples if p == URIRef("http://example.org/author"))
+    assert_equals(2, len(authors))
+    assert_equals(authors, set(s for s, p, o in triples if p == URIRef("http://example.org/name")))
@@ -0,0 +1,115 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from nose.tools import assert_true, assert_equals
+
+from redlink.cache import LRUCache, SqliteCache, hash_key
+
+
+def test_hash_key():
+    assert_equals(hash_key("a", "text", "json", "foo"), hash_key("a", "text", "json", b"foo"))
+    assert_true(hash_key("a", "text", "json", "foo") != hash_key("a", "text", "turtle", "foo"))
+
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert_equals(1, cache.get("a"))
+    cache.put("c", 3)
+    assert_equals(None, cache.get("b"))
+    assert_equals(1, cache.get("a"))
+    assert_equals({"hits": 2, "misses": 1, "evictions": 1, "size": 2}, cache.stats())
+
+
+def test_lru_ttl():
+    cache = LRUCache(ttl=0)
+    cache.put("a", 1)
+    time.sleep(0.01)
+    assert_equals(None, cache.get("a"))
+    assert_equals(1, cache.evictions)
+
+
+def test_sqlite_survives_restart():
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, "cache.db")
+        cache = SqliteCache(path)
+        cache.put("a", ("application/json", "{}"))
+        cache.close()
+        cache = SqliteCache(path)
+        assert_equals(("application/json", "{}"), cache.get("a"))
+        cache.close()
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_sqlite_eviction():
+    folder = tempfile.mkdtemp()
+    try:
+        cache = SqliteCache(os.path.join(folder, "cache.db"), maxsize=2)
+        cache.put("a", ("text/plain", "1"))
+        time.sleep(0.01)
+        cache.put("b", ("text/plain", "2"))
+        time.sleep(0.01)
+        cache.put("c", ("text/plain", "3"))
+        assert_equals(2, len(cache))
+        assert_equals(None, cache.get("a"))
+        assert_equals(1, cache.evictions)
+        cache.close()
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_sqlite_plain_columns():
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, "cache.db")
+        db = sqlite3.connect(path)
+        db.execute("CREATE TABLE cache (name TEXT)")
+        db.execute("INSERT INTO cache VALUES ('not ours')")
+        db.commit()
+        db.close()
+        cache = SqliteCache(path)
+        cache.put("a", ("text/turtle", "<urn:a> <urn:p> \"\u00e1\" ."))
+        cache.close()
+        db = sqlite3.connect(path)
+        assert_equals([("not ours",)], db.execute("SELECT name FROM cache").fetchall())
+        assert_equals(("text", "text"), db.execute("SELECT typeof(mimetype), typeof(text) FROM responses").fetchone())
+        db.close()
+    finally:
+        shutil.rmtree(folder)
+
+
+def test_concurrent_counters():
+    cache = LRUCache(maxsize=10)
+    cache.put("a", ("text/plain", "a"))
+
+    def lookup():
+        for i in range(1000):
+            cache.get("a" if i % 2 else "b")
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert_equals({"hits": 4000, "misses": 4000, "evictions": 0, "size": 1}, cache.stats())
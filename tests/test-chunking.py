@@ -0,0 +1,111 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import json
+import re
+import uuid
+
+from nose.tools import assert_true, assert_equals, raises
+from rdflib import Graph, URIRef, Literal
+from rdflib.namespace import RDF, XSD
+
+import redlink
+from redlink.chunking import FISE, DC, merge_enhancements, split_text
+from redlink.format import Format
+
+from .utils import FakeResponse, FakeTransport
+
+TEXT = "Paris is nice. Berlin is big.\n\nRome is old. \U0001F600 Vienna is far. " * 20
+
+
+def test_split_text():
+    chunks = split_text(TEXT, 200, 40)
+    assert_true(len(chunks) > 1)
+    assert_true(all(len(chunk) <= 200 for _, chunk in chunks))
+    assert_true(all(TEXT[offset:offset + len(chunk)] == chunk for offset, chunk in chunks))
+    assert_equals(len(TEXT), chunks[-1][0] + len(chunks[-1][1]))
+    for (previous, chunk), (offset, _) in zip(chunks, chunks[1:]):
+        assert_true(previous < offset <= previous + len(chunk))
+    assert_equals([(0, "short")], split_text("short", 200, 40))
+
+
+@raises(ValueError)
+def test_split_text_overlap():
+    split_text(TEXT, 200, 100)
+
+
+def _enhancements(text):
+    # enhancements of a fake engine annotating capitalized words, counting offsets in UTF-16
+    g = Graph()
+    content_item = URIRef("urn:content-item-%s" % uuid.uuid4())
+    for match in re.finditer(r"[A-Z][a-z]+", text):
+        start = len(text[:match.start()].encode("UTF-16-LE")) // 2
+        ta = URIRef("urn:enhancement-%s" % uuid.uuid4())
+        g.add((ta, RDF.type, FISE.Enhancement))
+        g.add((ta, RDF.type, FISE.TextAnnotation))
+        g.add((ta, FISE["extracted-from"], content_item))
+        g.add((ta, FISE.start, Literal(start, datatype=XSD.int)))
+        g.add((ta, FISE.end, Literal(start + len(match.group(0)), datatype=XSD.int)))
+        g.add((ta, FISE["selected-text"], Literal(match.group(0))))
+        ea = URIRef("urn:enhancement-%s" % uuid.uuid4())
+        g.add((ea, RDF.type, FISE.Enhancement))
+        g.add((ea, RDF.type, FISE.EntityAnnotation))
+        g.add((ea, FISE["extracted-from"], content_item))
+        g.add((ea, DC.relation, ta))
+        g.add((ea, FISE["entity-reference"], URIRef("http://dbpedia.org/resource/%s" % match.group(0))))
+        g.add((ea, FISE.confidence, Literal(0.5 + (start % 7) / 20.0)))
+    return g
+
+
+def _summary(g):
+    selections = set()
+    for ea in g.subjects(RDF.type, FISE.EntityAnnotation):
+        ta = g.value(ea, DC.relation)
+        selections.add((int(g.value(ta, FISE.start)), int(g.value(ta, FISE.end)),
+                        str(g.value(ta, FISE["selected-text"])), g.value(ea, FISE["entity-reference"])))
+    return selections
+
+
+def test_merge_enhancements():
+    chunks = split_text(TEXT, 200, 40)
+    merged = merge_enhancements(TEXT, [(offset, _enhancements(chunk)) for offset, chunk in chunks])
+    whole = _enhancements(TEXT)
+    assert_equals(_summary(whole), _summary(merged))
+    assert_equals(len(set(whole.subjects(RDF.type, FISE.TextAnnotation))),
+                  len(set(merged.subjects(RDF.type, FISE.TextAnnotation))))
+    assert_equals(1, len(set(merged.objects(None, FISE["extracted-from"]))))
+    assert_equals(len(set(merged.subjects(RDF.type, FISE.TextAnnotation))),
+                  len(set(merged.subjects(RDF.type, FISE.EntityAnnotation))))
+
+
+def _analyze(method, url, data):
+    if method == "GET":
+        return FakeResponse(200, json.dumps({"accessible": True, "analyses": ["test"], "datasets": [], "owner": 0}))
+    text = data.decode("UTF-8") if isinstance(data, bytes) else data
+    return FakeResponse(200, _enhancements(text).serialize(format="turtle"), Format.TURTLE.mimetype)
+
+
+def test_chunked_enhance():
+    analysis = redlink.create_analysis_client("key", FakeTransport(handler=_analyze), lazy=True)
+    whole = analysis.enhance(TEXT, output=Format.TURTLE)
+    chunked = analysis.enhance(TEXT, output=Format.TURTLE, chunk_size=200, overlap=40)
+    assert_equals(_summary(whole), _summary(chunked))
+
+
+@raises(ValueError)
+def test_chunked_enhance_json():
+    analysis = redlink.create_analysis_client("key", FakeTransport(handler=_analyze), lazy=True)
+    analysis.enhance(TEXT, output=Format.JSON, chunk_size=200, overlap=40)
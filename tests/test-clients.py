@@ -39,12 +39,34 @@ def test_empty_key_data_client():
 
 
 @with_setup_args(setup_func)
-def test_analysis_client_status(key):
-    analysis = redlink.create_analysis_client(key)
+def test_analysis_client_status(key, endpoint):
+    analysis = redlink.create_analysis_client(key, endpoint=endpoint)
     assert_true(analysis.status["accessible"])
 
 
 @with_setup_args(setup_func)
-def test_analysis_client_status(key):
-    data = redlink.create_data_client(key)
+def test_analysis_client_status(key, endpoint):
+    data = redlink.create_data_client(key, endpoint=endpoint)
     assert_true(data.status["accessible"])
+
+
+@with_setup_args(setup_func)
+def test_clients_sharing_transport(key, endpoint):
+    transport = redlink.create_transport(pool_maxsize=4)
+    analysis = redlink.create_analysis_client(key, transport, endpoint=endpoint)
+    data = redlink.create_data_client(key, transport, endpoint=endpoint)
+    assert_true(analysis.transport is data.transport)
+    assert_true(data.status["accessible"])
+
+
+@with_setup_args(setup_func)
+def test_lazy_data_client(key, endpoint):
+    data = redlink.create_data_client(key, lazy=True, endpoint=endpoint)
+    assert_true(data.status["accessible"])
+
+
+@with_setup_args(setup_func)
+@raises(ValueError)
+def test_lazy_invalid_key_data_client(key, endpoint):
+    data = redlink.create_data_client("invalid", lazy=True, endpoint=endpoint)
+    data.status
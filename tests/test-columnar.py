@@ -0,0 +1,120 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import json
+
+import numpy
+from nose.tools import assert_true, assert_equals, raises
+from rdflib import Graph, URIRef, Literal
+from rdflib.namespace import XSD
+
+from redlink.columnar import ColumnarResults, TermColumn
+
+
+def _results():
+    g = Graph()
+    for i in range(10):
+        s = URIRef("http://example.org/%d" % i)
+        g.add((s, URIRef("http://example.org/type"), URIRef("http://example.org/Type%d" % (i % 2))))
+        g.add((s, URIRef("http://example.org/count"), Literal(i)))
+        if i % 3:
+            g.add((s, URIRef("http://example.org/price"), Literal(i * 1.5)))
+    query = """select ?s ?type ?count ?price where {
+      ?s <http://example.org/type> ?type ; <http://example.org/count> ?count
+      optional { ?s <http://example.org/price> ?price }
+    } order by ?count"""
+    return ColumnarResults.from_json(json.loads(g.query(query).serialize(format="json")))
+
+
+def test_typed_columns():
+    results = _results()
+    assert_equals(10, len(results))
+    assert_equals(["s", "type", "count", "price"], results.vars)
+    assert_equals(numpy.int64, results["count"].dtype)
+    assert_equals(numpy.float64, results["price"].dtype)
+    assert_equals(4, int(numpy.isnan(results["price"]).sum()))
+    assert_true(isinstance(results["type"], TermColumn))
+    assert_equals(12, len(results.terms))
+
+
+def test_vectorized_filtering():
+    results = _results()
+    odd = results.filter(results["type"] == "http://example.org/Type1")
+    assert_equals(5, len(odd))
+    assert_equals(25, int(odd["count"].sum()))
+    assert_equals({"http://example.org/Type0": 5, "http://example.org/Type1": 5}, results["type"].counts())
+    assert_equals(0, int((results["type"] == "http://example.org/Other").sum()))
+    assert_equals(10, int(results["type"].isin(["http://example.org/Type0", "http://example.org/Type1"]).sum()))
+
+
+def test_rows():
+    results = _results()
+    row = results.row(3)
+    assert_equals("http://example.org/Type1", row["type"])
+    assert_equals(3, row["count"])
+    assert_true(numpy.isnan(row["price"]))
+    assert_equals(("http://example.org/2", "http://example.org/Type0", 2, 3.0), list(results)[2])
+
+
+@raises(ValueError)
+def test_ask_results():
+    ColumnarResults.from_json({"head": {}, "boolean": True})
+
+
+def test_distinct_terms():
+    bindings = [{"t": {"type": "uri", "value": "chat"}},
+                {"t": {"type": "literal", "value": "chat", "xml:lang": "en"}},
+                {"t": {"type": "literal", "value": "chat", "xml:lang": "fr"}},
+                {"t": {"type": "literal", "value": "chat", "xml:lang": "fr"}},
+                {"t": {"type": "typed-literal", "value": "chat", "datatype": str(XSD.token)}},
+                {}]
+    results = ColumnarResults.from_json({"head": {"vars": ["t"]}, "results": {"bindings": bindings}})
+    column = results["t"]
+    assert_equals(4, len(results.terms))
+    assert_equals(5, int((column == "chat").sum()))
+    assert_equals([1], numpy.flatnonzero(column == Literal("chat", lang="en")).tolist())
+    assert_equals([2, 3], numpy.flatnonzero(column == Literal("chat", lang="fr")).tolist())
+    assert_equals([0], numpy.flatnonzero(column == URIRef("chat")).tolist())
+    assert_equals([4], numpy.flatnonzero(column == Literal("chat", datatype=XSD.token)).tolist())
+    assert_equals(0, int((column == Literal("chat")).sum()))
+    assert_equals(3, int(column.isin([URIRef("chat"), Literal("chat", lang="fr")]).sum()))
+    assert_equals(4, int((column != Literal("chat", lang="fr")).sum()))
+    assert_equals({"chat": 5}, column.counts())
+    assert_equals(["chat"] * 5 + [None], column.tolist())
+    assert_equals([URIRef("chat"), Literal("chat", lang="en"), Literal("chat", lang="fr"), Literal("chat", lang="fr"),
+                   Literal("chat", datatype=XSD.token), None], column.tolist(terms=True))
+    assert_equals({"t": URIRef("chat")}, results.row(0, terms=True))
+    assert_equals({"t": Literal("chat", lang="en")}, results.row(1, terms=True))
+    assert_equals({"t": "chat"}, results.row(1))
+
+
+def test_invalid_numbers():
+    integer = str(XSD.integer)
+    bindings = [{"n": {"type": "literal", "value": "1", "datatype": integer},
+                 "m": {"type": "literal", "value": "1.5", "datatype": str(XSD.decimal)}},
+                {"n": {"type": "literal", "value": "1.5", "datatype": integer},
+                 "m": {"type": "literal", "value": "many", "datatype": str(XSD.decimal)}}]
+    results = ColumnarResults.from_json({"head": {"vars": ["n", "m"]}, "results": {"bindings": bindings}})
+    assert_true(isinstance(results["n"], TermColumn))
+    assert_true(isinstance(results["m"], TermColumn))
+    assert_equals({"n": Literal("1.5", datatype=XSD.integer), "m": Literal("many", datatype=XSD.decimal)},
+                  results.row(1, terms=True))
+
+    bindings.append({})
+    results = ColumnarResults.from_json({"head": {"vars": ["n"]}, "results": {"bindings": bindings}})
+    assert_true(isinstance(results["n"], TermColumn))
+    results = ColumnarResults.from_json({"head": {"vars": ["n"]}, "results": {"bindings": bindings[:1] + [{}]}})
+    assert_equals([1.0], results["n"][:1].tolist())
@@ -12,26 +12,33 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
+import json
 import os
-from nose.tools import assert_true, assert_equals
-from .utils import setup_func, with_setup_args, random_string
+import pathlib
+import re
+from nose.tools import assert_true, assert_equals, raises
+from .utils import setup_func, with_setup_args, random_string, FakeResponse, FakeTransport
+
+from rdflib import Graph, URIRef, Literal
 
 import redlink
 from redlink.format import Format
+from redlink.testing import RedlinkEmulator
 
 
 @with_setup_args(setup_func)
-def test_sparql(key):
-    data = redlink.create_data_client(key)
+def test_sparql(key, endpoint):
+    data = redlink.create_data_client(key, endpoint=endpoint)
     assert_true(data.status["accessible"])
     results = data.sparql_tuple_query("select * where { ?s ?p ?o }", "test")
     assert_true(len(results["results"]["bindings"]) >= 0)
 
 
 @with_setup_args(setup_func)
-def test_count_after_insert(key):
+def test_count_after_insert(key, endpoint):
     dataset = "test"
-    data = redlink.create_data_client(key)
+    data = redlink.create_data_client(key, endpoint=endpoint)
     assert_true(data.status["accessible"])
     assert_true(dataset in data.status["datasets"])
 
@@ -49,9 +56,9 @@ def test_count_after_insert(key):
 
 
 @with_setup_args(setup_func)
-def test_size_sparql_and_export(key):
+def test_size_sparql_and_export(key, endpoint):
     dataset = "test"
-    data = redlink.create_data_client(key)
+    data = redlink.create_data_client(key, endpoint=endpoint)
     assert_true(data.status["accessible"])
     assert_true(dataset in data.status["datasets"])
 
@@ -66,9 +73,9 @@ def test_size_sparql_and_export(key):
 
 
 @with_setup_args(setup_func)
-def test_clean_before_import(key):
+def test_clean_before_import(key, endpoint):
     dataset = "test"
-    data = redlink.create_data_client(key)
+    data = redlink.create_data_client(key, endpoint=endpoint)
     assert_true(data.status["accessible"])
     assert_true(dataset in data.status["datasets"])
 
@@ -79,9 +86,9 @@ def test_clean_before_import(key):
 
 
 @with_setup_args(setup_func)
-def test_clean_dataset(key):
+def test_clean_dataset(key, endpoint):
     dataset = "test"
-    data = redlink.create_data_client(key)
+    data = redlink.create_data_client(key, endpoint=endpoint)
     assert_true(data.status["accessible"])
     assert_true(dataset in data.status["datasets"])
 
@@ -91,9 +98,9 @@ def test_clean_dataset(key):
 
 
 @with_setup_args(setup_func)
-def test_import_resource(key):
+def test_import_resource(key, endpoint):
     dataset = "test"
-    data = redlink.create_data_client(key)
+    data = redlink.create_data_client(key, endpoint=endpoint)
     assert_true(data.status["accessible"])
     assert_true(dataset in data.status["datasets"])
 
@@ -107,9 +114,9 @@ def test_import_resource(key):
 
 
 @with_setup_args(setup_func)
-def test_clean_import_resource(key):
+def test_clean_import_resource(key, endpoint):
     dataset = "test"
-    data = redlink.create_data_client(key)
+    data = redlink.create_data_client(key, endpoint=endpoint)
     assert_true(data.status["accessible"])
     assert_true(dataset in data.status["datasets"])
 
@@ -125,9 +132,9 @@ def test_clean_import_resource(key):
 
 
 @with_setup_args(setup_func)
-def test_delete_resource(key):
+def test_delete_resource(key, endpoint):
     dataset = "test"
-    data = redlink.create_data_client(key)
+    data = redlink.create_data_client(key, endpoint=endpoint)
     assert_true(data.status["accessible"])
     assert_true(dataset in data.status["datasets"])
 
@@ -143,9 +150,9 @@ def test_delete_resource(key):
 
 
 @with_setup_args(setup_func)
-def test_delete_resource_after_import(key):
+def test_delete_resource_after_import(key, endpoint):
     dataset = "test"
-    data = redlink.create_data_client(key)
+    data = redlink.create_data_client(key, endpoint=endpoint)
     assert_true(data.status["accessible"])
     assert_true(dataset in data.status["datasets"])
 
@@ -168,9 +175,9 @@ def test_delete_resource_after_import(key):
 
 
 @with_setup_args(setup_func)
-def test_ldpath(key):
+def test_ldpath(key, endpoint):
     dataset = "test"
-    data = redlink.create_data_client(key)
+    data = redlink.create_data_client(key, endpoint=endpoint)
     assert_true(data.status["accessible"])
     assert_true(dataset in data.status["datasets"])
 
@@ -182,3 +189,263 @@ def test_ldpath(key):
     results = data.ldpath(uri, program, dataset)
     print(results)
     assert_equals(1, len(results))
+
+
+@with_setup_args(setup_func)
+def test_streaming_export(key, endpoint):
+    dataset = "test"
+    data = redlink.create_data_client(key, endpoint=endpoint)
+    assert_true(dataset in data.status["datasets"])
+
+    assert_true(data.import_dataset(
+        "<http://example.org/foo> <http://example.org/label> 'foo' .", Format.NT.mimetype, dataset, True))
+    triples = list(data.iter_dataset_triples(dataset))
+    assert_equals(1, len(triples))
+
+    out = io.BytesIO()
+    assert_true(data.export_dataset_to(dataset, out) > 0)
+
+
+@with_setup_args(setup_func)
+def test_import_dataset_streamed_from_path(key, endpoint):
+    dataset = "test"
+    data = redlink.create_data_client(key, endpoint=endpoint)
+    assert_true(dataset in data.status["datasets"])
+
+    path = pathlib.Path(os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "test.rdf")))
+    assert_true(data.import_dataset(path, Format.RDFXML.mimetype, dataset, True))
+    graph = data.export_dataset(dataset)
+    assert_true(len(graph) > 0)
+
+
+@with_setup_args(setup_func)
+def test_bulk_import(key, endpoint):
+    dataset = "test"
+    data = redlink.create_data_client(key, endpoint=endpoint)
+    assert_true(dataset in data.status["datasets"])
+
+    triples = "".join("<http://example.org/%d> <http://example.org/label> '%d' .\n" % (i, i) for i in range(100))
+    reports = []
+    report = data.bulk_import_dataset(triples, Format.NTRIPLES.mimetype, dataset, batch_size=30,
+                                      progress=reports.append, clean_before=True)
+    assert_true(report.ok)
+    assert_equals(100, report.triples)
+    assert_equals(4, len(reports))
+    assert_equals(100, len(data.export_dataset(dataset)))
+
+
+def test_bulk_import_blank_nodes():
+    with RedlinkEmulator() as emulator:
+        data = redlink.create_data_client(emulator.key, endpoint=emulator.endpoint)
+        triples = "<urn:s> <urn:p> _:b1 .\n<urn:a> <urn:p> \"a\" .\n_:b1 <urn:name> \"x\" .\n"
+        report = data.bulk_import_dataset(triples, Format.NTRIPLES.mimetype, "test", batch_size=1)
+        assert_true(report.ok)
+        assert_equals(2, report.batches)
+        results = data.sparql_tuple_query("select ?name where { <urn:s> <urn:p> ?b . ?b <urn:name> ?name }", "test")
+        assert_equals(["x"], [b["name"]["value"] for b in results["results"]["bindings"]])
+
+
+@raises(ValueError)
+def test_bulk_import_negative_retries():
+    data = redlink.create_data_client("key", FakeTransport(), lazy=True)
+    data.bulk_import_dataset("<urn:a> <urn:p> \"a\" .", Format.NTRIPLES.mimetype, "test", max_retries=-1)
+
+
+@with_setup_args(setup_func)
+def test_buffered_writer(key, endpoint):
+    dataset = "test"
+    data = redlink.create_data_client(key, endpoint=endpoint)
+    assert_true(dataset in data.status["datasets"])
+
+    assert_true(data.clean_dataset(dataset))
+    with data.buffered_writer(dataset, max_triples=4) as writer:
+        for i in range(10):
+            uri = "http://example.org/%d" % i
+            writer.import_resource("<%s> <http://example.org/label> '%d' ." % (uri, i), Format.NTRIPLES.mimetype,
+                                   uri, clean_before=True)
+    assert_equals(10, len(data.export_dataset(dataset)))
+
+
+@with_setup_args(setup_func)
+def test_delete_resources(key, endpoint):
+    dataset = "test"
+    data = redlink.create_data_client(key, endpoint=endpoint)
+    assert_true(dataset in data.status["datasets"])
+
+    uris = ["http://example.org/%s" % random_string() for _ in range(5)]
+    triples = "".join("<%s> <http://example.org/label> 'foo' .\n" % uri for uri in uris)
+    assert_true(data.import_dataset(triples, Format.NTRIPLES.mimetype, dataset))
+
+    outcomes = data.delete_resources(uris, dataset, batch_size=2)
+    assert_equals(set(uris), set(outcomes.keys()))
+    assert_true(all(outcomes.values()))
+
+    results = data.sparql_tuple_query("select (count(*) as ?count) where { <%s> ?p ?o }" % uris[0], dataset)
+    assert_equals(0, int(results["results"]["bindings"][0]["count"]["value"]))
+
+
+def test_delete_resources_invalid_uri():
+    transport = FakeTransport()
+    data = redlink.create_data_client("key", transport, lazy=True)
+    try:
+        data.delete_resources(["http://example.org/a", "http://example.org/b c"], "test", batch_size=1)
+        assert_true(False)
+    except ValueError as e:
+        assert_true("http://example.org/b c" in str(e))
+    assert_equals([], transport.requests)
+
+
+@with_setup_args(setup_func)
+def test_sync_dataset(key, endpoint):
+    dataset = "test"
+    data = redlink.create_data_client(key, endpoint=endpoint)
+    assert_true(dataset in data.status["datasets"])
+
+    triples = "".join("<http://example.org/%d> <http://example.org/label> \"%d\" .\n" % (i, i) for i in range(10))
+    assert_true(data.import_dataset(triples, Format.NTRIPLES.mimetype, dataset, True))
+
+    graph = Graph()
+    graph.parse(data=triples, format="nt")
+    graph.set((URIRef("http://example.org/0"), URIRef("http://example.org/label"), Literal("changed")))
+    graph.remove((URIRef("http://example.org/1"), None, None))
+    outcome = data.sync_dataset(graph, dataset)
+    assert_equals(1, outcome["inserted"])
+    assert_equals(1, outcome["deleted"])
+    assert_equals(1, outcome["removed"])
+    assert_equals(9, len(data.export_dataset(dataset)))
+
+
+def test_sync_dataset_keeps_blank_nodes():
+    with RedlinkEmulator() as emulator:
+        data = redlink.create_data_client(emulator.key, endpoint=emulator.endpoint)
+        triples = "<urn:a> <urn:p> \"a\" .\n<urn:a> <urn:q> _:b .\n<urn:c> <urn:p> \"c\" .\n"
+        assert_true(data.import_dataset(triples, Format.NTRIPLES.mimetype, "test"))
+        graph = Graph()
+        graph.add((URIRef("urn:c"), URIRef("urn:p"), Literal("c")))
+        outcome = data.sync_dataset(graph, "test")
+        assert_equals(1, outcome["removed"])
+        assert_equals(1, outcome["unchanged"])
+        remaining = set(emulator.dataset("test"))
+        assert_equals(2, len(remaining))
+        assert_true(any(s == URIRef("urn:a") and p == URIRef("urn:q") for s, p, o in remaining))
+
+
+@with_setup_args(setup_func)
+def test_paged_sparql(key, endpoint):
+    dataset = "test"
+    data = redlink.create_data_client(key, endpoint=endpoint)
+    assert_true(dataset in data.status["datasets"])
+
+    triples = "".join("<http://example.org/%d> <http://example.org/label> '%d' .\n" % (i, i) for i in range(25))
+    assert_true(data.import_dataset(triples, Format.NTRIPLES.mimetype, dataset, True))
+
+    query = "select ?s ?o where { ?s ?p ?o } order by ?s"
+    rows = list(data.iter_sparql_tuple_query(query, dataset, page_size=10))
+    assert_equals(25, len(rows))
+    assert_equals(25, len(set(row["s"]["value"] for row in rows)))
+    assert_equals(12, len(list(data.iter_sparql_tuple_query(query, dataset, page_size=10, max_rows=12))))
+
+
+@raises(ValueError)
+def test_paged_sparql_with_limit():
+    data = redlink.create_data_client("key", lazy=True)
+    next(data.iter_sparql_tuple_query("select * where { ?s ?p ?o } limit 10"))
+
+
+def test_paged_sparql_nested_limits():
+    data = redlink.create_data_client("key", FakeTransport(), lazy=True)
+    for query in ["select * where { { select ?s where { ?s ?p ?o } limit 5 } } order by ?s",
+                  "select * where { ?s ?p ?o } LIMIT 5 order by ?s",
+                  "select * where { ?s ?p ?o } offset\n5"]:
+        try:
+            next(data.iter_sparql_tuple_query(query))
+            assert_true(False, query)
+        except ValueError:
+            pass
+    for query in ["select ?limit where { ?limit <http://example.org/offset> 'limit 5' } # limit 5",
+                  "prefix limit: <http://example.org/> select ?s where { ?s limit:offset ?o }"]:
+        data._check_paged_query(query)
+
+
+def test_paged_sparql_short_pages():
+    rows = [{"s": {"type": "uri", "value": "http://example.org/%d" % i}} for i in range(7)]
+
+    def handler(method, url, data):
+        limit, offset = [int(n) for n in re.search(r"LIMIT (\d+) OFFSET (\d+)", data.decode("UTF-8")).groups()]
+        # the service caps pages at 3 rows, whatever the limit
+        page = rows[offset:offset + min(limit, 3)]
+        return FakeResponse(text=json.dumps({"head": {"vars": ["s"]}, "results": {"bindings": page}}))
+
+    data = redlink.create_data_client("key", FakeTransport(handler=handler), lazy=True)
+    query = "select ?s where { ?s ?p ?o } order by ?s"
+    assert_equals(rows, list(data.iter_sparql_tuple_query(query, "test", page_size=5, prefetch=False)))
+    assert_equals(rows[:6], list(data.iter_sparql_tuple_query(query, "test", page_size=5, max_rows=6)))
+
+
+@with_setup_args(setup_func)
+def test_streamed_sparql_rows(key, endpoint):
+    dataset = "test"
+    data = redlink.create_data_client(key, endpoint=endpoint)
+    assert_true(dataset in data.status["datasets"])
+
+    triples = "".join("<http://example.org/%d> <http://example.org/label> '%d' .\n" % (i, i) for i in range(25))
+    assert_true(data.import_dataset(triples, Format.NTRIPLES.mimetype, dataset, True))
+
+    with data.iter_sparql_rows("select ?s ?o where { ?s ?p ?o }", dataset) as rows:
+        assert_equals(["s", "o"], rows.vars)
+        results = list(rows)
+    assert_equals(25, len(results))
+    assert_true(("http://example.org/3", "3") in results)
+
+
+@with_setup_args(setup_func)
+def test_prepared_sparql(key, endpoint):
+    dataset = "test"
+    data = redlink.create_data_client(key, endpoint=endpoint)
+    assert_true(dataset in data.status["datasets"])
+
+    triples = "".join("<http://example.org/%d> <http://example.org/label> '%d' .\n" % (i, i) for i in range(5))
+    assert_true(data.import_dataset(triples, Format.NTRIPLES.mimetype, dataset, True))
+
+    labels = data.prepare_sparql_query("select ?label where { ?s <http://example.org/label> ?label }", dataset)
+    for i in range(5):
+        bindings = labels.execute(s=URIRef("http://example.org/%d" % i))["results"]["bindings"]
+        assert_equals([str(i)], [b["label"]["value"] for b in bindings])
+
+
+def test_cached_sparql_invalidation():
+    transport = FakeTransport(FakeResponse(text='{"head": {"vars": ["s"]}, "results": {"bindings": []}}',
+                                           mimetype="application/sparql-results+json"))
+    cache = redlink.LRUCache(maxsize=10)
+    data = redlink.create_data_client("key", transport, lazy=True, cache=cache)
+
+    data.sparql_tuple_query("select ?s where { ?s ?p ?o }", "test")
+    data.sparql_tuple_query("select ?s  where { ?s ?p ?o }  # same", "test")
+    data.sparql_tuple_query("select ?s where { ?s ?p ?o }", "other")
+    data.sparql_tuple_query("select ?s where { ?s ?p ?o }")
+    assert_equals(3, len(transport.requests))
+    assert_equals(1, cache.stats()["hits"])
+
+    data.sparql_update("insert data { <http://example.org/a> <http://example.org/b> 'c' }", "test")
+    data.sparql_tuple_query("select ?s where { ?s ?p ?o }", "test")
+    data.sparql_tuple_query("select ?s where { ?s ?p ?o }", "other")
+    data.sparql_tuple_query("select ?s where { ?s ?p ?o }")
+    assert_equals(6, len(transport.requests))
+    assert_equals(2, cache.stats()["hits"])
+
+
+@with_setup_args(setup_func)
+def test_ldpath_many(key, endpoint):
+    dataset = "test"
+    data = redlink.create_data_client(key, endpoint=endpoint)
+    assert_true(dataset in data.status["datasets"])
+
+    f = open(os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "test.rdf")), "r")
+    assert_true(data.import_dataset(f, Format.RDFXML.mimetype, dataset, True))
+
+    uris = ["http://example.org/wikier"] * 3
+    program = "name = foaf:name[@en] :: xsd:string ;"
+    results = list(data.ldpath_many(uris, program, dataset))
+    assert_equals(1, len(results))
+    assert_equals(data.ldpath(uris[0], program, dataset), results[0][1])
+    assert_equals(results, list(data.ldpath_many(uris, program, dataset, sparql=True)))
@@ -0,0 +1,64 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import time
+
+from nose.tools import assert_true, assert_equals, raises
+
+import redlink
+from redlink.batch import bounded_map
+from redlink.deadline import remaining
+
+from .utils import FakeResponse, FakeTransport
+
+
+def test_remaining():
+    assert_equals(None, remaining())
+    assert_equals(5, remaining(5))
+    with redlink.deadline(10):
+        assert_true(9 < remaining() <= 10)
+        assert_equals(5, remaining(5))
+        with redlink.deadline(20):
+            assert_true(remaining() <= 10)
+        with redlink.deadline(1):
+            assert_true(remaining() <= 1)
+    assert_equals(None, remaining())
+
+
+@raises(redlink.DeadlineExceeded)
+def test_deadline_exceeded():
+    with redlink.deadline(0.01):
+        time.sleep(0.02)
+        remaining()
+
+
+def test_deadline_reaches_requests():
+    transport = FakeTransport(FakeResponse(text='{"name": []}'))
+    data = redlink.create_data_client("key", transport, lazy=True, timeout=30)
+    data.ldpath("http://example.org/a", "name = foaf:name ;", "test")
+    with redlink.deadline(2):
+        data.ldpath("http://example.org/a", "name = foaf:name ;", "test")
+        list(data.ldpath_many(["http://example.org/%d" % i for i in range(4)], "name = foaf:name ;", "test"))
+    assert_equals(30, transport.timeouts[0])
+    assert_equals(6, len(transport.timeouts))
+    assert_true(all(timeout <= 2 for timeout in transport.timeouts[1:]))
+
+
+def test_deadline_reaches_threads():
+    with redlink.deadline(0.05):
+        time.sleep(0.1)
+        results = list(bounded_map(lambda item: remaining(), range(3)))
+    assert_true(all(isinstance(result.error, redlink.DeadlineExceeded) for result in results))
@@ -0,0 +1,85 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import time
+
+from nose.tools import assert_true, assert_equals, raises
+
+from rdflib import URIRef, Literal
+from rdflib.namespace import RDFS
+
+import redlink
+from redlink.chunking import FISE
+from redlink.format import Format
+from redlink.testing import RedlinkEmulator
+
+
+def test_data_roundtrip():
+    with RedlinkEmulator(datasets=["test", "other"]) as emulator:
+        data = redlink.create_data_client(emulator.key, endpoint=emulator.endpoint)
+        assert_equals(["other", "test"], data.status["datasets"])
+        triples = "".join("<http://example.org/%d> <http://example.org/label> \"%d\" .\n" % (i, i) for i in range(5))
+        assert_true(data.import_dataset(triples, Format.NTRIPLES.mimetype, "test"))
+        assert_true(data.import_resource("<http://example.org/x> <http://example.org/label> \"x\" .",
+                                         Format.NTRIPLES.mimetype, "http://example.org/x", "other"))
+        assert_equals(5, len(data.export_dataset("test")))
+        assert_equals(1, len(data.export_resource("http://example.org/x", "other")))
+
+        results = data.sparql_tuple_query("select (count(*) as ?count) where { ?s ?p ?o }")
+        assert_equals("6", results["results"]["bindings"][0]["count"]["value"])
+        with data.iter_sparql_rows("select ?s where { ?s ?p \"3\" }", "test") as rows:
+            assert_equals([("http://example.org/3",)], list(rows))
+
+        data.sparql_update("DELETE WHERE { <http://example.org/0> ?p ?o }", "test")
+        assert_true(data.delete_resource("http://example.org/1", "test"))
+        assert_equals(3, len(emulator.dataset("test")))
+        assert_equals({"name": [{"type": "literal", "value": "2"}]},
+                      data.ldpath("http://example.org/2", "name = <http://example.org/label> ;", "test"))
+        assert_true(data.clean_dataset("test"))
+        assert_equals(0, len(emulator.dataset("test")))
+
+
+def test_enhancements():
+    with RedlinkEmulator() as emulator:
+        entity = URIRef("http://example.org/Salzburg")
+        emulator.dataset("test").add((entity, RDFS.label, Literal("Salzburg")))
+        analysis = redlink.create_analysis_client(emulator.key, endpoint=emulator.endpoint)
+        graph = analysis.enhance(u"Näher an Salzburg", output=Format.TURTLE)
+        mention = next(graph.subjects(FISE["selected-text"]))
+        assert_equals((9, 17), (int(graph.value(mention, FISE.start)), int(graph.value(mention, FISE.end))))
+        assert_equals([entity], list(graph.objects(None, FISE["entity-reference"])))
+        assert_true(len(analysis.enhance("Nothing to see")) > 0)
+
+
+@raises(ValueError)
+def test_invalid_key():
+    with RedlinkEmulator() as emulator:
+        redlink.create_data_client("invalid", endpoint=emulator.endpoint)
+
+
+def test_injected_errors():
+    with RedlinkEmulator(latency=0.05) as emulator:
+        data = redlink.create_data_client(emulator.key, endpoint=emulator.endpoint,
+                                          limiter=redlink.AdaptiveLimiter())
+        emulator.inject(503, count=2, path="/sparql/", retry_after=0)
+        start = time.time()
+        results = data.sparql_tuple_query("ask { ?s ?p ?o }", "test")
+        assert_true(time.time() - start >= 0.15)
+        assert_equals(False, results["boolean"])
+        assert_equals(2, data.limiter.stats()["retries"])
+
+        emulator.error_rate = 1.0
+        assert_equals(False, data.import_dataset("<urn:a> <urn:b> <urn:c> .", Format.NTRIPLES.mimetype, "test"))
+        assert_equals(0, len(emulator.dataset("test")))
@@ -20,3 +20,7 @@ def test_mimetype_lookup():
     assert_equals(Format.TURTLE, from_mimetype("text/turtle"))
     assert_equals(Format.TURTLE, from_mimetype("text/turtle;charset=UTF-8"))
     assert_equals(Format.JSON, from_mimetype("application/json;charset=UTF-8"))
+
+
+def test_ntriples_lookup():
+    assert_equals(Format.NTRIPLES, from_mimetype("application/n-triples"))
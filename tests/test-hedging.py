@@ -0,0 +1,126 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import threading
+import time
+
+from nose.tools import assert_true, assert_equals
+
+import redlink
+from redlink.hedging import Hedging
+from redlink.limiter import AdaptiveLimiter
+
+from .utils import FakeResponse, FakeTransport
+
+
+def _prime(hedging, latency=0.01, samples=10):
+    for _ in range(samples):
+        hedging.call(lambda: time.sleep(latency))
+
+
+def test_no_hedging_without_samples():
+    hedging = Hedging(min_samples=10)
+    assert_equals(None, hedging.delay())
+    assert_equals("ok", hedging.call(lambda: "ok"))
+    assert_equals(0, hedging.stats()["hedged"])
+
+
+def test_slow_request_is_hedged():
+    hedging = Hedging(percentile=90, min_samples=10, budget=1)
+    _prime(hedging)
+    calls = []
+    lock = threading.Lock()
+
+    def send():
+        with lock:
+            calls.append(len(calls))
+            first = len(calls) == 1
+        time.sleep(1 if first else 0.01)
+        return "slow" if first else "fast"
+
+    start = time.time()
+    assert_equals("fast", hedging.call(send))
+    assert_true(time.time() - start < 0.5)
+    assert_equals(1, hedging.stats()["hedged"])
+    assert_equals(1, hedging.stats()["won"])
+    hedging.close()
+
+
+def test_hedging_budget():
+    hedging = Hedging(percentile=50, min_samples=10, budget=0.1, burst=1)
+    _prime(hedging, samples=5)
+    _prime(hedging, latency=0.05, samples=5)
+    for _ in range(5):
+        hedging.call(lambda: time.sleep(0.1))
+    assert_true(hedging.stats()["hedged"] <= 2)
+    hedging.close()
+
+
+def test_error_response_does_not_win():
+    hedging = Hedging(percentile=90, min_samples=10, budget=1)
+    _prime(hedging)
+    calls = []
+    lock = threading.Lock()
+
+    def send():
+        with lock:
+            calls.append(len(calls))
+            first = len(calls) == 1
+        time.sleep(0.2 if first else 0.01)
+        return FakeResponse(200 if first else 503)
+
+    assert_equals(200, hedging.call(send).status_code)
+    assert_equals(0, hedging.stats()["won"])
+    hedging.close()
+
+
+def test_hedged_attempts_keep_deadline():
+    hedging = Hedging(percentile=90, min_samples=10, budget=1)
+    _prime(hedging, latency=0.05)
+
+    def slow(method, url, data):
+        time.sleep(0.3)
+        return FakeResponse(text='{"name": []}')
+
+    transport = FakeTransport(handler=slow)
+    data = redlink.create_data_client("key", transport, lazy=True, hedging=hedging)
+    with redlink.deadline(1):
+        data.ldpath("http://example.org/a", "name = foaf:name ;", "test")
+    assert_equals(2, len(transport.timeouts))
+    assert_true(transport.timeouts[1] < transport.timeouts[0] - 0.04)
+    hedging.close()
+
+
+def test_hedged_duplicates_take_limiter_slots():
+    for limit, requests in ((2, 2), (1, 1)):
+        hedging = Hedging(percentile=90, min_samples=10, budget=1)
+        _prime(hedging)
+        limiter = AdaptiveLimiter(initial=limit, min_limit=limit, max_limit=limit)
+        in_flight = []
+
+        def slow(method, url, data):
+            in_flight.append(limiter.in_flight)
+            time.sleep(0.2)
+            return FakeResponse(text='{"name": []}')
+
+        transport = FakeTransport(handler=slow)
+        data = redlink.create_data_client("key", transport, lazy=True, hedging=hedging, limiter=limiter)
+        data.ldpath("http://example.org/a", "name = foaf:name ;", "test")
+        assert_equals(requests, len(transport.requests))
+        assert_equals(list(range(1, requests + 1)), in_flight)
+        time.sleep(0.3)
+        assert_equals(0, limiter.in_flight)
+        hedging.close()
@@ -0,0 +1,81 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import json
+
+from nose.tools import assert_true, assert_equals, raises
+from rdflib import Graph
+
+from redlink.ldpath import SimpleProgram
+
+
+def _graph():
+    g = Graph()
+    g.parse(data="""
+    @prefix foaf: <http://xmlns.com/foaf/0.1/> .
+    <http://example.org/a> foaf:name "Alice"@en, "Alicia"@es ; foaf:knows <http://example.org/b> .
+    <http://example.org/b> foaf:name "Bob"@en ; foaf:age 42 .
+    """, format="turtle")
+    return g
+
+
+def test_simple_programs():
+    assert_true(SimpleProgram.parse("name = foaf:name ;"))
+    assert_true(SimpleProgram.parse("@prefix ex: <http://example.org/> ; name = ex:a / <http://example.org/b>[@en] :: xsd:string ;"))
+    assert_equals(None, SimpleProgram.parse("name = foaf:name | rdfs:label ;"))
+    assert_equals(None, SimpleProgram.parse("name = fn:concat(foaf:givenName, foaf:surname) ;"))
+    assert_equals(None, SimpleProgram.parse("name = unknown:name ;"))
+    assert_equals(None, SimpleProgram.parse("@prefix ex: <http://example.org/\\> ; name = ex:a ;"))
+    assert_equals(None, SimpleProgram.parse(""))
+
+
+def test_simple_program_results():
+    program = SimpleProgram.parse("""name = foaf:name[@en] :: xsd:string ;
+        friend = foaf:knows / foaf:name ; age = foaf:age ; knows = foaf:knows ;""")
+    uris = ["http://example.org/a", "http://example.org/b", "http://example.org/c"]
+    bindings = json.loads(_graph().query(program.query(uris)).serialize(format="json"))["results"]["bindings"]
+    results = program.results(uris, bindings)
+
+    assert_equals([{"type": "literal", "value": "Alice"}], results["http://example.org/a"]["name"])
+    assert_equals([{"type": "literal", "value": "Bob", "lang": "en"}], results["http://example.org/a"]["friend"])
+    assert_equals([{"type": "uri", "value": "http://example.org/b"}], results["http://example.org/a"]["knows"])
+    assert_equals([{"type": "literal", "value": "42", "datatype": "http://www.w3.org/2001/XMLSchema#integer"}],
+                  results["http://example.org/b"]["age"])
+    assert_equals({"name": [], "friend": [], "age": [], "knows": []}, results["http://example.org/c"])
+
+
+def test_simple_program_language_ranges():
+    g = _graph()
+    g.parse(data='<http://example.org/c> <http://xmlns.com/foaf/0.1/name> "Carol"@en-GB .', format="turtle")
+    program = SimpleProgram.parse("name = foaf:name[@en] ;")
+    uris = ["http://example.org/a", "http://example.org/c"]
+    bindings = json.loads(g.query(program.query(uris)).serialize(format="json"))["results"]["bindings"]
+    results = program.results(uris, bindings)
+    assert_equals(["Alice"], [value["value"] for value in results["http://example.org/a"]["name"]])
+    assert_equals(["Carol"], [value["value"] for value in results["http://example.org/c"]["name"]])
+
+
+def test_simple_program_unexpected_bindings():
+    program = SimpleProgram.parse("name = foaf:name ;")
+    bindings = [{"uri": {"type": "uri", "value": "http://example.org/other"},
+                 "field": {"type": "literal", "value": "name"},
+                 "value": {"type": "literal", "value": "Other"}}]
+    assert_equals({"http://example.org/a": {"name": []}}, program.results(["http://example.org/a"], bindings))
+
+
+@raises(ValueError)
+def test_simple_program_invalid_uri():
+    SimpleProgram.parse("name = foaf:name ;").query(["http://example.org/a", "http://example.org/b> } DELETE {"])
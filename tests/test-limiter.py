@@ -0,0 +1,153 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+import threading
+import time
+from email.utils import formatdate
+
+from nose.tools import assert_true, assert_equals, raises
+
+import redlink
+from redlink.limiter import AdaptiveLimiter, CircuitBreaker, CircuitOpenError, RetryPolicy
+
+from .utils import FakeResponse, FakeTransport
+
+
+def _sender(*statuses):
+    responses = [FakeResponse(status, headers={"Retry-After": "0"}) for status in statuses]
+    calls = []
+
+    def send():
+        calls.append(len(calls))
+        return responses[len(calls) - 1]
+
+    return send, calls
+
+
+def test_retry_after():
+    policy = RetryPolicy(backoff=1, max_backoff=20)
+    assert_equals(3, policy.delay(0, "3"))
+    assert_equals(20, policy.delay(0, "120"))
+    assert_true(8 <= policy.delay(0, formatdate(time.time() + 10, usegmt=True)) <= 10)
+    assert_true(all(0 <= policy.delay(2) <= 4 for _ in range(20)))
+
+
+def test_idempotent_requests_retried():
+    limiter = AdaptiveLimiter(retry=RetryPolicy(max_retries=3))
+    send, calls = _sender(503, 429, 200)
+    assert_equals(200, limiter.call(send, idempotent=True).status_code)
+    assert_equals(3, len(calls))
+    assert_equals(2, limiter.stats()["retries"])
+
+    send, calls = _sender(503, 200)
+    assert_equals(503, limiter.call(send).status_code)
+    assert_equals(1, len(calls))
+
+    send, calls = _sender(503, 503, 503)
+    assert_equals(503, AdaptiveLimiter(retry=RetryPolicy(max_retries=2)).call(send, idempotent=True).status_code)
+    assert_equals(3, len(calls))
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    limiter = AdaptiveLimiter(retry=RetryPolicy(max_retries=0), breaker=breaker)
+    send, calls = _sender(500, 500, 200, 200)
+    limiter.call(send)
+    limiter.call(send)
+    assert_equals(CircuitBreaker.OPEN, breaker.state)
+    try:
+        limiter.call(send)
+        assert_true(False)
+    except CircuitOpenError:
+        assert_equals(2, len(calls))
+    time.sleep(0.06)
+    assert_equals(200, limiter.call(send).status_code)
+    assert_equals(CircuitBreaker.CLOSED, breaker.state)
+
+
+def test_limit_adapts():
+    limiter = AdaptiveLimiter(initial=10, decrease=0.5)
+    limiter.call(lambda: FakeResponse(429))
+    assert_equals(5, limiter.limit)
+    for _ in range(20):
+        limiter.call(lambda: FakeResponse(200))
+    assert_true(limiter.limit > 7)
+    limiter.call(lambda: FakeResponse(500))
+    assert_true(limiter.limit < 5)
+
+
+def test_fast_failures_ignored():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    limiter = AdaptiveLimiter(initial=10, retry=RetryPolicy(max_retries=0), breaker=breaker)
+
+    def send():
+        time.sleep(0.01)
+        return FakeResponse(200)
+
+    for _ in range(20):
+        limiter.call(send)
+    limit = limiter.limit
+    latencies = list(limiter._latencies)
+
+    def expired():
+        raise redlink.DeadlineExceeded("deadline exceeded")
+
+    try:
+        limiter.call(expired)
+        assert_true(False)
+    except redlink.DeadlineExceeded:
+        pass
+    breaker.failure()
+    for _ in range(50):
+        try:
+            limiter.call(send)
+            assert_true(False)
+        except CircuitOpenError:
+            pass
+    assert_equals(limit, limiter.limit)
+    assert_equals(latencies, list(limiter._latencies))
+    assert_equals(0, limiter.in_flight)
+
+
+def test_in_flight_bounded():
+    limiter = AdaptiveLimiter(initial=3, max_limit=3)
+    concurrent = []
+    lock = threading.Lock()
+    active = [0]
+
+    def send():
+        with lock:
+            active[0] += 1
+            concurrent.append(active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return FakeResponse(200)
+
+    threads = [threading.Thread(target=limiter.call, args=(send,)) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert_equals(12, len(concurrent))
+    assert_true(max(concurrent) <= 3)
+
+
+def test_client_retries():
+    transport = FakeTransport(FakeResponse(503, headers={"Retry-After": "0"}), FakeResponse(200, '{"name": []}'))
+    data = redlink.create_data_client("key", transport, lazy=True, limiter=AdaptiveLimiter())
+    assert_equals({"name": []}, data.ldpath("http://example.org/a", "name = foaf:name ;", "test"))
+    assert_equals(2, len(transport.requests))
@@ -0,0 +1,114 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+
+from nose.tools import assert_true, assert_equals
+
+import redlink
+from redlink.hooks import Hook
+from redlink.metrics import Histogram, MetricsCollector
+
+from .utils import FakeResponse, FakeTransport
+
+
+class _RecordingHook(Hook):
+
+    def __init__(self):
+        self.calls = []
+
+    def before_request(self, request):
+        self.calls.append(("before", request.method, request.endpoint, request.url))
+
+    def after_response(self, request, response):
+        self.calls.append(("after", request.status, request.sent, request.received, request.error is not None))
+
+    def on_parse_done(self, kind, mimetype, size, elapsed):
+        self.calls.append(("parse", kind, mimetype, size))
+
+
+def test_hooks():
+    results = '{"head": {"vars": []}, "results": {"bindings": []}}'
+    transport = FakeTransport(FakeResponse(200, results), IOError("reset"))
+    data = redlink.create_data_client("secret", transport, lazy=True, endpoint="http://localhost")
+    hook = _RecordingHook()
+    data.add_hook(hook)
+    data.sparql_tuple_query("select * where { ?s ?p ?o }", "test")
+    try:
+        data.export_dataset("test")
+        assert_true(False)
+    except IOError:
+        pass
+    assert_equals([("before", "POST", "data/sparql/select", "http://localhost/1.0/data/test/sparql/select?key=***"),
+                   ("after", 200, 27, len(results), False),
+                   ("parse", "sparql", "application/json", len(results)),
+                   ("before", "GET", "data", "http://localhost/1.0/data/test?key=***"),
+                   ("after", None, 0, None, True)], hook.calls)
+
+    data.remove_hook(hook)
+    transport.responses = [FakeResponse(200, results)]
+    data.sparql_tuple_query("select * where { ?s ?p ?o }")
+    assert_equals(5, len(hook.calls))
+
+
+def test_failing_hooks_ignored():
+    class _FailingHook(Hook):
+        def before_request(self, request):
+            raise ValueError("broken")
+
+    transport = FakeTransport(FakeResponse(200, '{"name": []}'))
+    data = redlink.create_data_client("secret", transport, lazy=True)
+    data.add_hook(_FailingHook())
+    assert_equals({"name": []}, data.ldpath("http://example.org/a", "name = foaf:name ;", "test"))
+
+
+def test_metrics_collector():
+    metrics = MetricsCollector()
+    transport = FakeTransport(FakeResponse(503, ""), FakeResponse(200, '{"name": []}'), FakeResponse(404, ""))
+    data = redlink.create_data_client("secret", transport, lazy=True, limiter=redlink.AdaptiveLimiter(
+        retry=redlink.RetryPolicy(backoff=0)))
+    data.add_hook(metrics)
+    data.ldpath("http://example.org/a", "name = foaf:name ;", "test")
+    data.delete_resource("http://example.org/a", "test")
+
+    snapshot = metrics.snapshot()
+    ldpath = snapshot["requests"]["POST data/ldpath"]
+    assert_equals({"200": 1}, ldpath["statuses"])
+    assert_equals(1, ldpath["retries"])
+    assert_equals(len("name = foaf:name ;"), ldpath["bytes_sent"])
+    assert_equals(12, ldpath["bytes_received"])
+    assert_equals(1, ldpath["latency"]["count"])
+    assert_equals({"404": 1}, snapshot["requests"]["DELETE data/resource"]["statuses"])
+    assert_equals(1, snapshot["parsing"]["ldpath"]["duration"]["count"])
+
+    exported = metrics.to_prometheus()
+    assert_true("# TYPE redlink_request_duration_seconds histogram" in exported)
+    assert_true('redlink_request_duration_seconds_bucket{endpoint="data/ldpath",method="POST",le="+Inf"} 1'
+                in exported)
+    assert_true('redlink_requests_total{endpoint="data/resource",method="DELETE",status="404"} 1' in exported)
+    assert_true('redlink_request_retries_total{endpoint="data/ldpath",method="POST"} 1' in exported)
+    assert_true('redlink_parse_duration_seconds_count{kind="ldpath"} 1' in exported)
+
+    metrics.reset()
+    assert_equals(0, metrics.snapshot()["requests"]["POST data/ldpath"]["latency"]["count"])
+
+
+def test_histogram():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+    assert_equals([(0.1, 2), (1.0, 3), (float("inf"), 4)], histogram.cumulative())
+    assert_equals(0.1, histogram.quantile(0.5))
+    assert_equals(1.0, histogram.quantile(0.99))
+    assert_equals(None, Histogram().quantile(0.5))
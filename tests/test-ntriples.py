@@ -0,0 +1,47 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from nose.tools import assert_equals
+from rdflib import URIRef, Literal
+
+from redlink.ntriples import batch_lines, parse_lines, relabel_blank_nodes, serialize_triples, split_lines
+
+
+def test_roundtrip():
+    triples = [(URIRef("http://example.org/%d" % i), URIRef("http://example.org/label"), Literal(u"línea\n%d" % i, lang="es"))
+               for i in range(5)]
+    chunks = list(serialize_triples(triples, lines_per_chunk=2))
+    assert_equals(3, len(chunks))
+    lines = b"".join(chunks).splitlines()
+    assert_equals(triples, list(parse_lines(lines)))
+
+
+def test_split_lines():
+    chunks = ["<http://example.org/a> <http://example.org/p> \"x\" .\n# comment\n\n<http://exa",
+              "mple.org/b> <http://example.org/p> \"y\" ."]
+    assert_equals([b"<http://example.org/a> <http://example.org/p> \"x\" .\n",
+                   b"<http://example.org/b> <http://example.org/p> \"y\" .\n"], list(split_lines(chunks)))
+
+
+def test_batch_lines():
+    lines = [b"<urn:s> <urn:p> _:b1 .\n", b"<urn:a> <urn:p> \"_:b1 .\" .\n", b"_:b1 <urn:name> \"x\"@en .\n",
+             b"<urn:a> <urn:p> <urn:b> .\n", b"<urn:c> <urn:p> \"c\" .\n"]
+    assert_equals([[lines[1], lines[3]], [lines[4]], [lines[0], lines[2]]], list(batch_lines(lines, 2)))
+
+
+def test_relabel_blank_nodes():
+    lines = [b"_:b0 <urn:p> _:b1 .\n", b"<urn:a> <urn:p> \"_:b0 .\" .\n", b"<urn:a> <urn:p> _:b0.\n"]
+    assert_equals([b"_:r1_b0 <urn:p> _:r1_b1 .\n", lines[1], b"<urn:a> <urn:p> _:r1_b0.\n"],
+                  list(relabel_blank_nodes(lines, "r1_")))
@@ -0,0 +1,84 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from nose.tools import assert_true, assert_false, assert_equals
+
+import urllib3.connection
+from rdflib import Graph, URIRef, Literal
+
+import redlink
+from redlink.format import Format
+from redlink.profiling import Profile, section, profiling
+from redlink.testing import RedlinkEmulator
+
+
+def test_sections():
+    assert_false(profiling())
+    with section("outside"):
+        pass
+    with Profile() as profile:
+        assert_true(profiling())
+        with section("outer"):
+            time.sleep(0.02)
+            with section("inner"):
+                time.sleep(0.02)
+                with section("inner"):
+                    pass
+    assert_false(profiling())
+    assert_equals([("(other)", "outer"), ("(other)", "outer", "inner")], sorted(profile.stats))
+    for entry in profile.breakdown():
+        assert_equals(1, entry["count"])
+        assert_true(0.015 < entry["wall"] < 0.5)
+    assert_true(profile.wall >= 0.04)
+
+
+def test_profile_calls():
+    with RedlinkEmulator() as emulator:
+        data = redlink.create_data_client(emulator.key, endpoint=emulator.endpoint)
+        graph = Graph()
+        for i in range(100):
+            graph.add((URIRef("http://example.org/%d" % i), URIRef("http://example.org/label"), Literal(str(i))))
+        getresponse = urllib3.connection.HTTPConnection.getresponse
+        with data.profile() as profile:
+            assert_true(urllib3.connection.HTTPConnection.getresponse is not getresponse)
+            assert_true(data.import_dataset(graph, Format.NTRIPLES.mimetype, "test"))
+            assert_equals(100, len(data.export_dataset("test")))
+            with data.iter_sparql_rows("select ?s where { ?s ?p ?o }", "test") as rows:
+                assert_equals(100, len(list(rows)))
+        sections = set((entry["call"], entry["section"]) for entry in profile.breakdown())
+        for expected in [("RedlinkData.import_dataset", "ntriples.serialize"),
+                         ("RedlinkData.import_dataset", "upload"),
+                         ("RedlinkData.import_dataset", "wait"),
+                         ("RedlinkData.export_dataset", "wait"),
+                         ("RedlinkData.export_dataset", "download"),
+                         ("RedlinkData.export_dataset", "Graph.parse"),
+                         ("RedlinkData.iter_sparql_rows", "download"),
+                         ("RedlinkData.iter_sparql_rows", "tsv.parse")]:
+            assert_true(expected in sections, expected)
+        assert_true("RedlinkData.export_dataset" in profile.report())
+
+        lines = profile.folded().splitlines()
+        assert_equals(len(profile.stats), len(lines))
+        for line in lines:
+            stack, micros = line.rsplit(" ", 1)
+            assert_true(stack.startswith("RedlinkData."))
+            assert_true(int(micros) >= 0)
+
+        # the network functions are only wrapped while profiling
+        assert_true(urllib3.connection.HTTPConnection.getresponse is getresponse)
+        with data.iter_sparql_rows("select ?s where { ?s ?p ?o }", "test") as rows:
+            assert_equals(100, len(list(rows)))
+        assert_equals(len(lines), len(profile.folded().splitlines()))
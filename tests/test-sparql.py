@@ -0,0 +1,101 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from nose.tools import assert_true, assert_equals, raises
+from rdflib import URIRef, Literal, BNode
+from rdflib.namespace import XSD
+
+import redlink
+from redlink.sparql import TupleRows, normalize_query, parse_tsv_value, parse_tsv_term, format_tsv_term
+
+
+def test_tsv_terms_roundtrip():
+    terms = [URIRef("http://example.org/a"), BNode("b0"), Literal("plain"), Literal("label", lang="en-GB"),
+             Literal(42), Literal("tab\tquote\" newline\n backslash\\"), None]
+    for term in terms:
+        assert_equals(term, parse_tsv_term(format_tsv_term(term)))
+
+
+def test_tsv_bare_terms():
+    assert_equals(Literal("true", datatype=XSD.boolean), parse_tsv_term("true"))
+    assert_equals(Literal("-7", datatype=XSD.integer), parse_tsv_term("-7"))
+    assert_equals(Literal("1.5", datatype=XSD.decimal), parse_tsv_term("1.5"))
+    assert_equals(Literal("1.5e3", datatype=XSD.double), parse_tsv_term("1.5e3"))
+
+
+def test_tsv_values():
+    assert_equals("http://example.org/a", parse_tsv_value("<http://example.org/a>"))
+    assert_equals("label", parse_tsv_value("\"label\"@en"))
+    assert_equals("a\tb \u00e9", parse_tsv_value("\"a\\tb \\u00E9\"^^<http://example.org/type>"))
+    assert_equals("42", parse_tsv_value("42"))
+    assert_equals(None, parse_tsv_value(""))
+
+
+def test_tuple_rows():
+    closed = []
+    lines = iter([b"?s\t?label\n", b"<http://example.org/a>\t\"a\"\n", b"<http://example.org/b>\t\n"])
+    rows = TupleRows(lines, close=lambda: closed.append(True))
+    assert_equals(["s", "label"], rows.vars)
+    assert_equals([("http://example.org/a", "a"), ("http://example.org/b", None)], list(rows))
+    assert_true(closed)
+
+
+def _prepared(query):
+    return redlink.create_data_client("key", lazy=True).prepare_sparql_query(query, "test")
+
+
+def test_prepared_query_bindings():
+    query = _prepared("""SELECT ?label WHERE { # ?s
+      ?s <http://example.org/label?s> ?label . FILTER(?label != "?s" && $s != ?other) }""")
+    assert_equals(frozenset(["s", "label", "other"]), query.vars)
+    rendered = query.render(s=URIRef("http://example.org/a"), other="it's \"quoted\"")
+    assert_equals("""SELECT ?label WHERE { # ?s
+      <http://example.org/a> <http://example.org/label?s> ?label . """
+                  """FILTER(?label != "?s" && <http://example.org/a> != "it's \\"quoted\\"") }""", rendered)
+    assert_true(query.render(s=Literal(3)).count('"3"^^<http://www.w3.org/2001/XMLSchema#integer>') == 2)
+
+
+@raises(ValueError)
+def test_prepared_query_invalid_iri():
+    _prepared("SELECT * WHERE { ?s ?p ?o }").render(s=URIRef("http://example.org/> ?p ?o } #"))
+
+
+def test_prepared_query_hostile_literals():
+    query = _prepared("SELECT * WHERE { ?s ?p ?o }")
+    try:
+        query.render(o=Literal("v", datatype="http://x> } ; DROP ALL ; #"))
+        assert_true(False)
+    except ValueError as e:
+        assert_true("http://x> } ; DROP ALL ; #" in str(e))
+    literal = Literal("v", lang="en")
+    literal._language = "en } ; DROP ALL ; #"  # not validated by some rdflib versions
+    try:
+        query.render(o=literal)
+        assert_true(False)
+    except ValueError as e:
+        assert_true("invalid language tag" in str(e))
+    assert_equals('SELECT * WHERE { ?s ?p "v\\" } ; DROP ALL ; #"@en-GB }',
+                  query.render(o=Literal('v" } ; DROP ALL ; #', lang="en-GB")))
+
+
+@raises(ValueError)
+def test_prepared_query_unknown_variable():
+    _prepared("SELECT * WHERE { ?s ?p ?o }").render(x=1)
+
+
+def test_normalize_query():
+    query = """SELECT  ?s   # subjects <http://example.org/>
+    WHERE {\t?s <http://example.org/a#b>  "two  spaces # kept" }  """
+    assert_equals('SELECT ?s WHERE { ?s <http://example.org/a#b> "two  spaces # kept" }', normalize_query(query))
@@ -0,0 +1,51 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import subprocess
+import sys
+
+from nose.tools import assert_true, assert_equals
+
+import redlink
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+
+
+def test_lazy_imports():
+    heavy = ("rdflib", "requests", "xml.dom.minidom", "sqlite3")
+    code = "import sys, redlink; print(' '.join(m for m in %r if m in sys.modules))" % (heavy,)
+    output = subprocess.check_output([sys.executable, "-c", code], env=dict(os.environ, PYTHONPATH=ROOT))
+    assert_equals("", output.decode("UTF-8").strip())
+
+
+def test_lazy_attributes():
+    from redlink.data import RedlinkData
+    assert_true(redlink.RedlinkData is RedlinkData)
+    assert_true("RedlinkAnalysis" in dir(redlink))
+    try:
+        redlink.RedlinkUnknown
+        assert_true(False)
+    except AttributeError:
+        pass
+
+
+def test_star_import():
+    namespace = {}
+    exec("from redlink import *", namespace)
+    for name in redlink.__all__:
+        assert_true(name in namespace, name)
+    assert_true(namespace["RedlinkData"] is redlink.RedlinkData)
+    assert_true("create_data_client" in namespace)
+    assert_true("importlib" not in namespace)
@@ -0,0 +1,50 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import time
+from nose.tools import assert_true, assert_equals
+
+from redlink.status import StatusCache
+
+
+def test_status_fetched_once():
+    cache = StatusCache(ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {"accessible": True}
+
+    assert_true(cache.get("key", fetch)["accessible"])
+    assert_true(cache.get("key", fetch)["accessible"])
+    assert_equals(1, len(calls))
+
+
+def test_status_not_cached_when_unavailable():
+    cache = StatusCache(ttl=60)
+    assert_equals(None, cache.get("key", lambda: None))
+    assert_equals(None, cache.peek("key"))
+
+
+def test_stale_status_refreshed_in_background():
+    cache = StatusCache(ttl=0)
+    cache.put("key", {"version": 1})
+    time.sleep(0.01)
+    assert_equals(1, cache.get("key", lambda: {"version": 2})["version"])
+    for _ in range(100):
+        if cache.peek("key")["version"] == 2:
+            break
+        time.sleep(0.01)
+    assert_equals(2, cache.peek("key")["version"])
@@ -0,0 +1,53 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from nose.tools import assert_equals, raises
+from rdflib import Graph, URIRef, Literal, BNode
+from rdflib.namespace import XSD
+
+from redlink.sync import FINGERPRINTS_QUERY, fingerprint, group_by_subject
+
+
+def _graph():
+    g = Graph()
+    for i in range(3):
+        s = URIRef("http://example.org/%d" % i)
+        g.add((s, URIRef("http://example.org/name"), Literal("name %d" % i)))
+        g.add((s, URIRef("http://example.org/label"), Literal("label %d" % i, lang="en")))
+        g.add((s, URIRef("http://example.org/count"), Literal(i)))
+        g.add((s, URIRef("http://example.org/string"), Literal("foo", datatype=XSD.string)))
+        g.add((s, URIRef("http://example.org/link"), URIRef("http://example.org/target")))
+    return g
+
+
+def test_local_and_remote_fingerprints_match():
+    g = _graph()
+    local = group_by_subject(g)
+    remote = dict((row.s, str(row.h)) for row in g.query(FINGERPRINTS_QUERY))
+    assert_equals(3, len(remote))
+    for s, pairs in local.items():
+        assert_equals(remote[s], fingerprint(pairs))
+
+
+def test_plain_and_string_literals_match():
+    plain = group_by_subject([(URIRef("http://example.org/a"), URIRef("http://example.org/p"), Literal("foo"))])
+    typed = group_by_subject([(URIRef("http://example.org/a"), URIRef("http://example.org/p"),
+                               Literal("foo", datatype=XSD.string))])
+    assert_equals(plain, typed)
+
+
+@raises(ValueError)
+def test_blank_nodes_not_supported():
+    group_by_subject([(BNode(), URIRef("http://example.org/p"), Literal("foo"))])
@@ -0,0 +1,30 @@
+# -*- coding: utf8 -*-
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from nose.tools import assert_true, assert_equals
+
+from redlink.transport import SessionTransport, get_default_transport
+
+
+def test_session_transport_pool_size():
+    transport = SessionTransport(pool_connections=2, pool_maxsize=32)
+    adapter = transport.session.get_adapter("https://api.redlink.io")
+    assert_equals(32, adapter._pool_maxsize)
+    assert_equals(2, adapter._pool_connections)
+    transport.close()
+
+
+def test_default_transport_is_shared():
+    assert_true(get_default_transport() is get_default_transport())
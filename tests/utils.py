@@ -16,19 +16,87 @@ import os
 import string
 import random
 
+from redlink.transport import Transport
+
+_emulator = None
+
+
+class FakeResponse(object):
+    """
+    Canned response of a C{FakeTransport}
+    """
+
+    def __init__(self, status_code=200, text="{}", mimetype="application/json", headers=None):
+        self.status_code = status_code
+        self.reason = "OK" if status_code < 400 else "Error"
+        self.text = text
+        self.content = text.encode("UTF-8")
+        self.headers = {"Content-Type": mimetype}
+        self.headers.update(headers or {})
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeTransport(Transport):
+    """
+    Transport recording the requests, and answering them with the given responses (or exceptions
+    to raise) in order, repeating the last one, or with a handler of the (method, url, data)
+    """
+
+    def __init__(self, *responses, **kwargs):
+        self.responses = list(responses) or [FakeResponse()]
+        self.handler = kwargs.get("handler")
+        self.requests = []
+        self.timeouts = []
+
+    def request(self, method, url, data=None, headers=None, verify=True, stream=False, timeout=None):
+        self.requests.append((method, url, data))
+        self.timeouts.append(timeout)
+        if self.handler:
+            response = self.handler(method, url, data)
+        elif len(self.responses) > 1:
+            response = self.responses.pop(0)
+        else:
+            response = self.responses[0]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
 def setup_func():
-    key = read_test_key()
-    return [key], {}
+    key, endpoint = read_test_key()
+    return [key, endpoint], {}
 
 
 def read_test_key():
-    f = open(os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "api.key")), "r")
+    """
+    Read the api key of the tests, falling back to a local emulator of the api
+    (shared by all the tests) when there is no key
+
+    @rtype: tuple
+    @return: key and endpoint, C{None} for the default one
+    """
+    path = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "api.key"))
+    if not os.path.exists(path):
+        emulator = start_emulator()
+        return emulator.key, emulator.endpoint
+    f = open(path, "r")
     try:
-        return f.read().strip()
+        return f.read().strip(), None
     finally:
         f.close()
 
 
+def start_emulator():
+    global _emulator
+    if _emulator is None:
+        from redlink.testing import RedlinkEmulator
+        _emulator = RedlinkEmulator().start()
+    return _emulator
+
+
 def with_setup_args(setup, teardown=None):
     """Decorator to add setup and/or teardown methods to a test function::
       @with_setup_args(setup, teardown)